@@ -0,0 +1,122 @@
+"""
+학습지 문서 보정 벤치마크: 기존 transform_and_binaried_image 방식(원본 해상도 Otsu + CHAIN_APPROX_NONE +
+파이썬 루프)과 voiceGPT.storage.docscan(축소본 검출 + 원본 꼭짓점 보정 + NumPy 점수화)을
+원근 왜곡을 준 합성 학습지 사진으로 비교합니다.
+
+  python benchmarks/docscan.py [--count 20] [--size 4032 3024] [--seed 0]
+
+검출 시간과 함께, 찾은 꼭짓점과 실제 꼭짓점 사이의 평균 오차(px)와 검출 실패 수를 출력합니다.
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import cv2
+import numpy as np
+from voiceGPT.storage.docscan import detect_document, order_points, warp_document
+
+
+def make_page(rng, size):
+  """배경 위에 원근 왜곡된 흰 학습지를 그리고 (이미지, 실제 꼭짓점)을 반환"""
+  width, height = size
+  # 책상 무늬를 흉내낸 어두운 배경 + 저주파 노이즈
+  background = rng.uniform(40, 120, size=3)
+  noise = cv2.resize(rng.normal(0, 12, size=(height // 16, width // 16, 3)), (width, height))
+  img = np.clip(background + noise, 0, 255).astype(np.uint8)
+
+  page_w, page_h = 2100, 2970  # A4 비율
+  page = np.full((page_h, page_w, 3), 245, np.uint8)
+  for row in range(200, page_h - 200, 90):
+    # 글자 줄을 흉내낸 검은 막대
+    length = int(rng.integers(page_w // 3, page_w - 300))
+    cv2.rectangle(page, (150, row), (150 + length, row + 30), (30, 30, 30), -1)
+  cv2.rectangle(page, (100, 100), (page_w - 100, page_h - 100), (60, 60, 60), 6)
+
+  scale = min(width, height) * rng.uniform(0.65, 0.8) / page_h
+  cx, cy = width / 2 + rng.uniform(-0.05, 0.05) * width, height / 2 + rng.uniform(-0.05, 0.05) * height
+  half_w, half_h = page_w * scale / 2, page_h * scale / 2
+  corners = np.array([[-half_w, -half_h], [half_w, -half_h], [half_w, half_h], [-half_w, half_h]])
+  angle = np.deg2rad(rng.uniform(-12, 12))
+  rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+  corners = corners @ rotation.T + (cx, cy)
+  corners += rng.uniform(-0.04, 0.04, size=(4, 2)) * min(width, height)  # 원근 왜곡
+  corners = corners.astype("float32")
+
+  src = np.array([[0, 0], [page_w - 1, 0], [page_w - 1, page_h - 1], [0, page_h - 1]], dtype="float32")
+  M = cv2.getPerspectiveTransform(src, corners)
+  warped = cv2.warpPerspective(page, M, (width, height))
+  mask = cv2.warpPerspective(np.full((page_h, page_w), 255, np.uint8), M, (width, height))
+  img[mask > 0] = warped[mask > 0]
+
+  # 한쪽이 어두운 조명(그림자)과 형광등 반사광
+  direction = rng.uniform(0, 2 * np.pi)
+  xx, yy = np.meshgrid(np.linspace(-1, 1, width, dtype=np.float32), np.linspace(-1, 1, height, dtype=np.float32))
+  shade = 0.8 + 0.2 * (np.cos(direction) * xx + np.sin(direction) * yy) / np.sqrt(2)
+  img = (img * shade[..., None]).astype(np.uint8)
+  glare = np.zeros((height, width), np.uint8)
+  center = tuple(int(v) for v in corners.mean(axis=0) + rng.uniform(-0.2, 0.2, size=2) * min(width, height))
+  cv2.ellipse(glare, center, (width // 10, height // 14), float(rng.uniform(0, 180)), 0, 360, 40, -1)
+  img = cv2.add(img, cv2.merge([cv2.GaussianBlur(glare, (0, 0), 60)] * 3))
+  return img, corners
+
+
+def legacy_detect(img, area_val=400):
+  """변경 전 transform_and_binaried_image의 검출 경로 (원본 해상도)"""
+  gray_image = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+  _, th = cv2.threshold(gray_image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+  contours, _ = cv2.findContours(th, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+  for pts in contours:
+    if cv2.contourArea(pts) < area_val or len(pts) < 4:
+      continue
+    epsilon = 0.02 * cv2.arcLength(pts, True)
+    approx = cv2.approxPolyDP(pts, epsilon, True)
+    if len(approx) == 4 or len(approx) == 6:
+      return order_points(np.array([p[0] for p in approx], dtype="float32"))
+  return None
+
+
+def legacy_warp(img, corners):
+  height, width = img.shape[:2]
+  dst = np.array([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype="float32")
+  return cv2.warpPerspective(img, cv2.getPerspectiveTransform(corners, dst), (width, height))
+
+
+def run(count, size, seed):
+  rng = np.random.default_rng(seed)
+  results = {"legacy": [], "docscan": []}
+  for _ in range(count):
+    img, truth = make_page(rng, size)
+    for name, detect, warp in (("legacy", legacy_detect, legacy_warp), ("docscan", detect_document, warp_document)):
+      started = time.perf_counter()
+      corners = detect(img)
+      detected = time.perf_counter()
+      if corners is not None:
+        warp(img, corners)
+      finished = time.perf_counter()
+      error = float(np.linalg.norm(corners - truth, axis=1).mean()) if corners is not None else None
+      results[name].append((detected - started, finished - started, error))
+
+  print(f"{count} pages, {size[0]}x{size[1]}")
+  print(f"{'engine':<10}{'detect ms':>11}{'total ms':>10}{'misses':>8}{'corner err px':>15}")
+  for name, rows in results.items():
+    errors = [e for _, _, e in rows if e is not None]
+    print(f"{name:<10}{statistics.median(r[0] for r in rows) * 1000:>11.1f}"
+          f"{statistics.median(r[1] for r in rows) * 1000:>10.1f}{len(rows) - len(errors):>8}"
+          f"{(statistics.mean(errors) if errors else float('nan')):>15.1f}")
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--count', type=int, default=20)
+  parser.add_argument('--size', type=int, nargs=2, default=[4032, 3024])
+  parser.add_argument('--seed', type=int, default=0)
+  args = parser.parse_args()
+  run(args.count, tuple(args.size), args.seed)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,162 @@
+"""
+OpenAI 호환 가짜 서버: /textgpt/question 스트리밍과 OpenAI 호출 경로를 실제 API 없이 확인할 때 사용합니다.
+
+  python benchmarks/fake_openai.py [--port 8765] [--tokens 200] [--delay 0.05] [--image-delay 5] [--fail-rate 0]
+  OPENAI_BASE_URL=http://127.0.0.1:8765/v1 flask run
+
+/v1/chat/completions 요청에 대해 --tokens개의 토큰을 --delay초 간격으로 돌려주며, "stream": true이면
+SSE(chat.completion.chunk)로 보냅니다. 클라이언트가 중간에 연결을 끊으면 몇 번째 토큰에서 끊겼는지 출력합니다.
+/v1/images/generations는 --image-delay초 뒤 1x1 PNG를 돌려주고, --fail-rate 비율만큼은 503/429로 실패시켜
+재시도를 확인할 수 있습니다. GET 요청은 지금까지의 요청/동시 처리 수 통계를 반환합니다.
+"""
+import argparse
+import base64
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 1x1 투명 PNG
+PIXEL_PNG = base64.b64encode(bytes.fromhex(
+  "89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c489"
+  "0000000d49444154789c6360606060000000050001a5f645400000000049454e44ae426082"
+)).decode("ascii")
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+  protocol_version = "HTTP/1.1"
+  tokens = 200
+  delay = 0.05
+  image_delay = 5.0
+  fail_rate = 0.0
+  stats = {"requests": 0, "completed": 0, "cancelled": 0, "failed": 0, "active": 0, "max_active": 0}
+  stats_lock = threading.Lock()
+
+  def log_message(self, format, *args):
+    pass
+
+  def handle(self):
+    try:
+      super().handle()
+    except ConnectionResetError:
+      pass  # keep-alive 연결을 클라이언트가 끊은 경우
+
+  def do_POST(self):
+    length = int(self.headers.get("Content-Length") or 0)
+    body = json.loads(self.rfile.read(length) or b"{}")
+    if not self.path.endswith(("/chat/completions", "/images/generations")):
+      self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+      return
+
+    self._count(requests=1, active=1)
+    try:
+      if random.random() < self.fail_rate:
+        self._count(failed=1)
+        status = random.choice((429, 503))
+        self._send_json(status, {"error": {"message": "fake upstream failure", "type": "server_error"}}, {"Retry-After": "0"})
+      elif self.path.endswith("/images/generations"):
+        time.sleep(self.image_delay)
+        self._send_json(200, {"created": int(time.time()), "data": [{"b64_json": PIXEL_PNG, "revised_prompt": body.get("prompt")}]})
+        self._count(completed=1)
+      elif body.get("stream"):
+        self._stream(body)
+      else:
+        time.sleep(self.delay * self.tokens)
+        words = " ".join(f"token{i}" for i in range(self.tokens))
+        self._send_json(200, self._completion(body, {"message": {"role": "assistant", "content": words}, "finish_reason": "stop"}))
+        self._count(completed=1)
+    finally:
+      self._count(active=-1)
+
+  def do_GET(self):
+    # 부하 테스트 결과 확인용
+    self._send_json(200, self.stats)
+
+  def _stream(self, body):
+    self.send_response(200)
+    self.send_header("Content-Type", "text/event-stream")
+    self.send_header("Transfer-Encoding", "chunked")
+    self.end_headers()
+    for i in range(self.tokens):
+      chunk = self._completion(body, {"delta": {"content": f"token{i} "}, "finish_reason": None}, "chat.completion.chunk")
+      try:
+        self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+      except (BrokenPipeError, ConnectionResetError):
+        print(f"client disconnected after {i} tokens")
+        self._count(cancelled=1)
+        return
+      time.sleep(self.delay)
+    done = self._completion(body, {"delta": {}, "finish_reason": "stop"}, "chat.completion.chunk")
+    try:
+      self._write_chunk(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n")
+      self._write_chunk("")
+      self._count(completed=1)
+    except (BrokenPipeError, ConnectionResetError):
+      self._count(cancelled=1)
+
+  def _write_chunk(self, text):
+    data = text.encode("utf-8")
+    self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+    self.wfile.flush()
+
+  @staticmethod
+  def _completion(body, choice, obj="chat.completion"):
+    return {
+      "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+      "object": obj,
+      "created": int(time.time()),
+      "model": body.get("model", "fake"),
+      "choices": [{"index": 0, **choice}],
+    }
+
+  def _send_json(self, status, payload, headers=None):
+    data = json.dumps(payload).encode("utf-8")
+    self.send_response(status)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(data)))
+    for name, value in (headers or {}).items():
+      self.send_header(name, value)
+    self.end_headers()
+    self.wfile.write(data)
+
+  @classmethod
+  def _count(cls, **deltas):
+    with cls.stats_lock:
+      for key, value in deltas.items():
+        cls.stats[key] += value
+      cls.stats["max_active"] = max(cls.stats["max_active"], cls.stats["active"])
+
+
+def serve(port=8765, tokens=200, delay=0.05, image_delay=5.0, fail_rate=0.0):
+  """백그라운드 스레드에서 서버를 시작하고 서버 객체를 반환 (다른 스크립트에서 사용)"""
+  FakeOpenAIHandler.tokens = tokens
+  FakeOpenAIHandler.delay = delay
+  FakeOpenAIHandler.image_delay = image_delay
+  FakeOpenAIHandler.fail_rate = fail_rate
+  server = ThreadingHTTPServer(("127.0.0.1", port), FakeOpenAIHandler)
+  server.daemon_threads = True
+  threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+  return server
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--port", type=int, default=8765)
+  parser.add_argument("--tokens", type=int, default=200)
+  parser.add_argument("--delay", type=float, default=0.05, help="토큰 사이 지연(초)")
+  parser.add_argument("--image-delay", type=float, default=5.0, help="이미지 생성 응답 지연(초)")
+  parser.add_argument("--fail-rate", type=float, default=0.0, help="429/503으로 실패시킬 요청 비율")
+  args = parser.parse_args()
+  serve(args.port, args.tokens, args.delay, args.image_delay, args.fail_rate)
+  print(f"fake OpenAI server on http://127.0.0.1:{args.port}/v1")
+  try:
+    while True:
+      time.sleep(3600)
+  except KeyboardInterrupt:
+    pass
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,154 @@
+"""
+OpenAI 게이트웨이 부하 테스트: 가짜 OpenAI 서버(benchmarks/fake_openai.py)를 띄우고 클라이언트 여러 개가
+크기가 --request-threads인 요청 스레드 풀(WSGI 워커 역할)을 거쳐 이미지 생성/채팅 호출을 계속 보내는 상황을 재현합니다.
+
+  python benchmarks/openai_gateway_load.py [--mode jobs] [--clients 64] [--request-threads 8] [--users 8] \\
+    [--duration 20] [--concurrency 16] [--per-user 4] [--kind image] [--image-delay 1] [--fail-rate 0.05]
+
+--mode call은 요청 스레드가 gateway.call()로 응답을 기다리는 방식, --mode jobs는 textgpt 뷰처럼
+gateway.spawn()으로 작업만 넘기고 바로 반환한 뒤 클라이언트가 결과를 기다리는 방식입니다.
+처리량, 지연 시간(p50/p95/최대), 실패 수, 요청 스레드를 잡고 있던 시간과 부하 중 가벼운 요청(probe)의
+응답 시간, 가짜 서버가 관측한 최대 동시 요청 수를 출력하므로 요청 스레드가 업스트림 응답에 묶이는지,
+전체/사용자별 동시 호출 제한이 지켜지는지, 일시적 오류가 재시도로 흡수되는지 확인할 수 있습니다.
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import fake_openai
+
+
+def upstream_request(kind):
+  if kind == "image":
+    return lambda client: client.images.generate(model="gpt-image-1", prompt="load test")
+  return lambda client: client.chat.completions.create(model="fake", messages=[{"role": "user", "content": "hi"}])
+
+
+def handle_call(gateway, user, kind):
+  """요청 스레드가 업스트림 응답까지 기다림"""
+  return gateway.call(upstream_request(kind), user=user)
+
+
+def handle_job(gateway, user, kind):
+  """요청 스레드는 게이트웨이에 작업만 넘기고 바로 반환 (textgpt의 submit_openai_job과 같은 방식)"""
+  async def work():
+    return await gateway.acall(upstream_request(kind), user=user)
+  return gateway.spawn(work)
+
+
+def timed(handler, held, lock, *args):
+  started = time.monotonic()
+  try:
+    return handler(*args)
+  finally:
+    with lock:
+      held.append(time.monotonic() - started)
+
+
+def run_client(gateway, pool, handler, user, kind, deadline, results, held, lock):
+  while time.monotonic() < deadline:
+    started = time.monotonic()
+    try:
+      reply = pool.submit(timed, handler, held, lock, gateway, user, kind).result()
+      if handler is handle_job:
+        # 클라이언트가 /textgpt/jobs/<id>로 결과를 기다리는 시간 (요청 스레드는 쓰지 않음)
+        reply.result()
+      outcome = "ok"
+    except Exception as e:
+      outcome = type(e).__name__
+    with lock:
+      results.append((outcome, time.monotonic() - started))
+
+
+def run_probe(pool, deadline, probes, interval=0.2):
+  """부하 중에 바로 끝나는 요청을 보내 요청 스레드 풀이 비어 있는지 확인"""
+  while time.monotonic() < deadline:
+    started = time.monotonic()
+    pool.submit(lambda: None).result()
+    probes.append(time.monotonic() - started)
+    time.sleep(interval)
+
+
+def percentile(values, fraction):
+  ordered = sorted(values)
+  return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--mode", choices=("call", "jobs"), default="jobs")
+  parser.add_argument("--clients", type=int, default=64, help="동시에 요청을 보내는 클라이언트 수")
+  parser.add_argument("--request-threads", type=int, default=8, help="요청 스레드 풀 크기 (WSGI 워커 스레드 역할)")
+  parser.add_argument("--users", type=int, default=8, help="요청을 나눠 가질 사용자 수")
+  parser.add_argument("--duration", type=float, default=20.0)
+  parser.add_argument("--concurrency", type=int, default=16)
+  parser.add_argument("--per-user", type=int, default=4)
+  parser.add_argument("--kind", choices=("image", "chat"), default="image")
+  parser.add_argument("--image-delay", type=float, default=1.0)
+  parser.add_argument("--tokens", type=int, default=20, help="채팅 응답 토큰 수 (지연 = tokens * delay)")
+  parser.add_argument("--delay", type=float, default=0.05)
+  parser.add_argument("--fail-rate", type=float, default=0.05)
+  parser.add_argument("--port", type=int, default=8766)
+  args = parser.parse_args()
+
+  server = fake_openai.serve(args.port, args.tokens, args.delay, args.image_delay, args.fail_rate)
+  os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+  os.environ.setdefault("OPENAI_API_KEY", "fake")
+  from voiceGPT.openai_gateway import OpenAIGateway
+
+  gateway = OpenAIGateway(max_concurrency=args.concurrency, per_user=args.per_user, timeout=30, retries=3, backoff=0.2)
+  pool = ThreadPoolExecutor(max_workers=args.request_threads, thread_name_prefix="request")
+  handler = handle_job if args.mode == "jobs" else handle_call
+  results = []
+  held = []
+  probes = []
+  lock = threading.Lock()
+  deadline = time.monotonic() + args.duration
+  threads = [
+    threading.Thread(target=run_client, args=(gateway, pool, handler, i % args.users, args.kind, deadline, results, held, lock))
+    for i in range(args.clients)
+  ]
+  threads.append(threading.Thread(target=run_probe, args=(pool, deadline, probes)))
+  started = time.monotonic()
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  elapsed = time.monotonic() - started
+  server.shutdown()
+  pool.shutdown()
+
+  latencies = [latency for outcome, latency in results if outcome == "ok"]
+  failures = {}
+  for outcome, _ in results:
+    if outcome != "ok":
+      failures[outcome] = failures.get(outcome, 0) + 1
+  stats = fake_openai.FakeOpenAIHandler.stats
+  limit = min(args.concurrency, args.users * args.per_user)
+  print(f"{args.mode}: {args.clients} clients / {args.request_threads} request threads / {args.users} users, {args.kind}, {elapsed:.1f}s")
+  print(f"completed {len(latencies)} ({len(latencies) / elapsed:.1f} req/s), failed {failures or 0}")
+  if latencies:
+    print(
+      f"latency p50 {statistics.median(latencies):.2f}s, p95 {percentile(latencies, 0.95):.2f}s, "
+      f"max {max(latencies):.2f}s"
+    )
+  if held:
+    print(f"request thread held p50 {statistics.median(held) * 1000:.1f}ms, p95 {percentile(held, 0.95) * 1000:.1f}ms")
+  if probes:
+    print(f"probe request latency p50 {statistics.median(probes) * 1000:.1f}ms, max {max(probes) * 1000:.1f}ms")
+  print(
+    f"upstream requests {stats['requests']} (injected failures {stats['failed']} retried), "
+    f"max concurrent upstream {stats['max_active']} (limit {limit})"
+  )
+
+
+if __name__ == "__main__":
+  main()
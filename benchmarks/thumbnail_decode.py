@@ -0,0 +1,178 @@
+"""
+썸네일 디코딩 벤치마크: 기존 전체 해상도 디코딩 경로와 축소 디코딩 경로(voiceGPT.storage.render)의
+실행 시간과 최대 메모리(RSS) 증가량을 생성한 샘플 이미지로 비교합니다.
+
+  python benchmarks/thumbnail_decode.py [--sizes 146 500] [--repeat 3] [--workdir /tmp/thumb_bench]
+
+각 측정은 새 프로세스에서 실행되므로 RSS 값은 서로 영향을 주지 않습니다.
+"""
+import argparse
+import multiprocessing
+import resource
+import statistics
+import struct
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from PIL import Image, ExifTags, UnidentifiedImageError
+import pillow_heif
+
+SAMPLES = [
+  # (파일명, 크기, EXIF 내장 썸네일 포함 여부)
+  ("photo_12mp_exifthumb.jpg", (4032, 3024), True),
+  ("photo_12mp.jpg", (4032, 3024), False),
+  ("photo_48mp.jpg", (8064, 6048), False),
+  ("photo_12mp.heic", (4032, 3024), False),
+]
+
+
+def legacy_render(file_path, img_size, backGroundColor):
+  """변경 전 encodeImageToBase64의 디코딩/축소 경로 (회전을 먼저 적용해 전체 비트맵을 디코딩)"""
+  try:
+    with Image.open(file_path) as img:
+      try:
+        for orientation in ExifTags.TAGS.keys():
+          if ExifTags.TAGS[orientation] == 'Orientation':
+            break
+        exif = img._getexif()
+        if exif is not None:
+          orientation = exif.get(orientation, None)
+          if orientation == 3:
+            img = img.rotate(180, expand=True)
+          elif orientation == 6:
+            img = img.rotate(270, expand=True)
+          elif orientation == 8:
+            img = img.rotate(90, expand=True)
+      except (AttributeError, KeyError, IndexError):
+        pass
+      img_buffer = BytesIO()
+      img.thumbnail((img_size, img_size), Image.LANCZOS)
+      img_out = Image.new('RGBA', (img_size, img_size), backGroundColor)
+      img_out.paste(img, ((img_size - img.width) // 2, (img_size - img.height) // 2))
+      img_out.save(img_buffer, format="PNG")
+      return img_buffer.getvalue()
+  except UnidentifiedImageError:
+    return None
+
+
+def _exif_with_thumbnail(orientation, thumb_jpeg):
+  """Orientation(IFD0)과 JPEG 썸네일(IFD1)만 담은 최소 EXIF 블록 생성"""
+  ifd0_offset = 8
+  ifd0 = struct.pack('<H', 1) + struct.pack('<HHII', 0x0112, 3, 1, orientation)
+  ifd1_offset = ifd0_offset + len(ifd0) + 4
+  ifd1_size = 2 + 3 * 12 + 4
+  thumb_offset = ifd1_offset + ifd1_size
+  ifd1 = struct.pack('<H', 3)
+  ifd1 += struct.pack('<HHII', 0x0103, 3, 1, 6)
+  ifd1 += struct.pack('<HHII', 0x0201, 4, 1, thumb_offset)
+  ifd1 += struct.pack('<HHII', 0x0202, 4, 1, len(thumb_jpeg))
+  tiff = b'II*\x00' + struct.pack('<I', ifd0_offset)
+  tiff += ifd0 + struct.pack('<I', ifd1_offset) + ifd1 + struct.pack('<I', 0) + thumb_jpeg
+  return b'Exif\x00\x00' + tiff
+
+
+def _sample_pixels(size, seed):
+  """그라디언트 + 노이즈로 카메라 사진과 비슷한 압축률을 갖는 픽셀 생성"""
+  width, height = size
+  rng = np.random.default_rng(seed)
+  x = np.linspace(0, 255, width, dtype=np.float32)
+  y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+  base = np.stack([np.broadcast_to(x, (height, width)), np.broadcast_to(y, (height, width)),
+                   np.broadcast_to((x + y) / 2, (height, width))], axis=-1)
+  noise = rng.normal(0, 12, size=(height, width, 3)).astype(np.float32)
+  return Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8))
+
+
+def generate_samples(workdir):
+  workdir.mkdir(parents=True, exist_ok=True)
+  paths = []
+  for seed, (name, size, with_thumb) in enumerate(SAMPLES):
+    path = workdir / name
+    paths.append(path)
+    if path.exists():
+      continue
+    img = _sample_pixels(size, seed)
+    if name.endswith('.heic'):
+      heif = pillow_heif.from_pillow(img)
+      heif.save(str(path), quality=85)
+      continue
+    exif = img.getexif()
+    exif[0x0112] = 6  # 세로로 촬영한 휴대폰 사진
+    exif_bytes = exif.tobytes()
+    if with_thumb:
+      thumb = img.copy()
+      thumb.thumbnail((160, 160))
+      buffer = BytesIO()
+      thumb.save(buffer, format='JPEG', quality=80)
+      exif_bytes = _exif_with_thumbnail(6, buffer.getvalue())
+    img.save(path, format='JPEG', quality=90, exif=exif_bytes)
+  return paths
+
+
+def _peak_rss_bytes():
+  # Linux의 ru_maxrss는 fork 전 부모의 RSS를 물려받으므로 가능하면 VmHWM을 사용
+  try:
+    with open('/proc/self/status') as f:
+      for line in f:
+        if line.startswith('VmHWM:'):
+          return int(line.split()[1]) * 1024
+  except OSError:
+    pass
+  peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _measure(variant, path, img_size, repeat, queue):
+  pillow_heif.register_heif_opener()
+  from voiceGPT.storage.render import renderImageThumbnail
+  render = legacy_render if variant == 'legacy' else renderImageThumbnail
+  background = (255, 255, 255, 0)
+  baseline = _peak_rss_bytes()
+  timings = []
+  for _ in range(repeat):
+    started = time.perf_counter()
+    data = render(str(path), img_size, background)
+    timings.append(time.perf_counter() - started)
+  queue.put((statistics.median(timings), _peak_rss_bytes() - baseline, bool(data)))
+
+
+def run(paths, sizes, repeat):
+  ctx = multiprocessing.get_context('spawn')
+  print(f"{'image':<26}{'size':>6}  {'legacy ms':>10}{'draft ms':>10}{'speedup':>9}  {'legacy MB':>10}{'draft MB':>10}")
+  for path in paths:
+    for img_size in sizes:
+      results = {}
+      for variant in ('legacy', 'draft'):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_measure, args=(variant, path, img_size, repeat, queue))
+        proc.start()
+        results[variant] = queue.get()
+        proc.join()
+      (lt, lm, lok), (dt, dm, dok) = results['legacy'], results['draft']
+      note = '' if lok and dok else '  (render failed)'
+      print(f"{path.name:<26}{img_size:>6}  {lt * 1000:>10.1f}{dt * 1000:>10.1f}{lt / dt:>8.1f}x"
+            f"  {lm / 2 ** 20:>10.1f}{dm / 2 ** 20:>10.1f}{note}")
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--sizes', type=int, nargs='+', default=[146, 500])
+  parser.add_argument('--repeat', type=int, default=3)
+  parser.add_argument('--workdir', type=Path, default=Path('/tmp/thumb_bench'))
+  args = parser.parse_args()
+  # 샘플 생성으로 커진 메모리가 측정 프로세스에 영향을 주지 않도록 별도 프로세스에서 생성
+  ctx = multiprocessing.get_context('spawn')
+  proc = ctx.Process(target=generate_samples, args=(args.workdir,))
+  proc.start()
+  proc.join()
+  paths = [args.workdir / name for name, _, _ in SAMPLES]
+  run(paths, args.sizes, args.repeat)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,94 @@
+import os
+from functools import lru_cache
+
+try:
+  import tiktoken
+except ImportError:  # tiktoken이 없으면 글자 수로 어림
+  tiktoken = None
+
+TOKEN_ENCODING = 'o200k_base'  # gpt-4o 이후 모델의 인코딩. 저장하는 토큰 수는 모델과 관계없이 이 기준
+MESSAGE_OVERHEAD = 4  # 메시지마다 role/구분자로 더해지는 토큰
+REPLY_RESERVE = int(os.getenv('TEXTGPT_REPLY_RESERVE_TOKENS', '4096'))  # 답변용으로 남겨둘 토큰
+HISTORY_MAX_TOKENS = int(os.getenv('TEXTGPT_HISTORY_MAX_TOKENS', '16000'))  # 이전 대화에 쓸 최대 토큰 (비용/지연 제한)
+
+# 모델 이름 접두어별 컨텍스트 길이 (긴 접두어 우선)
+MODEL_CONTEXT_WINDOWS = {
+  'gpt-5': 400000,
+  'gpt-4.1': 1047576,
+  'gpt-4o': 128000,
+  'gpt-4-turbo': 128000,
+  'gpt-4': 8192,
+  'gpt-3.5-turbo': 16385,
+  'o1': 200000,
+  'o3': 200000,
+  'o4': 200000,
+}
+DEFAULT_CONTEXT_WINDOW = 128000
+
+
+def parse_budgets(value):
+  """'gpt-4o-mini=8000,gpt-4.1=32000' 형식의 모델별 이전 대화 토큰 예산"""
+  budgets = {}
+  for item in (value or '').split(','):
+    name, _, tokens = item.partition('=')
+    if name.strip() and tokens.strip().isdigit():
+      budgets[name.strip()] = int(tokens)
+  return budgets
+
+
+HISTORY_BUDGETS = parse_budgets(os.getenv('TEXTGPT_HISTORY_BUDGETS'))
+
+
+def by_prefix(table, model, default):
+  for prefix in sorted(table, key=len, reverse=True):
+    if model.startswith(prefix):
+      return table[prefix]
+  return default
+
+
+@lru_cache(maxsize=1)
+def encoding():
+  return tiktoken.get_encoding(TOKEN_ENCODING)
+
+
+def count_tokens(text):
+  """text의 토큰 수. tiktoken이 없으면 ASCII 4글자당 1토큰, 그 외(한글 등) 1글자당 1토큰으로 어림"""
+  if not text:
+    return 0
+  if tiktoken is not None:
+    return len(encoding().encode(text, disallowed_special=()))
+  ascii_chars = sum(1 for char in text if ord(char) < 128)
+  return (ascii_chars + 3) // 4 + len(text) - ascii_chars
+
+
+def message_tokens(message):
+  """{"role", "content"} 메시지 하나가 차지하는 토큰 (저장된 "tokens"가 있으면 사용)"""
+  tokens = message.get('tokens')
+  if tokens is None:
+    tokens = count_tokens(message['content'])
+  return tokens + MESSAGE_OVERHEAD
+
+
+def history_budget(model, prompt_tokens):
+  """system 메시지와 새 질문(prompt_tokens)을 뺀 뒤 이전 대화에 쓸 수 있는 토큰"""
+  context = by_prefix(MODEL_CONTEXT_WINDOWS, model, DEFAULT_CONTEXT_WINDOW)
+  budget = by_prefix(HISTORY_BUDGETS, model, HISTORY_MAX_TOKENS)
+  return max(0, min(budget, context - REPLY_RESERVE - prompt_tokens))
+
+
+def fit_history(window, budget):
+  """
+  시간 순 메시지 목록(window)을 최신 것부터 budget 안에 들어가는 만큼 남김: (남긴 목록, 버린 목록).
+  답변만 남지 않도록 남긴 목록은 항상 user 메시지로 시작합니다.
+  """
+  used = 0
+  start = len(window)
+  while start > 0:
+    tokens = message_tokens(window[start - 1])
+    if used + tokens > budget:
+      break
+    used += tokens
+    start -= 1
+  while start < len(window) and window[start]['role'] != 'user':
+    start += 1
+  return window[start:], window[:start]
@@ -0,0 +1,118 @@
+import json
+import threading
+from collections import OrderedDict
+
+_UNKNOWN = object()  # Redis 오류로 버전을 알 수 없음 (읽은 값을 저장하지 않음)
+
+
+class ConversationCache:
+  """
+  주제(subject)별 최근 대화 창(OpenAI에 바로 보낼 {"role", "content"} 목록, 시간 순)을 보관하는 캐시.
+
+  기본은 프로세스 안의 LRU(max_subjects개 주제)이며, redis_url을 주면 여러 워커가 함께 쓰도록
+  Redis에 JSON으로 ttl초 동안 저장합니다. 창 크기(size)보다 큰 창이 저장되어 있으면 뒤쪽만 잘라 씁니다.
+  메시지가 추가/삭제된 주제는 invalidate()로 지워야 합니다. invalidate()는 주제의 버전을 올리고
+  (Redis에서는 워커가 함께 보는 INCR 카운터), DB를 읽기 전에 본 버전이 그 사이 바뀌었으면 읽은 값은
+  저장하지 않으므로 다른 워커가 읽던 이전 창이 무효화 뒤에 다시 저장되지 않습니다.
+  """
+
+  def __init__(self, max_subjects=512, redis_url=None, ttl=3600, prefix="textgpt:context:"):
+    self.max_subjects = max_subjects
+    self.ttl = ttl
+    self.prefix = prefix
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+    self._generation = 0
+    self._redis = None
+    if redis_url:
+      from redis import Redis
+      self._redis = Redis.from_url(redis_url, decode_responses=True)
+
+  def window(self, subject_id, size, load):
+    """최근 size개 메시지. 캐시에 없으면 load(subject_id, size)로 읽어 저장"""
+    if size <= 0:
+      return []
+    key = str(subject_id)
+    entry = self._get(key)
+    if entry is not None and (entry["size"] >= size or len(entry["messages"]) < entry["size"]):
+      return entry["messages"][-size:]
+    version = self._version(key)
+    messages = load(subject_id, size)
+    self._set(key, {"size": size, "messages": messages}, version)
+    return list(messages)
+
+  def invalidate(self, *subject_ids):
+    """메시지가 바뀐 주제들의 캐시 제거"""
+    keys = [str(subject_id) for subject_id in subject_ids if subject_id is not None]
+    if not keys:
+      return
+    with self._lock:
+      self._generation += 1
+      for key in keys:
+        self._entries.pop(key, None)
+    if self._redis is not None:
+      try:
+        pipe = self._redis.pipeline()
+        for key in keys:
+          pipe.incr(self._version_key(key))
+          pipe.delete(self.prefix + key)
+        pipe.execute()
+      except Exception as e:
+        print(f"Error invalidating conversation cache: {e}")
+
+  def _version_key(self, key):
+    return f"{self.prefix}version:{key}"
+
+  def _version(self, key):
+    if self._redis is None:
+      return self._generation
+    try:
+      return self._redis.get(self._version_key(key))
+    except Exception as e:
+      print(f"Error reading conversation cache: {e}")
+      return _UNKNOWN
+
+  def _get(self, key):
+    if self._redis is not None:
+      try:
+        value = self._redis.get(self.prefix + key)
+      except Exception as e:
+        print(f"Error reading conversation cache: {e}")
+        return None
+      return json.loads(value) if value else None
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is not None:
+        self._entries.move_to_end(key)
+      return entry
+
+  def _set(self, key, entry, version):
+    if version is _UNKNOWN:
+      return
+    if self._redis is not None:
+      self._set_redis(key, entry, version)
+      return
+    with self._lock:
+      if version != self._generation:
+        return
+      self._entries[key] = entry
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_subjects:
+        self._entries.popitem(last=False)
+
+  def _set_redis(self, key, entry, version):
+    """버전 키를 WATCH해 읽기 전과 버전이 같을 때만 저장 (그 사이 다른 워커가 무효화하면 저장 취소)"""
+    from redis.exceptions import WatchError
+    version_key = self._version_key(key)
+    try:
+      with self._redis.pipeline() as pipe:
+        pipe.watch(version_key)
+        if pipe.get(version_key) != version:
+          return
+        pipe.multi()
+        pipe.set(self.prefix + key, json.dumps(entry, ensure_ascii=False), ex=self.ttl)
+        pipe.execute()
+    except WatchError:
+      pass
+    except Exception as e:
+      print(f"Error writing conversation cache: {e}")
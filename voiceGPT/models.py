@@ -115,6 +115,7 @@ class Message(db.Model):
   create_date = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(tz('Asia/Seoul')))
   role = db.Column(db.Enum(RoleEnum), nullable=False)
   content = db.Column(db.Text(), nullable=False)
+  token_count = db.Column(db.Integer, nullable=True)  # content의 토큰 수 (없으면 이전 대화로 쓸 때 계산해 저장)
   msg_images = db.relationship('MsgImage', backref='message', cascade='all, delete-orphan', lazy=True)
   msg_files = db.relationship('MsgFile', backref='message', cascade='all, delete-orphan', lazy=True)
 
@@ -136,6 +137,28 @@ class MsgFile(db.Model):
   mimeType = db.Column(db.String(100), nullable=True)
   create_date = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(tz('Asia/Seoul')))
 
+# 토큰 예산을 넘어 잘린 이전 대화의 요약 (upto_message_id 이하 메시지를 대신함)
+class ConversationSummary(db.Model):
+  __tablename__ = 'conversation_summary'
+  id = db.Column(db.Integer, primary_key=True)
+  subject_id = db.Column(db.Integer, db.ForeignKey('subject.id', ondelete='CASCADE'), nullable=False, index=True)
+  upto_message_id = db.Column(db.Integer, nullable=False)
+  content = db.Column(db.Text(), nullable=False)
+  token_count = db.Column(db.Integer, nullable=False)
+  create_date = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(tz('Asia/Seoul')))
+  subject = db.relationship('Subject', backref=db.backref('summaries', cascade='all, delete-orphan', lazy=True))
+
+# 클라우드 저장소 공유 폴더 모델
+class SharedFolder(db.Model):
+  __tablename__ = 'shared_folder'
+  id = db.Column(db.Integer, primary_key=True)
+  uuid = db.Column(db.String(32), unique=True, nullable=False, index=True)
+  path = db.Column(db.String(1000), unique=True, nullable=False, index=True)
+  shareLink = db.Column(db.String(300), unique=True, nullable=False, index=True)
+  edit = db.Column(db.String(20), nullable=False, default='')
+  password = db.Column(db.String(200), nullable=False, default='')
+  create_date = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(tz('Asia/Seoul')))
+
 # 연도/학기 모델
 class SchoolYearInfo(db.Model):
   __tablename__ = 'school_year_info'
@@ -0,0 +1,209 @@
+import asyncio
+import queue
+import random
+import threading
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+# 다시 시도해도 되는 일시적 오류 (연결 실패/시간 초과, 429, 5xx)
+RETRYABLE_ERRORS = (
+  openai.APIConnectionError,
+  openai.RateLimitError,
+  openai.InternalServerError,
+  asyncio.TimeoutError,
+)
+# 요청이 서버에 도달하지 않았음이 확실한 연결 오류 (중복 실행 걱정 없이 다시 시도 가능)
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+_STREAM_END = object()
+
+
+class OpenAIGateway:
+  """
+  모든 OpenAI 호출을 하나의 asyncio 이벤트 루프 스레드에서 처리하는 게이트웨이.
+
+  AsyncOpenAI 클라이언트 하나(httpx 연결 풀)를 공유하며, 전체 동시 호출 수(max_concurrency)와
+  사용자별 동시 호출 수(per_user)를 세마포어로 제한합니다. 호출은 시도마다 timeout초로 제한하고,
+  일시적 오류는 지수 백오프 + 지터로 retries번까지 다시 시도합니다.
+
+  뷰에서는 AsyncOpenAI 클라이언트를 받아 코루틴을 돌려주는 함수를 넘깁니다.
+    response = gateway.call(lambda client: client.chat.completions.create(...), user=g.user.id)
+  요청 스레드가 응답을 기다리지 않게 하려면 여러 호출을 묶은 코루틴을 spawn()으로 이벤트 루프에 넘기고,
+  그 안에서는 gateway.acall(...)을 await합니다. spawn()은 concurrent.futures.Future를 바로 반환합니다.
+  다시 시도할 때마다 함수를 새로 호출하므로 업로드할 파일은 열린 파일 대신 (이름, 바이트)로 넘겨야 합니다.
+  이미지 생성처럼 중복 실행되면 비용이 드는 호출은 retry=False로 넘기며, 이때는 요청이 처리되지 않았음이
+  확실한 오류(429, 연결 실패)만 다시 시도하고 시간 초과나 전송 뒤 끊긴 연결은 그대로 오류로 돌려줍니다.
+  """
+
+  def __init__(self, max_concurrency=16, per_user=4, timeout=120.0, retries=2, backoff=0.5, max_backoff=20.0):
+    self.max_concurrency = max_concurrency
+    self.per_user = per_user
+    self.timeout = timeout
+    self.retries = retries
+    self.backoff = backoff
+    self.max_backoff = max_backoff
+    self._loop = None
+    self._client = None
+    self._limit = None
+    self._user_limits = {}
+    self._start_lock = threading.Lock()
+
+  def call(self, request, user=None, timeout=None, retry=True):
+    """request(client)가 돌려주는 코루틴을 게이트웨이에서 실행하고 결과를 반환 (현재 스레드는 결과를 기다림)"""
+    return self.submit(request, user, timeout, retry).result()
+
+  def submit(self, request, user=None, timeout=None, retry=True):
+    """call()과 같지만 concurrent.futures.Future를 바로 반환"""
+    loop = self._ensure_loop()
+    return asyncio.run_coroutine_threadsafe(self._run(request, user, timeout, retry), loop)
+
+  def spawn(self, work):
+    """코루틴 함수 work()를 게이트웨이 이벤트 루프에서 실행하고 concurrent.futures.Future를 바로 반환"""
+    loop = self._ensure_loop()
+    return asyncio.run_coroutine_threadsafe(work(), loop)
+
+  async def acall(self, request, user=None, timeout=None, retry=True):
+    """call()의 코루틴 버전. spawn()으로 넘긴 코루틴처럼 게이트웨이 이벤트 루프 안에서만 await할 수 있음"""
+    return await self._run(request, user, timeout, retry)
+
+  def stream(self, request, user=None, timeout=None):
+    """
+    스트리밍 응답(request(client)가 AsyncStream을 돌려줌)의 청크를 동기 제너레이터로 반환합니다.
+    제너레이터를 닫으면(브라우저 연결 끊김 등) 이벤트 루프의 작업을 취소해 업스트림 연결도 닫습니다.
+    연결 전 오류만 다시 시도하며, timeout은 청크 사이의 최대 대기 시간입니다.
+    """
+    loop = self._ensure_loop()
+    chunks = queue.Queue()
+    future = asyncio.run_coroutine_threadsafe(self._pump(request, user, chunks), loop)
+    try:
+      while True:
+        item = chunks.get(timeout=timeout or self.timeout)
+        if item is _STREAM_END:
+          break
+        if isinstance(item, BaseException):
+          raise item
+        yield item
+    except queue.Empty:
+      raise TimeoutError("No data from upstream stream")
+    finally:
+      future.cancel()
+
+  # --- 이벤트 루프 스레드 ---
+
+  def _ensure_loop(self):
+    with self._start_lock:
+      if self._loop is None:
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        threading.Thread(target=self._run_loop, args=(loop, ready), name="openai-gateway", daemon=True).start()
+        ready.wait()
+        self._loop = loop
+    return self._loop
+
+  def _run_loop(self, loop, ready):
+    asyncio.set_event_loop(loop)
+    # 재시도는 게이트웨이에서 하므로 클라이언트 자체 재시도는 끔
+    self._client = AsyncOpenAI(
+      max_retries=0,
+      http_client=httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+        timeout=httpx.Timeout(self.timeout, connect=10.0),
+      ),
+    )
+    self._limit = asyncio.Semaphore(self.max_concurrency)
+    ready.set()
+    loop.run_forever()
+
+  async def _run(self, request, user, timeout, retry):
+    async with self._slot(user):
+      return await self._with_retries(lambda: request(self._client), timeout, retry)
+
+  async def _pump(self, request, user, chunks):
+    stream = None
+    try:
+      async with self._slot(user):
+        stream = await self._with_retries(lambda: request(self._client), None, True)
+        async for chunk in stream:
+          chunks.put(chunk)
+      chunks.put(_STREAM_END)
+    except asyncio.CancelledError:
+      raise
+    except Exception as e:
+      chunks.put(e)
+    finally:
+      if stream is not None:
+        await stream.close()
+
+  async def _with_retries(self, attempt, timeout, retry):
+    for attempt_no in range(self.retries + 1):
+      try:
+        return await asyncio.wait_for(attempt(), timeout or self.timeout)
+      except RETRYABLE_ERRORS as e:
+        if attempt_no == self.retries or not (retry or self._not_processed(e)):
+          raise
+        await asyncio.sleep(self._delay(attempt_no, e))
+
+  @staticmethod
+  def _not_processed(error):
+    """서버가 요청을 처리하지 않았음이 확실한 오류인지 (429 또는 연결 자체가 안 된 경우)"""
+    if isinstance(error, openai.RateLimitError):
+      return True
+    return isinstance(error, openai.APIConnectionError) and isinstance(error.__cause__, NOT_SENT_ERRORS)
+
+  def _delay(self, retry, error):
+    """지수 백오프 상한 안에서 무작위로 기다림 (full jitter). 429의 Retry-After가 있으면 그 이상 기다림"""
+    delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** retry))
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+      try:
+        delay = max(delay, min(float(retry_after), self.max_backoff))
+      except ValueError:
+        pass
+    return delay
+
+  def _slot(self, user):
+    return _Slot(self, user)
+
+
+class _Slot:
+  """전체 세마포어와 사용자별 세마포어를 함께 잡는 컨텍스트. 쓰지 않는 사용자 세마포어는 정리"""
+
+  def __init__(self, gateway, user):
+    self.gateway = gateway
+    self.user = user
+    self.user_limit = None
+
+  async def __aenter__(self):
+    gateway = self.gateway
+    if self.user is not None:
+      entry = gateway._user_limits.get(self.user)
+      if entry is None:
+        entry = gateway._user_limits[self.user] = [asyncio.Semaphore(gateway.per_user), 0]
+      entry[1] += 1
+      self.user_limit = entry
+      try:
+        await entry[0].acquire()
+      except BaseException:
+        self._release_user(acquired=False)
+        raise
+    try:
+      await gateway._limit.acquire()
+    except BaseException:
+      self._release_user(acquired=True)
+      raise
+    return self
+
+  async def __aexit__(self, *exc):
+    self.gateway._limit.release()
+    self._release_user(acquired=True)
+
+  def _release_user(self, acquired):
+    entry = self.user_limit
+    if entry is None:
+      return
+    if acquired:
+      entry[0].release()
+    entry[1] -= 1
+    if entry[1] == 0:
+      self.gateway._user_limits.pop(self.user, None)
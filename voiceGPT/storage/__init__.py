@@ -0,0 +1,5 @@
+import os
+from pathlib import Path
+
+# 클라우드 저장소 캐시(인덱스, 썸네일 등)를 보관할 위치. 데이터 드라이브가 아닌 서버 작업 디렉토리에 둔다.
+CACHE_DIR = Path(os.getenv("CLOUDSTORAGE_CACHE_DIR", ".cloudstorage"))
@@ -0,0 +1,164 @@
+import os
+import json
+import stat
+import time
+import uuid
+import shutil
+import unicodedata
+
+TRASH_DIR_NAME = '.trash'
+
+# dir_fd 기준 삭제를 지원하는 플랫폼(Linux, MacOS)에서만 단일 순회 삭제 사용
+_SUPPORTS_FD = {os.open, os.unlink, os.rmdir} <= os.supports_dir_fd and os.scandir in os.supports_fd
+
+
+class DeleteLimitReached(Exception):
+  """ItemLimit으로 제한한 개수만큼 지운 뒤 remove_path를 멈출 때 발생"""
+
+
+class ItemLimit:
+  """
+  remove_path의 progress로 넘겨 지운 항목 수를 순회하면서 세고, limit개에 이르면 DeleteLimitReached로 멈춤.
+  미리 하위 항목 수를 세지 않고도 요청 스레드에서 지울 양을 제한할 수 있습니다.
+  """
+
+  def __init__(self, limit):
+    self.limit = limit
+    self.items_done = 0
+
+  def item_done(self, current=None):
+    self.items_done += 1
+    if self.items_done >= self.limit:
+      raise DeleteLimitReached(current)
+
+
+def resolve_path(path):
+  """
+  요청 경로를 디스크에 실제로 있는 이름으로 바꿉니다. 그대로, NFD, NFC 순으로 한 번만 확인하며,
+  하위 항목은 scandir가 돌려주는 실제 이름을 쓰므로 항목마다 정규화를 다시 시도할 필요가 없습니다.
+  없으면 None.
+  """
+  for candidate in (path, unicodedata.normalize("NFD", path), unicodedata.normalize("NFC", path)):
+    if os.path.lexists(candidate):
+      return candidate
+  return None
+
+
+def remove_path(path, progress=None):
+  """
+  파일 또는 폴더를 삭제. 폴더는 한 번의 순회로 하위 항목을 dir_fd 기준으로 지웁니다.
+  이미 없는 경로나 순회 중에 다른 곳에서 먼저 지운 항목은 건너뜁니다.
+  """
+  if not os.path.isdir(path) or os.path.islink(path):
+    if _retry_writable(os.unlink, os.path.basename(path), parent=os.path.dirname(path)):
+      _done(progress, path)
+    return
+  if not _SUPPORTS_FD:
+    shutil.rmtree(path, onerror=_ignore_missing)
+    _done(progress, path)
+    return
+
+  try:
+    parent_fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY | os.O_DIRECTORY)
+  except FileNotFoundError:
+    return
+  try:
+    name = os.path.basename(path)
+    try:
+      fd = os.open(name, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW, dir_fd=parent_fd)
+    except FileNotFoundError:
+      return
+    try:
+      _clear_dir(fd, progress)
+    finally:
+      os.close(fd)
+    if _retry_writable(os.rmdir, name, dir_fd=parent_fd):
+      _done(progress, path)
+  finally:
+    os.close(parent_fd)
+
+
+def _clear_dir(dir_fd, progress):
+  # 순회 중에 지우면 항목을 건너뛸 수 있으므로 목록을 먼저 읽음
+  with os.scandir(dir_fd) as it:
+    entries = [(entry.name, entry.is_dir(follow_symlinks=False)) for entry in it]
+  for name, is_dir in entries:
+    if is_dir:
+      try:
+        fd = os.open(name, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW, dir_fd=dir_fd)
+      except FileNotFoundError:
+        continue
+      try:
+        _clear_dir(fd, progress)
+      finally:
+        os.close(fd)
+      removed = _retry_writable(os.rmdir, name, dir_fd=dir_fd)
+    else:
+      removed = _retry_writable(os.unlink, name, dir_fd=dir_fd)
+    if removed:
+      _done(progress, name)
+
+
+def _retry_writable(func, name, dir_fd=None, parent=None):
+  """
+  권한 오류면 상위 폴더에 쓰기 권한을 준 뒤 한 번 더 시도 (읽기 전용 폴더 안의 항목).
+  지웠으면 True, 이미 없었으면 False.
+  """
+  try:
+    try:
+      if dir_fd is not None:
+        func(name, dir_fd=dir_fd)
+      else:
+        func(os.path.join(parent, name))
+    except PermissionError:
+      if dir_fd is not None:
+        os.fchmod(dir_fd, stat.S_IRWXU)
+        func(name, dir_fd=dir_fd)
+      else:
+        os.chmod(parent, stat.S_IRWXU)
+        func(os.path.join(parent, name))
+  except FileNotFoundError:
+    return False
+  return True
+
+
+def _ignore_missing(func, path, exc_info):
+  """shutil.rmtree onerror: 이미 지워진 항목은 무시"""
+  if not issubclass(exc_info[0], FileNotFoundError):
+    raise exc_info[1]
+
+
+def _done(progress, current):
+  if progress is not None:
+    progress.item_done(current)
+
+
+def move_to_trash(path, root):
+  """
+  root/.trash/<삭제 시각>_<ID>/ 아래로 이름만 바꿔 즉시 삭제한 것처럼 처리합니다.
+  원래 경로는 같은 폴더의 .origin.json에 남겨 필요하면 되돌릴 수 있게 합니다. 휴지통 안 경로를 반환합니다.
+  """
+  root = os.fspath(root)
+  slot = os.path.join(root, TRASH_DIR_NAME, f"{int(time.time())}_{uuid.uuid4().hex[:8]}")
+  os.makedirs(slot)
+  target = os.path.join(slot, os.path.basename(path))
+  os.rename(path, target)
+  with open(os.path.join(slot, '.origin.json'), 'w', encoding='utf-8') as f:
+    json.dump({"path": os.path.relpath(path, root), "deleted": time.time()}, f, ensure_ascii=False)
+  return target
+
+
+def expired_trash(root, max_age):
+  """max_age초보다 오래된 휴지통 항목 경로 목록"""
+  trash = os.path.join(os.fspath(root), TRASH_DIR_NAME)
+  cutoff = time.time() - max_age
+  expired = []
+  try:
+    with os.scandir(trash) as it:
+      for entry in it:
+        deleted = entry.name.split('_', 1)[0]
+        if deleted.isdigit() and int(deleted) < cutoff:
+          expired.append(entry.path)
+  except FileNotFoundError:
+    pass
+  return expired
@@ -0,0 +1,294 @@
+import os
+import time
+import threading
+from .store import SQLiteStore, path_key, subtree_bounds
+
+
+class DirectoryIndex(SQLiteStore):
+  """
+  디렉토리별 누적 크기/파일 수/폴더 수/최종 수정 시각을 SQLite에 저장하는 인덱스.
+
+  각 행은 해당 폴더의 mtime과 함께 저장되며, 조회 시 mtime이 달라졌으면 그 폴더만
+  다시 스캔하고(하위 폴더는 저장된 값을 재사용) 상위 폴더들의 누적값을 갱신합니다.
+  폴더 mtime은 직속 항목이 추가/삭제/이름변경될 때만 바뀌므로, 클라우드 저장소 API로
+  파일을 덮어쓰는 경우에는 changed()/moved()를 호출해 명시적으로 갱신해야 합니다.
+
+  폴더를 다시 집계할 때 직속 파일의 확장자별 합계(dir_ext_stats)를 바꾸면서 그 차이만큼 전체 확장자별
+  합계(ext_totals)도 갱신하므로, 사용량 통계는 파일 수와 관계없이 저장된 집계 행만 읽어 계산합니다.
+  """
+  schema = """
+  CREATE TABLE IF NOT EXISTS dir_stats (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    files INTEGER NOT NULL,
+    dirs INTEGER NOT NULL,
+    latest REAL NOT NULL
+  );
+  CREATE INDEX IF NOT EXISTS ix_dir_stats_parent_size ON dir_stats (parent, size);
+  CREATE TABLE IF NOT EXISTS dir_ext_stats (
+    path TEXT NOT NULL,
+    ext TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    files INTEGER NOT NULL,
+    PRIMARY KEY (path, ext)
+  );
+  CREATE TABLE IF NOT EXISTS ext_totals (
+    ext TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    files INTEGER NOT NULL
+  );
+  CREATE INDEX IF NOT EXISTS ix_ext_totals_size ON ext_totals (size);
+  CREATE TABLE IF NOT EXISTS usage_snapshots (
+    taken INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    files INTEGER NOT NULL,
+    PRIMARY KEY (path, taken)
+  );
+  """
+
+  def __init__(self, root, db_path):
+    self.root = os.fspath(root)
+    self.root_key = path_key(self.root)
+    self._warming = False
+    self._sampler = None
+    super().__init__(db_path)
+    conn = self.connect()
+    if conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+      # 확장자별 집계가 없던 이전 dir_index.db는 다시 구축해야 합계가 맞음
+      with conn:
+        conn.execute("DELETE FROM dir_stats")
+        conn.execute("DELETE FROM dir_ext_stats")
+        conn.execute("DELETE FROM ext_totals")
+      conn.execute("PRAGMA user_version = 1")
+
+  def stat(self, path):
+    """폴더의 누적 정보를 {'size', 'files', 'dirs', 'latest'} 형태로 반환"""
+    return self._stat(os.fspath(path), propagate=True)
+
+  def cached(self, path):
+    """저장된 누적 정보만 반환 (없으면 None). 스캔하지 않으므로 최신이 아닐 수 있음"""
+    row = self.connect().execute(
+      "SELECT mtime, size, files, dirs, latest FROM dir_stats WHERE path = ?", (path_key(path),)
+    ).fetchone()
+    return dict(row) if row is not None else None
+
+  def changed(self, *paths):
+    """파일/폴더가 생성, 수정, 삭제된 뒤 호출. 해당 경로의 캐시를 버리고 상위 폴더를 다시 집계"""
+    conn = self.connect()
+    parents = []
+    for path in paths:
+      path = os.fspath(path).rstrip('/')
+      with conn:
+        self._discard(conn, path_key(path))
+      parent = os.path.dirname(path)
+      if parent not in parents:
+        parents.append(parent)
+    for parent in parents:
+      self._refresh_upward(parent)
+
+  def refresh(self, *dirs):
+    """폴더의 직속 목록만 바뀐 경우 호출. 그 폴더와 상위 폴더만 다시 집계 (하위 폴더 값은 재사용)"""
+    for path in dirs:
+      self._refresh_upward(os.fspath(path).rstrip('/') or '/')
+
+  def moved(self, src, dst):
+    """이름 변경/이동 후 호출. 하위 폴더 캐시를 새 경로로 옮겨 재스캔 없이 재사용"""
+    src, dst = os.fspath(src).rstrip('/'), os.fspath(dst).rstrip('/')
+    src_key, dst_key = path_key(src), path_key(dst)
+    lower, upper = subtree_bounds(src_key)
+    conn = self.connect()
+    with conn:
+      self._discard(conn, dst_key)
+      conn.execute(
+        "UPDATE dir_stats SET path = ? || substr(path, ?), parent = ? || substr(parent, ?) "
+        "WHERE path >= ? AND path < ?",
+        (dst_key, len(src_key) + 1, dst_key, len(src_key) + 1, lower, upper),
+      )
+      conn.execute(
+        "UPDATE dir_stats SET path = ?, parent = ? WHERE path = ?",
+        (dst_key, path_key(os.path.dirname(dst)), src_key),
+      )
+      conn.execute(
+        "UPDATE dir_ext_stats SET path = ? || substr(path, ?) WHERE path = ? OR (path >= ? AND path < ?)",
+        (dst_key, len(src_key) + 1, src_key, lower, upper),
+      )
+    self._refresh_upward(os.path.dirname(src))
+    if os.path.dirname(dst) != os.path.dirname(src):
+      self._refresh_upward(os.path.dirname(dst))
+
+  def warm_async(self):
+    """루트 전체 인덱스를 백그라운드 스레드에서 미리 구축"""
+    if self._warming:
+      return
+    self._warming = True
+
+    def run():
+      try:
+        self.stat(self.root)
+      except Exception as e:
+        print(f"Error warming directory index: {e}")
+      finally:
+        self._warming = False
+
+    threading.Thread(target=run, name="dir-index-warm", daemon=True).start()
+
+  def usage(self, path=None, top=10, since=None):
+    """
+    사용량 통계: path(기본값 루트)의 누적값, 크기순 하위 폴더 top개, 전체 확장자별 합계 top개,
+    since 이후 path의 스냅샷 목록. 저장된 집계만 읽으며 아직 집계되지 않은 폴더면 None.
+    """
+    key = path_key(path) if path is not None else self.root_key
+    conn = self.connect()
+    row = conn.execute("SELECT size, files, dirs, latest FROM dir_stats WHERE path = ?", (key,)).fetchone()
+    if row is None:
+      return None
+    folders = conn.execute(
+      "SELECT path, size, files, dirs FROM dir_stats WHERE parent = ? ORDER BY size DESC LIMIT ?", (key, top)
+    ).fetchall()
+    extensions = conn.execute("SELECT ext, size, files FROM ext_totals ORDER BY size DESC LIMIT ?", (top,)).fetchall()
+    history = conn.execute(
+      "SELECT taken, size, files FROM usage_snapshots WHERE path = ? AND taken >= ? ORDER BY taken",
+      (key, since or 0),
+    ).fetchall()
+    return {
+      **dict(row),
+      "folders": [dict(r) for r in folders],
+      "extensions": [dict(r) for r in extensions],
+      "history": [dict(r) for r in history],
+    }
+
+  def sample(self):
+    """루트와 루트 바로 아래 폴더들의 현재 누적값을 스냅샷으로 기록 (사용량 추이용)"""
+    self.stat(self.root)
+    taken = int(time.time())
+    conn = self.connect()
+    with conn:
+      conn.execute(
+        "INSERT OR REPLACE INTO usage_snapshots (taken, path, size, files) "
+        "SELECT ?, path, size, files FROM dir_stats WHERE path = ? OR parent = ?",
+        (taken, self.root_key, self.root_key),
+      )
+
+  def start_sampling(self, interval=6 * 60 * 60):
+    """백그라운드 스레드에서 interval초마다 사용량 스냅샷 기록 (처음 한 번만 시작)"""
+    if self._sampler is not None:
+      return
+    def run():
+      while True:
+        try:
+          self.sample()
+        except Exception as e:
+          print(f"Error sampling drive usage: {e}")
+        time.sleep(interval)
+    self._sampler = threading.Thread(target=run, name="dir-index-sample", daemon=True)
+    self._sampler.start()
+
+  def _stat(self, path, propagate):
+    key = path_key(path)
+    st = os.stat(path)
+    row = self.connect().execute(
+      "SELECT mtime, size, files, dirs, latest FROM dir_stats WHERE path = ?", (key,)
+    ).fetchone()
+    if row is not None and row["mtime"] == st.st_mtime:
+      return dict(row)
+
+    entry = self._build(path, st)
+    # 기존 값이 있었다면 상위 폴더 누적값도 바뀌었으므로 다시 집계
+    if row is not None and propagate:
+      self._refresh_upward(os.path.dirname(path))
+    return entry
+
+  def _build(self, path, st):
+    """폴더의 직속 항목만 스캔하고, 하위 폴더 값은 인덱스에서 가져와 합산"""
+    size = files = dirs = 0
+    latest = st.st_mtime
+    child_keys = set()
+    ext_stats = {}
+    with os.scandir(path) as entries:
+      for entry in entries:
+        try:
+          if entry.is_dir(follow_symlinks=False):
+            child = self._stat(entry.path, propagate=False)
+            child_keys.add(path_key(entry.path))
+            dirs += 1 + child["dirs"]
+            files += child["files"]
+            size += child["size"]
+            latest = max(latest, child["latest"])
+          else:
+            entry_stat = entry.stat()
+            files += 1
+            size += entry_stat.st_size
+            latest = max(latest, entry_stat.st_mtime)
+            ext = ext_stats.setdefault(os.path.splitext(entry.name)[1].lower(), [0, 0])
+            ext[0] += entry_stat.st_size
+            ext[1] += 1
+        except OSError:
+          # 스캔 도중 삭제되었거나 접근할 수 없는 항목은 건너뜀
+          continue
+
+    key = path_key(path)
+    conn = self.connect()
+    with conn:
+      stale = [
+        r["path"] for r in conn.execute("SELECT path FROM dir_stats WHERE parent = ?", (key,))
+        if r["path"] not in child_keys
+      ]
+      for stale_key in stale:
+        self._discard(conn, stale_key)
+      conn.execute(
+        "INSERT OR REPLACE INTO dir_stats (path, parent, mtime, size, files, dirs, latest) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (key, path_key(os.path.dirname(path)), st.st_mtime, size, files, dirs, latest),
+      )
+      self._replace_ext_stats(conn, key, ext_stats)
+    return {"mtime": st.st_mtime, "size": size, "files": files, "dirs": dirs, "latest": latest}
+
+  def _refresh_upward(self, path):
+    """path부터 루트까지 각 폴더를 다시 집계 (하위 폴더는 저장된 값 재사용)"""
+    while True:
+      key = path_key(path)
+      if key != self.root_key and not key.startswith(self.root_key + '/'):
+        return
+      if os.path.isdir(path):
+        self._build(path, os.stat(path))
+      if key == self.root_key:
+        return
+      path = os.path.dirname(path)
+
+  def _replace_ext_stats(self, conn, key, ext_stats):
+    """폴더 직속 파일의 확장자별 합계를 바꾸고 이전 값과의 차이를 전체 합계에 반영"""
+    deltas = {ext: [size, files] for ext, (size, files) in ext_stats.items()}
+    for r in conn.execute("SELECT ext, size, files FROM dir_ext_stats WHERE path = ?", (key,)):
+      delta = deltas.setdefault(r["ext"], [0, 0])
+      delta[0] -= r["size"]
+      delta[1] -= r["files"]
+    conn.execute("DELETE FROM dir_ext_stats WHERE path = ?", (key,))
+    conn.executemany(
+      "INSERT INTO dir_ext_stats (path, ext, size, files) VALUES (?, ?, ?, ?)",
+      [(key, ext, size, files) for ext, (size, files) in ext_stats.items()],
+    )
+    self._apply_ext_deltas(conn, deltas)
+
+  @staticmethod
+  def _apply_ext_deltas(conn, deltas):
+    changed = [(ext, size, files) for ext, (size, files) in deltas.items() if size or files]
+    conn.executemany(
+      "INSERT INTO ext_totals (ext, size, files) VALUES (?, ?, ?) "
+      "ON CONFLICT (ext) DO UPDATE SET size = size + excluded.size, files = files + excluded.files",
+      changed,
+    )
+    conn.executemany("DELETE FROM ext_totals WHERE ext = ? AND files <= 0", [(ext,) for ext, _, _ in changed])
+
+  def _discard(self, conn, key):
+    lower, upper = subtree_bounds(key)
+    conn.execute("DELETE FROM dir_stats WHERE path = ? OR (path >= ? AND path < ?)", (key, lower, upper))
+    removed = conn.execute(
+      "SELECT ext, SUM(size) AS size, SUM(files) AS files FROM dir_ext_stats "
+      "WHERE path = ? OR (path >= ? AND path < ?) GROUP BY ext",
+      (key, lower, upper),
+    ).fetchall()
+    conn.execute("DELETE FROM dir_ext_stats WHERE path = ? OR (path >= ? AND path < ?)", (key, lower, upper))
+    self._apply_ext_deltas(conn, {r["ext"]: [-r["size"], -r["files"]] for r in removed})
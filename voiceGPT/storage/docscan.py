@@ -0,0 +1,172 @@
+import cv2
+import numpy as np
+from .render import get_render_pool
+
+DETECT_MAX_SIDE = 1000  # 문서 검출은 긴 변을 이 크기로 줄인 사본에서 수행
+MIN_AREA_RATIO = 0.15   # 이미지 면적 대비 최소 문서 면적
+MAX_AREA_RATIO = 0.95   # 이보다 크면 이미지 테두리 자체를 잡은 것으로 봄
+MAX_CORNER_COS = 0.5    # 꼭짓점 각도가 90도에서 벗어난 정도의 허용 한계 (cos 60도)
+CANDIDATES_PER_MASK = 8
+
+
+def order_points(pts):
+  """(4, 2) 꼭짓점을 좌상, 우상, 우하, 좌하 순서로 정렬"""
+  rect = np.zeros((4, 2), dtype="float32")
+  s = pts.sum(axis=1)
+  rect[0] = pts[np.argmin(s)]  # 좌상
+  rect[2] = pts[np.argmax(s)]  # 우하
+  diff = np.diff(pts, axis=1)
+  rect[1] = pts[np.argmin(diff)]  # 우상
+  rect[3] = pts[np.argmax(diff)]  # 좌하
+  return rect
+
+
+def _candidate_quads(gray):
+  """Otsu 이진화와 Canny 에지에서 큰 외곽선을 골라 사각형 후보와 외곽선 면적을 반환"""
+  blur = cv2.GaussianBlur(gray, (5, 5), 0)
+  _, otsu = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+  edges = cv2.dilate(cv2.Canny(blur, 50, 150), np.ones((3, 3), np.uint8))
+
+  quads, areas = [], []
+  for mask in (otsu, edges):
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    contours = sorted(contours, key=cv2.contourArea, reverse=True)[:CANDIDATES_PER_MASK]
+    for contour in contours:
+      hull = cv2.convexHull(contour)
+      approx = cv2.approxPolyDP(hull, 0.02 * cv2.arcLength(hull, True), True).reshape(-1, 2)
+      if not 4 <= len(approx) <= 8:
+        continue
+      # 모서리가 잘려 5~8각형이 된 경우 양 끝 꼭짓점으로 사각형을 만듦
+      quads.append(order_points(approx.astype("float32")))
+      areas.append(cv2.contourArea(contour))
+  if not quads:
+    return None, None
+  return np.stack(quads), np.array(areas, dtype="float32")
+
+
+def _score_quads(quads, contour_areas, image_area):
+  """
+  (N, 4, 2) 사각형 후보를 한 번에 점수화합니다.
+  면적 비율 × 외곽선이 사각형을 채우는 정도 × 직각에 가까운 정도. 조건에 맞지 않으면 0점.
+  """
+  x, y = quads[..., 0], quads[..., 1]
+  quad_area = 0.5 * np.abs(np.sum(x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y, axis=1))
+  edges = np.roll(quads, -1, axis=1) - quads
+  prev_edges = np.roll(edges, 1, axis=1)
+  norms = np.linalg.norm(edges, axis=2) * np.linalg.norm(prev_edges, axis=2)
+  cos = np.abs(np.sum(edges * prev_edges, axis=2)) / np.maximum(norms, 1e-6)
+  max_cos = cos.max(axis=1)
+
+  area_ratio = quad_area / image_area
+  fill = np.minimum(contour_areas / np.maximum(quad_area, 1e-6), 1.0)
+  score = area_ratio * fill * (1 - max_cos)
+  valid = (area_ratio >= MIN_AREA_RATIO) & (area_ratio <= MAX_AREA_RATIO) & (max_cos <= MAX_CORNER_COS) & (norms.min(axis=1) > 0)
+  return np.where(valid, score, 0)
+
+
+def _refine_corners(gray, corners, scale, samples=48):
+  """
+  축소본에서 찾은 꼭짓점을 원본 해상도에서 보정합니다.
+  각 변을 따라 수직 방향 밝기 단면을 한 번의 remap으로 뽑아 경계(기울기 최대) 위치를 찾고,
+  변마다 직선을 맞춘 뒤 이웃한 두 직선의 교점을 새 꼭짓점으로 씁니다.
+  """
+  half = int(max(4, round(scale * 3)))
+  offsets = np.arange(-half, half + 1, dtype="float32")
+  starts, ends = corners, np.roll(corners, -1, axis=0)
+  direction = ends - starts
+  normals = np.stack([-direction[:, 1], direction[:, 0]], axis=1) / np.linalg.norm(direction, axis=1, keepdims=True)
+
+  t = np.linspace(0.1, 0.9, samples, dtype="float32")
+  points = starts[:, None, :] + direction[:, None, :] * t[None, :, None]                  # (4, S, 2)
+  profile_xy = points[:, :, None, :] + normals[:, None, None, :] * offsets[None, None, :, None]  # (4, S, L, 2)
+  profiles = cv2.remap(
+    gray, profile_xy[..., 0].reshape(4 * samples, -1), profile_xy[..., 1].reshape(4 * samples, -1),
+    cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE,
+  ).astype("float32").reshape(4, samples, -1)
+  gradient = np.abs(np.diff(profiles, axis=2))
+  edge_offsets = offsets[gradient.argmax(axis=2)] + 0.5
+  strength = gradient.max(axis=2)
+  edge_points = points + normals[:, None, :] * edge_offsets[..., None]
+
+  lines = []
+  for side in range(4):
+    keep = strength[side] >= 0.5 * np.median(strength[side])
+    if keep.sum() < samples // 4:
+      return corners
+    vx, vy, x0, y0 = cv2.fitLine(edge_points[side][keep], cv2.DIST_HUBER, 0, 0.01, 0.01).ravel()
+    lines.append((np.array([vx, vy]), np.array([x0, y0])))
+
+  refined = corners.copy()
+  for i in range(4):
+    (d1, p1), (d2, p2) = lines[i - 1], lines[i]
+    A = np.array([d1, -d2]).T
+    if abs(np.linalg.det(A)) < 1e-6:
+      continue
+    u = np.linalg.solve(A, p2 - p1)[0]
+    new = p1 + u * d1
+    # 축소 배율의 몇 배 이상 움직였다면 다른 경계에 끌려간 것이므로 버림
+    if np.linalg.norm(new - corners[i]) <= scale * 3:
+      refined[i] = new
+  return refined
+
+
+def detect_document(img, max_side=DETECT_MAX_SIDE):
+  """원본 BGR 이미지에서 문서 꼭짓점(4, 2)을 찾아 반환. 찾지 못하면 None"""
+  full_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+  # 정수 배율로 나누어떨어지는 크기일 때 INTER_AREA가 빠른 경로를 타므로 가장자리를 잘라 맞춤
+  factor = -(-max(full_gray.shape) // max_side)
+  height, width = full_gray.shape[0] // factor * factor, full_gray.shape[1] // factor * factor
+  gray = full_gray
+  if factor > 1:
+    gray = cv2.resize(full_gray[:height, :width], (width // factor, height // factor), interpolation=cv2.INTER_AREA)
+
+  quads, areas = _candidate_quads(gray)
+  if quads is None:
+    return None
+  scores = _score_quads(quads, areas, gray.shape[0] * gray.shape[1])
+  best = int(np.argmax(scores))
+  if scores[best] <= 0:
+    return None
+  return _refine_corners(full_gray, quads[best] * factor, factor)
+
+
+def warp_document(img, corners):
+  """꼭짓점 사이 거리로 결과 크기를 정해 한 번의 원근 변환으로 펼침"""
+  tl, tr, br, bl = corners
+  out_width = int(round(max(np.linalg.norm(tr - tl), np.linalg.norm(br - bl))))
+  out_height = int(round(max(np.linalg.norm(bl - tl), np.linalg.norm(br - tr))))
+  dst = np.array([[0, 0], [out_width - 1, 0], [out_width - 1, out_height - 1], [0, out_height - 1]], dtype="float32")
+  M = cv2.getPerspectiveTransform(corners.astype("float32"), dst)
+  return cv2.warpPerspective(img, M, (out_width, out_height), flags=cv2.INTER_LINEAR)
+
+
+def rectify_document(img_path):
+  """
+  사진에서 학습지(문서) 영역을 찾아 반듯하게 펼친 이미지로 덮어씁니다.
+  문서를 찾았으면 True, 찾지 못해 원본을 그대로 두었으면 False.
+  """
+  img = cv2.imread(img_path)
+  if img is None:
+    raise FileNotFoundError(f"이미지 파일을 찾을 수 없습니다: {img_path}")
+  corners = detect_document(img)
+  if corners is None:
+    return False
+  cv2.imwrite(img_path, warp_document(img, corners))
+  return True
+
+
+def _rectify_safely(img_path):
+  try:
+    return rectify_document(img_path)
+  except Exception as e:
+    print(f"Error rectifying {img_path}: {e}")
+    return None
+
+
+def rectify_documents(img_paths):
+  """
+  사진들을 공유 프로세스 풀에서 보정합니다. 업로드 작업처럼 한 장씩 들어와도 풀에서 실행하므로
+  OpenCV 연산이 작업 스레드(요청을 처리하는 프로세스)의 CPU를 쓰지 않습니다.
+  각 경로에 대해 True(보정됨)/False(문서 없음)/None(오류) 목록을 반환합니다.
+  """
+  return list(get_render_pool().map(_rectify_safely, img_paths))
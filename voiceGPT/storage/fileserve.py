@@ -0,0 +1,134 @@
+import os
+import uuid
+import mimetypes
+import datetime
+from urllib.parse import quote
+from flask import request, send_file, Response
+from werkzeug.http import parse_range_header, is_resource_modified, http_date
+
+# 한 요청에서 허용할 최대 구간 수 (이보다 많으면 416 응답)
+MAX_RANGES = 32
+READ_SIZE = 256 * 1024
+
+
+def make_etag(st):
+  """inode + 수정 시각 + 크기로 만든 강한(strong) ETag 값"""
+  return f"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+def send_file_response(file_path, download_name=None, as_attachment=False, mimetype=None):
+  """
+  파일을 조건부 요청(If-None-Match/If-Modified-Since)과 Range 요청을 지원하도록 전송합니다.
+
+  단일 구간과 전체 전송은 flask.send_file에 맡겨 WSGI 서버의 wsgi.file_wrapper(sendfile)를 사용하고,
+  여러 구간을 요청한 경우에만 multipart/byteranges 응답을 직접 만듭니다.
+  """
+  file_path = os.path.abspath(file_path)
+  st = os.stat(file_path)
+  etag = make_etag(st)
+  last_modified = datetime.datetime.fromtimestamp(int(st.st_mtime), datetime.timezone.utc)
+  if mimetype is None:
+    mimetype = mimetypes.guess_type(download_name or file_path)[0] or "application/octet-stream"
+
+  ranges = _requested_ranges(st.st_size, etag, last_modified)
+  if ranges is not None:
+    # werkzeug는 여러 구간 요청을 416으로 처리하므로 조건부 검사부터 직접 수행
+    if not is_resource_modified(request.environ, etag, last_modified=last_modified):
+      return Response(status=304, headers={"ETag": f'"{etag}"', "Last-Modified": http_date(last_modified)})
+    if not ranges:
+      return Response(status=416, headers={"Content-Range": f"bytes */{st.st_size}", "Accept-Ranges": "bytes"})
+    return _send_ranges(file_path, ranges, st.st_size, mimetype, etag, last_modified, download_name, as_attachment)
+
+  response = send_file(
+    file_path,
+    mimetype=mimetype,
+    as_attachment=as_attachment,
+    download_name=download_name or os.path.basename(file_path),
+    conditional=True,
+    etag=etag,
+    last_modified=last_modified,
+    max_age=0,
+  )
+  response.headers["Accept-Ranges"] = "bytes"
+  return response
+
+
+def _requested_ranges(size, etag, last_modified):
+  """
+  여러 구간 Range 요청이면 [(start, end), ...] (end 미포함, 겹치는 구간은 병합)을 반환합니다.
+  만족할 수 있는 구간이 없으면 빈 목록, 직접 처리할 필요가 없으면(Range 없음/단일 구간/If-Range 불일치) None.
+  """
+  header = request.headers.get("Range")
+  if not header:
+    return None
+  rng = parse_range_header(header)
+  if rng is None or rng.units != "bytes" or len(rng.ranges) < 2 or len(rng.ranges) > MAX_RANGES:
+    return None
+  if_range = request.headers.get("If-Range")
+  if if_range and if_range.strip('"') != etag and if_range != http_date(last_modified):
+    return None
+
+  ranges = []
+  for start, end in rng.ranges:
+    if start < 0:
+      start, end = max(size + start, 0), size
+    else:
+      end = size if end is None else min(end, size)
+    if start < end:
+      ranges.append((start, end))
+  ranges.sort()
+  merged = []
+  for start, end in ranges:
+    if merged and start <= merged[-1][1]:
+      merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+    else:
+      merged.append((start, end))
+  return merged
+
+
+def _read_range(fd, start, end):
+  offset = start
+  while offset < end:
+    chunk = os.pread(fd, min(READ_SIZE, end - offset), offset)
+    if not chunk:
+      break
+    offset += len(chunk)
+    yield chunk
+
+
+def _send_ranges(file_path, ranges, size, mimetype, etag, last_modified, download_name, as_attachment):
+  headers = {"Accept-Ranges": "bytes", "ETag": f'"{etag}"', "Last-Modified": http_date(last_modified)}
+  if as_attachment:
+    # 파일명을 URL-encoded UTF-8로 변환 (RFC 5987 표준 적용)
+    encoded_filename = quote(download_name or os.path.basename(file_path), encoding='utf-8')
+    headers["Content-Disposition"] = f"attachment; filename*=UTF-8''{encoded_filename}"
+
+  fd = os.open(file_path, os.O_RDONLY)
+  if len(ranges) == 1:
+    # 겹치는 구간이 병합되어 하나만 남은 경우
+    start, end = ranges[0]
+    headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+    headers["Content-Length"] = str(end - start)
+    body = _read_range(fd, start, end)
+    response = Response(body, status=206, mimetype=mimetype, headers=headers)
+    response.call_on_close(lambda: os.close(fd))
+    return response
+
+  boundary = uuid.uuid4().hex
+  parts = [
+    (f"--{boundary}\r\nContent-Type: {mimetype}\r\nContent-Range: bytes {start}-{end - 1}/{size}\r\n\r\n".encode(), start, end)
+    for start, end in ranges
+  ]
+  closing = f"\r\n--{boundary}--\r\n".encode()
+  length = sum(len(head) + end - start for head, start, end in parts) + 2 * (len(parts) - 1) + len(closing)
+
+  def generate():
+    for index, (head, start, end) in enumerate(parts):
+      yield (b"\r\n" if index else b"") + head
+      yield from _read_range(fd, start, end)
+    yield closing
+
+  headers["Content-Length"] = str(length)
+  response = Response(generate(), status=206, content_type=f"multipart/byteranges; boundary={boundary}", headers=headers)
+  response.call_on_close(lambda: os.close(fd))
+  return response
@@ -0,0 +1,174 @@
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .store import SQLiteStore
+
+
+class JobQueue(SQLiteStore):
+  """
+  요청 스레드에서 처리하기 오래 걸리는 작업을 백그라운드 스레드 풀에서 실행하는 큐.
+
+  작업은 종류(kind)별로 register()한 함수로 실행되며, 상태(queued/running/done/failed)와
+  진행률은 SQLite jobs 테이블에 남습니다. 서버가 재시작되면 끝나지 않은 작업을 resume()으로 다시 실행하며
+  (이때 job.resumed가 True), 오래된 완료/실패 기록은 resume()에서 정리합니다.
+  오래 걸리는 종류는 add_pool()로 만든 별도 스레드 풀에 등록해 다른 작업을 막지 않게 할 수 있습니다.
+  스레드가 기다릴 필요 없는 작업(OpenAI 게이트웨이 호출 등)은 start()로 기록만 만든 뒤,
+  끝났을 때 complete()로 마무리 함수를 스레드 풀에서 실행해 결과를 남깁니다.
+  """
+  schema = """
+  CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    detail TEXT,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+  );
+  CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs (status);
+  """
+
+  def __init__(self, db_path, workers=2, thread_name_prefix="job"):
+    self._handlers = {}
+    self._thread_name_prefix = thread_name_prefix
+    self._executors = {"default": ThreadPoolExecutor(max_workers=workers, thread_name_prefix=thread_name_prefix)}
+    self._resumed = False
+    self._resume_lock = threading.Lock()
+    super().__init__(db_path)
+    conn = self.connect()
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+    if "detail" not in columns:
+      # detail 컬럼이 없던 이전 jobs.db 호환
+      with conn:
+        conn.execute("ALTER TABLE jobs ADD COLUMN detail TEXT")
+
+  def add_pool(self, name, workers):
+    """register(pool=name)으로 쓸 별도 스레드 풀 추가"""
+    self._executors[name] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{self._thread_name_prefix}-{name}")
+
+  def register(self, kind, handler, pool="default"):
+    """handler(payload, job)를 kind 작업의 실행 함수로 등록. job.progress()로 진행률을 남길 수 있음"""
+    self._handlers[kind] = (handler, pool)
+
+  def submit(self, kind, payload):
+    """작업을 큐에 넣고 작업 ID를 반환"""
+    if kind not in self._handlers:
+      raise ValueError(f"unknown job kind: {kind}")
+    self.resume()
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    conn = self.connect()
+    with conn:
+      conn.execute(
+        "INSERT INTO jobs (id, kind, payload, status, created, updated) VALUES (?, ?, ?, 'queued', ?, ?)",
+        (job_id, kind, json.dumps(payload, ensure_ascii=False), now, now),
+      )
+    self._executors[self._handlers[kind][1]].submit(self._run, job_id, kind, payload)
+    return job_id
+
+  def start(self, kind, payload):
+    """
+    실행 함수 없이 running 상태의 작업 기록만 만들고 작업 ID를 반환.
+    서버가 재시작되면 이어서 실행할 수 없으므로 resume()에서 interrupted로 실패 처리됩니다.
+    """
+    self.resume()
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    conn = self.connect()
+    with conn:
+      conn.execute(
+        "INSERT INTO jobs (id, kind, payload, status, created, updated) VALUES (?, ?, ?, 'running', ?, ?)",
+        (job_id, kind, json.dumps(payload, ensure_ascii=False), now, now),
+      )
+    return job_id
+
+  def complete(self, job_id, finish, pool="default"):
+    """start()한 작업의 마무리 함수 finish()를 스레드 풀에서 실행해 반환값을 결과로 저장 (예외가 나면 실패)"""
+    self._executors[pool].submit(self._finish, job_id, finish)
+
+  def get(self, job_id):
+    """작업 상태를 dict로 반환. 없으면 None"""
+    row = self.connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return self._to_dict(row) if row is not None else None
+
+  def get_many(self, job_ids):
+    placeholders = ",".join("?" * len(job_ids))
+    rows = self.connect().execute(f"SELECT * FROM jobs WHERE id IN ({placeholders})", list(job_ids)).fetchall()
+    return [self._to_dict(row) for row in rows]
+
+  def resume(self):
+    """오래된 작업 기록을 지우고, 재시작 전에 끝나지 않은 작업을 다시 큐에 넣음 (처음 한 번만 수행)"""
+    with self._resume_lock:
+      if self._resumed:
+        return
+      self._resumed = True
+    try:
+      self.purge()
+    except Exception as e:
+      print(f"Error purging old jobs: {e}")
+    rows = self.connect().execute(
+      "SELECT id, kind, payload FROM jobs WHERE status IN ('queued', 'running') ORDER BY created"
+    ).fetchall()
+    for row in rows:
+      if row["kind"] in self._handlers:
+        self._executors[self._handlers[row["kind"]][1]].submit(self._run, row["id"], row["kind"], json.loads(row["payload"]), True)
+      else:
+        self._update(row["id"], status="failed", error="interrupted")
+
+  def purge(self, max_age=7 * 24 * 60 * 60):
+    """오래된 완료/실패 작업 기록 삭제"""
+    conn = self.connect()
+    with conn:
+      conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated < ?", (time.time() - max_age,))
+
+  def _run(self, job_id, kind, payload, resumed=False):
+    self._update(job_id, status="running")
+    try:
+      result = self._handlers[kind][0](payload, _JobHandle(self, job_id, resumed))
+      self._update(job_id, status="done", progress=1, result=json.dumps(result, ensure_ascii=False))
+    except Exception as e:
+      print(f"Error running {kind} job {job_id}: {e}")
+      self._update(job_id, status="failed", error=str(e))
+
+  def _finish(self, job_id, finish):
+    try:
+      result = finish()
+      self._update(job_id, status="done", progress=1, result=json.dumps(result, ensure_ascii=False))
+    except Exception as e:
+      print(f"Error finishing job {job_id}: {e}")
+      self._update(job_id, status="failed", error=str(e))
+
+  def _update(self, job_id, **fields):
+    fields["updated"] = time.time()
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    conn = self.connect()
+    with conn:
+      conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+  @staticmethod
+  def _to_dict(row):
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["detail"] = json.loads(job["detail"]) if job["detail"] else None
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+class _JobHandle:
+  """실행 중인 작업이 진행률을 기록할 때 쓰는 핸들. resumed는 서버 재시작 후 다시 실행된 작업인지 여부"""
+  def __init__(self, queue, job_id, resumed=False):
+    self.queue = queue
+    self.id = job_id
+    self.resumed = resumed
+
+  def progress(self, value, **detail):
+    """진행률(0~1)과 함께 처리한 바이트 수 같은 세부 정보를 남김"""
+    fields = {"progress": float(value)}
+    if detail:
+      fields["detail"] = json.dumps(detail, ensure_ascii=False)
+    self.queue._update(self.id, **fields)
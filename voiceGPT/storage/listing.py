@@ -0,0 +1,174 @@
+import os
+import base64
+import json
+import bisect
+import datetime
+import threading
+import unicodedata
+from collections import OrderedDict
+from .name_index import is_hidden
+from .store import path_key
+
+IMAGE_EXTENSIONS = ('.png', '.jpeg', '.jpg', '.gif', '.bmp', '.tiff', '.webp', '.heic')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv')
+SORT_KEYS = ('name', 'modified', 'size', 'type')
+
+
+def format_modified(timestamp):
+  """목록에 표시하는 수정 시각 형식 (예: 2025. 01. 24. 오후 2:30)"""
+  modification_time = datetime.datetime.fromtimestamp(timestamp)
+  hour = modification_time.hour
+  period = "오전" if hour < 12 else "오후"
+  hour_12 = hour if 1 <= hour <= 12 else (hour - 12 if hour > 12 else 12)
+  return modification_time.strftime(f"%Y. %m. %d. {period} {hour_12}:%M")
+
+
+def encode_cursor(sort, order, key):
+  raw = json.dumps([sort, order, list(key)], ensure_ascii=False).encode("utf-8")
+  return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+  """(정렬 기준, 정렬 방향, 마지막 항목의 정렬 키). 형식이 잘못되었으면 ValueError"""
+  try:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    sort, order, key = json.loads(raw)
+    return sort, order, tuple(key)
+  except Exception:
+    raise ValueError("invalid cursor")
+
+
+class Listing:
+  """
+  한 폴더의 목록 스냅샷. 항목은 응답 형태(_name, _type, _size, _modified, _thumbnail)로 미리 만들어 두고,
+  정렬 기준별 순서는 처음 요청될 때 한 번만 계산해 재사용합니다.
+  """
+
+  def __init__(self, path, mtime_ns, entries):
+    self.path = path
+    self.mtime_ns = mtime_ns
+    self.entries = entries
+    self._orders = {}
+
+  def order(self, sort):
+    """정렬 기준별 (정렬 키 목록, 항목 목록)을 오름차순으로 반환"""
+    cached = self._orders.get(sort)
+    if cached is None:
+      keyed = sorted((self._sort_key(entry, sort), entry) for entry in self.entries)
+      cached = ([key for key, _ in keyed], [entry for _, entry in keyed])
+      self._orders[sort] = cached
+    return cached
+
+  def page(self, sort="name", order="asc", limit=200, cursor=None):
+    """
+    cursor 다음부터 limit개를 반환: (항목 목록, 다음 cursor 또는 None).
+    cursor는 마지막 항목의 정렬 키이므로 그 사이 항목이 추가/삭제되어도 건너뛰거나 중복되지 않습니다.
+    """
+    keys, entries = self.order(sort)
+    after = None
+    if cursor:
+      cursor_sort, cursor_order, after = decode_cursor(cursor)
+      if (cursor_sort, cursor_order) != (sort, order):
+        raise ValueError("cursor does not match sort")
+
+    try:
+      if order == "desc":
+        end = bisect.bisect_left(keys, after) if after is not None else len(keys)
+        start = max(0, end - limit)
+        page = entries[start:end][::-1]
+        has_more = start > 0
+      else:
+        start = bisect.bisect_right(keys, after) if after is not None else 0
+        page = entries[start:start + limit]
+        has_more = start + limit < len(keys)
+    except TypeError:
+      # cursor의 정렬 키 형식이 현재 정렬 기준과 다름
+      raise ValueError("invalid cursor")
+
+    next_cursor = encode_cursor(sort, order, self._sort_key(page[-1], sort)) if page and has_more else None
+    return page, next_cursor
+
+  @staticmethod
+  def _sort_key(entry, sort):
+    name = entry["_name"]
+    folded = unicodedata.normalize("NFC", name).casefold()
+    if sort == "modified":
+      return (entry["_mtime"], folded, name)
+    if sort == "size":
+      return (entry["_size"], folded, name)
+    if sort == "type":
+      return (entry["_type"], folded, name)
+    return (folded, name)
+
+
+class ListingCache:
+  """
+  폴더 목록을 폴더 mtime을 키로 메모리에 보관하는 LRU 캐시.
+
+  폴더 mtime이 그대로면 scandir/stat 없이 저장된 목록을 사용합니다.
+  하위 폴더 크기나 파일 내용처럼 mtime에 드러나지 않는 변경은 invalidate()로 해당 경로와
+  상위 폴더 목록을 버려 반영합니다.
+  """
+
+  def __init__(self, dir_size, max_dirs=256):
+    self.dir_size = dir_size
+    self.max_dirs = max_dirs
+    self._listings = OrderedDict()
+    self._lock = threading.Lock()
+
+  def get(self, path):
+    """폴더의 Listing을 반환. 폴더가 없으면 FileNotFoundError"""
+    path = os.fspath(path)
+    key = path_key(path)
+    mtime_ns = os.stat(path).st_mtime_ns
+    with self._lock:
+      listing = self._listings.get(key)
+      if listing is not None and listing.mtime_ns == mtime_ns:
+        self._listings.move_to_end(key)
+        return listing
+
+    listing = Listing(path, mtime_ns, self._scan(path))
+    with self._lock:
+      self._listings[key] = listing
+      self._listings.move_to_end(key)
+      while len(self._listings) > self.max_dirs:
+        self._listings.popitem(last=False)
+    return listing
+
+  def invalidate(self, *paths, descendants=True):
+    """경로의 상위 폴더, 자기 자신, (descendants이면) 하위 폴더 목록을 캐시에서 제거"""
+    keys = [path_key(path) for path in paths]
+    with self._lock:
+      for cached in list(self._listings):
+        for key in keys:
+          if key == cached or key.startswith(cached.rstrip('/') + '/') or (descendants and cached.startswith(key + '/')):
+            del self._listings[cached]
+            break
+
+  def _scan(self, path):
+    entries = []
+    with os.scandir(path) as it:
+      for entry in it:
+        if is_hidden(entry.name):
+          continue
+        try:
+          is_dir = entry.is_dir()
+          st = entry.stat()
+        except OSError:
+          continue
+        ext = '' if is_dir else os.path.splitext(entry.name)[1].lower()
+        if ext in IMAGE_EXTENSIONS:
+          thumbnail = 'image'
+        elif ext in VIDEO_EXTENSIONS:
+          thumbnail = 'video'
+        else:
+          thumbnail = ''
+        entries.append({
+          "_name": entry.name,
+          "_type": 'Directory' if is_dir else ext,
+          "_size": self.dir_size(entry.path) if is_dir else st.st_size,
+          "_modified": format_modified(st.st_mtime),
+          "_mtime": st.st_mtime,
+          "_thumbnail": thumbnail,
+        })
+    return entries
@@ -0,0 +1,321 @@
+import os
+import queue
+import datetime
+import threading
+from PIL import Image, ExifTags
+from pymediainfo import MediaInfo
+from .store import SQLiteStore, path_key, subtree_bounds
+from .name_index import is_hidden
+from .listing import IMAGE_EXTENSIONS, VIDEO_EXTENSIONS
+
+BATCH_SIZE = 64  # 백그라운드 채우기에서 한 트랜잭션에 저장할 파일 수
+CRAWL_QUEUE_LIMIT = BATCH_SIZE * 4  # 전체 순회는 대기열이 이보다 줄어들 때까지 기다렸다가 다음 묶음을 넣음
+
+
+def media_kind(path):
+  ext = os.path.splitext(str(path))[1].lower()
+  if ext in IMAGE_EXTENSIONS:
+    return 'image'
+  if ext in VIDEO_EXTENSIONS:
+    return 'video'
+  return 'file'
+
+
+def normalize_taken(value):
+  """EXIF(2025:01:24 14:30:00)/MediaInfo(UTC 2025-01-24 14:30:00) 날짜를 2025-01-24 14:30:00 형식으로 맞춤"""
+  if not value:
+    return None
+  value = str(value).strip().replace("UTC ", "")
+  for fmt in ("%Y:%m:%d %H:%M:%S", "%Y-%m-%d %H:%M:%S"):
+    try:
+      return datetime.datetime.strptime(value[:19], fmt).strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+      continue
+  return value  # 알 수 없는 형식은 원본 문자열을 그대로 저장
+
+
+def extract_image(path):
+  """해상도와 EXIF 촬영 일시 (픽셀 데이터는 디코딩하지 않음)"""
+  with Image.open(path) as image:
+    width, height = image.size
+    # DateTimeOriginal만 사용. DateTime(0x0132)은 편집/스캔한 시각이라 촬영 일시 조회에 섞이면 안 됨
+    taken = image.getexif().get_ifd(ExifTags.IFD.Exif).get(0x9003)
+  return {"width": width, "height": height, "taken": normalize_taken(taken)}
+
+
+def extract_video(path):
+  """MediaInfo로 해상도, 길이(초), 촬영 일시를 추출"""
+  info = {}
+  for track in MediaInfo.parse(path).tracks:
+    if track.track_type == "General":
+      info["taken"] = normalize_taken(track.encoded_date or track.tagged_date)
+    elif track.track_type == "Video" and "width" not in info:
+      info["width"], info["height"] = track.width, track.height
+      info["duration"] = track.duration / 1000 if track.duration else None
+  return info
+
+
+EXTRACTORS = {'image': extract_image, 'video': extract_video}
+
+
+class MetadataStore(SQLiteStore):
+  """
+  파일 상태(크기, 생성/수정 시각)와 이미지/동영상 메타데이터(해상도, 촬영 일시, 길이)를 보관하는 저장소.
+
+  (경로, mtime_ns, 크기)가 같으면 저장된 값을 그대로 쓰므로 파일을 열어 EXIF나 MediaInfo를 다시
+  분석하지 않습니다. 목록에서 새로 본 파일은 warm()으로 백그라운드 스레드에서 묶어서 채우며,
+  촬영 일시로 인덱싱되어 있어 기간별 사진/동영상 조회를 파일을 열지 않고 할 수 있습니다.
+  """
+  schema = """
+  CREATE TABLE IF NOT EXISTS media (
+    path TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    ctime REAL NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    duration REAL,
+    taken TEXT,
+    error TEXT
+  );
+  CREATE INDEX IF NOT EXISTS ix_media_parent ON media (parent);
+  CREATE INDEX IF NOT EXISTS ix_media_taken ON media (kind, taken);
+  """
+
+  def __init__(self, root, db_path):
+    self.root = os.fspath(root)
+    self._queue = queue.Queue()
+    self._queued = set()
+    self._queued_lock = threading.Condition()
+    self._worker = None
+    self._crawl_roots = []  # 순회를 기다리는 폴더 (순서대로 하나의 스레드에서 순회)
+    self._crawl_lock = threading.Lock()
+    self._crawling = False
+    super().__init__(db_path)
+    conn = self.connect()
+    if conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+      # 이전에는 DateTimeOriginal이 없으면 DateTime을 촬영 일시로 저장했으므로 이미지는 다시 추출
+      with conn:
+        conn.execute("DELETE FROM media WHERE kind = 'image'")
+      conn.execute("PRAGMA user_version = 1")
+
+  def get(self, path):
+    """파일의 메타데이터 dict. 저장된 값이 현재 파일 상태와 다르면 다시 추출해 저장"""
+    path = os.fspath(path)
+    st = os.stat(path)
+    row = self.connect().execute("SELECT * FROM media WHERE path = ?", (path_key(path),)).fetchone()
+    if row is not None and (row["mtime_ns"], row["size"]) == (st.st_mtime_ns, st.st_size):
+      return dict(row)
+    record = self._extract(path, st)
+    conn = self.connect()
+    with conn:
+      self._save(conn, [record])
+    return record
+
+  def lookup(self, directory):
+    """폴더 직속 파일들의 저장된 메타데이터 {이름: dict}. 추출하지 않으므로 최신이 아닐 수 있음"""
+    rows = self.connect().execute("SELECT * FROM media WHERE parent = ?", (path_key(directory),))
+    return {os.path.basename(row["path"]): dict(row) for row in rows}
+
+  def taken_between(self, start, end, kind='image', directory=None, offset=0, limit=200):
+    """
+    촬영 일시가 start 이상 end 미만인 kind 파일을 촬영 순서로 반환: (목록, 다음 페이지 존재 여부).
+    날짜는 'YYYY-MM-DD' 또는 'YYYY-MM-DD HH:MM:SS' 문자열로 비교합니다.
+    """
+    sql = "SELECT * FROM media WHERE kind = ? AND taken >= ? AND taken < ?"
+    params = [kind, start, end]
+    if directory is not None:
+      lower, upper = subtree_bounds(path_key(directory))
+      sql += " AND path >= ? AND path < ?"
+      params += [lower, upper]
+    rows = self.connect().execute(sql + " ORDER BY taken, path LIMIT ? OFFSET ?", params + [limit + 1, offset]).fetchall()
+    return [dict(row) for row in rows[:limit]], len(rows) > limit
+
+  def warm(self, paths):
+    """파일 경로 목록 중 저장되지 않았거나 바뀐 파일을 백그라운드에서 추출하도록 대기열에 추가"""
+    with self._queued_lock:
+      for path in paths:
+        path = os.fspath(path)
+        if path in self._queued:
+          continue
+        self._queued.add(path)
+        self._queue.put(path)
+      if self._worker is None:
+        self._worker = threading.Thread(target=self._fill_loop, name="metadata-fill", daemon=True)
+        self._worker.start()
+
+  def crawl_async(self, path=None):
+    """
+    path(기본값 루트) 하위 전체 이미지/동영상을 백그라운드에서 순회해 대기열에 추가 (기간 조회용).
+    대기열이 CRAWL_QUEUE_LIMIT 아래로 줄어들 때마다 한 묶음씩 넣으므로 드라이브 전체 경로를 메모리에 쌓지 않습니다.
+    순회 중에 다시 호출하면 그 폴더를 뒤이어 순회합니다 (이미 기다리는 폴더는 한 번만).
+    """
+    path = os.fspath(path) if path is not None else self.root
+    with self._crawl_lock:
+      if path in self._crawl_roots:
+        return
+      self._crawl_roots.append(path)
+      if self._crawling:
+        return
+      self._crawling = True
+    threading.Thread(target=self._crawl_loop, name="metadata-crawl", daemon=True).start()
+
+  def _crawl_loop(self):
+    while True:
+      with self._crawl_lock:
+        if not self._crawl_roots:
+          self._crawling = False
+          return
+        path = self._crawl_roots.pop(0)
+      try:
+        self._crawl(path)
+      except Exception as e:
+        print(f"Error crawling media metadata: {e}")
+
+  def _crawl(self, path):
+    batch = []
+    for current, dir_names, file_names in os.walk(path):
+      dir_names[:] = [name for name in dir_names if not is_hidden(name)]
+      for name in file_names:
+        if is_hidden(name) or media_kind(name) == 'file':
+          continue
+        batch.append(os.path.join(current, name))
+        if len(batch) >= BATCH_SIZE:
+          self._wait_for_room()
+          self.warm(batch)
+          batch = []
+    if batch:
+      self._wait_for_room()
+      self.warm(batch)
+
+  def _wait_for_room(self):
+    with self._queued_lock:
+      while len(self._queued) >= CRAWL_QUEUE_LIMIT:
+        self._queued_lock.wait()
+
+  def pending(self):
+    """대기 중인 추출 작업 수"""
+    with self._queued_lock:
+      return len(self._queued)
+
+  def changed(self, *paths):
+    """
+    파일/폴더가 생성, 수정, 삭제된 뒤 호출. 없어진 경로는 지우고, 이미지/동영상 파일은 다시 추출하도록 대기열에 넣고,
+    폴더(대량 변경이 합쳐진 경우)는 직속 항목 중 없어진 파일을 지우고 직속 이미지/동영상을 대기열에 넣습니다.
+    저장된 메타데이터가 하나도 없는 하위 폴더(복사/압축 해제로 새로 생긴 폴더 등)는 crawl_async로 순회합니다.
+    """
+    for path in paths:
+      path = os.fspath(path)
+      if not os.path.lexists(path):
+        self.discard(path)
+      elif not os.path.isdir(path):
+        if media_kind(path) != 'file':
+          self.warm([path])
+      else:
+        try:
+          entries = [(entry.name, entry.is_dir(follow_symlinks=False)) for entry in os.scandir(path) if not is_hidden(entry.name)]
+        except OSError:
+          continue
+        names = {name for name, _ in entries}
+        conn = self.connect()
+        with conn:
+          for name in set(self.lookup(path)) - names:
+            conn.execute("DELETE FROM media WHERE path = ?", (path_key(os.path.join(path, name)),))
+        self.warm(os.path.join(path, name) for name, is_dir in entries if not is_dir and media_kind(name) != 'file')
+        for name, is_dir in entries:
+          if is_dir and not self._has_rows(os.path.join(path, name)):
+            self.crawl_async(os.path.join(path, name))
+
+  def _has_rows(self, directory):
+    lower, upper = subtree_bounds(path_key(directory))
+    return self.connect().execute("SELECT 1 FROM media WHERE path >= ? AND path < ? LIMIT 1", (lower, upper)).fetchone() is not None
+
+  def discard(self, path):
+    """삭제/변경된 경로(폴더이면 하위 전체)의 메타데이터 제거"""
+    key = path_key(path)
+    lower, upper = subtree_bounds(key)
+    conn = self.connect()
+    with conn:
+      conn.execute("DELETE FROM media WHERE path = ? OR (path >= ? AND path < ?)", (key, lower, upper))
+
+  def moved(self, src, dst):
+    """이름 변경/이동 후 호출. 파일 내용은 그대로이므로 경로만 바꿔 다시 추출하지 않음"""
+    src_key, dst_key = path_key(src), path_key(dst)
+    lower, upper = subtree_bounds(src_key)
+    conn = self.connect()
+    with conn:
+      conn.execute("DELETE FROM media WHERE path = ? OR (path >= ? AND path < ?)", (dst_key,) + subtree_bounds(dst_key))
+      conn.execute(
+        "UPDATE media SET path = ? || substr(path, ?), parent = ? || substr(parent, ?) WHERE path >= ? AND path < ?",
+        (dst_key, len(src_key) + 1, dst_key, len(src_key) + 1, lower, upper),
+      )
+      conn.execute(
+        "UPDATE media SET path = ?, parent = ? WHERE path = ?",
+        (dst_key, path_key(os.path.dirname(dst_key)), src_key),
+      )
+
+  def _fill_loop(self):
+    while True:
+      batch = [self._queue.get()]
+      while len(batch) < BATCH_SIZE:
+        try:
+          batch.append(self._queue.get_nowait())
+        except queue.Empty:
+          break
+      try:
+        self._fill(batch)
+      except Exception as e:
+        print(f"Error filling media metadata: {e}")
+      finally:
+        with self._queued_lock:
+          self._queued.difference_update(batch)
+          self._queued_lock.notify_all()
+
+  def _fill(self, paths):
+    conn = self.connect()
+    keys = [path_key(path) for path in paths]
+    placeholders = ",".join("?" * len(keys))
+    stored = {
+      row["path"]: (row["mtime_ns"], row["size"])
+      for row in conn.execute(f"SELECT path, mtime_ns, size FROM media WHERE path IN ({placeholders})", keys)
+    }
+    records = []
+    for path, key in zip(paths, keys):
+      try:
+        st = os.stat(path)
+      except OSError:
+        continue
+      if os.path.isdir(path):
+        continue
+      if stored.get(key) != (st.st_mtime_ns, st.st_size):
+        records.append(self._extract(path, st))
+    if records:
+      with conn:
+        self._save(conn, records)
+
+  @staticmethod
+  def _extract(path, st):
+    key = path_key(path)
+    kind = media_kind(path)
+    record = {
+      "path": key, "parent": path_key(os.path.dirname(key)), "kind": kind,
+      "mtime_ns": st.st_mtime_ns, "size": st.st_size, "ctime": st.st_ctime,
+      "width": None, "height": None, "duration": None, "taken": None, "error": None,
+    }
+    extractor = EXTRACTORS.get(kind)
+    if extractor is not None:
+      try:
+        record.update(extractor(path))
+      except Exception as e:
+        record["error"] = str(e)
+    return record
+
+  @staticmethod
+  def _save(conn, records):
+    conn.executemany(
+      "INSERT OR REPLACE INTO media (path, parent, kind, mtime_ns, size, ctime, width, height, duration, taken, error) "
+      "VALUES (:path, :parent, :kind, :mtime_ns, :size, :ctime, :width, :height, :duration, :taken, :error)",
+      records,
+    )
@@ -0,0 +1,318 @@
+import os
+import time
+import threading
+import unicodedata
+from .store import SQLiteStore, path_key, subtree_bounds
+
+HIDDEN_NAMES = ('System Volume Information',)
+
+
+def is_hidden(name):
+  return name.startswith(('.', '$')) or name in HIDDEN_NAMES
+
+
+class NameIndex(SQLiteStore):
+  """
+  루트 아래 모든 파일/폴더 이름을 SQLite FTS5(trigram) 색인으로 보관하는 검색 인덱스.
+
+  검색용 이름(label)은 NFC로 정규화해 저장하므로 MacOS의 NFD 파일명도 같은 검색어로 찾을 수 있습니다.
+  폴더별로 마지막 스캔 시점의 mtime을 기록해 두고, 재스캔 시 mtime이 바뀐 폴더만 다시 읽습니다.
+  클라우드 저장소 API로 변경한 경우에는 changed()/moved()로 즉시 반영합니다.
+  """
+  schema = """
+  CREATE TABLE IF NOT EXISTS entries (
+    path TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    name TEXT NOT NULL,
+    label TEXT NOT NULL,
+    is_dir INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL
+  );
+  CREATE INDEX IF NOT EXISTS ix_entries_parent ON entries (parent);
+  CREATE TABLE IF NOT EXISTS scanned_dirs (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL
+  );
+  CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+    label, content='entries', content_rowid='rowid', tokenize='trigram'
+  );
+  CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts (rowid, label) VALUES (new.rowid, new.label);
+  END;
+  CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, label) VALUES ('delete', old.rowid, old.label);
+  END;
+  CREATE TRIGGER IF NOT EXISTS entries_au AFTER UPDATE OF label ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, label) VALUES ('delete', old.rowid, old.label);
+    INSERT INTO entries_fts (rowid, label) VALUES (new.rowid, new.label);
+  END;
+  """
+
+  def __init__(self, root, db_path):
+    self.root = os.fspath(root)
+    self.root_key = path_key(self.root)
+    self._rescan_thread = None
+    super().__init__(db_path)
+
+  def search(self, directory, word, offset=0, limit=100):
+    """
+    directory 하위에서 이름에 word가 들어간 항목을 찾아 (결과 목록, 다음 페이지 존재 여부)를 반환합니다.
+    이름이 정확히 같은 항목, 검색어로 시작하는 항목, 이름이 짧은 항목 순으로 정렬합니다.
+    각 결과의 dir은 상위 폴더의 실제 경로(디스크의 이름 그대로)입니다.
+    """
+    word = unicodedata.normalize("NFC", word).strip()
+    if not word:
+      return [], False
+    lower, upper = subtree_bounds(path_key(directory))
+    pattern = '%' + word.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    rank = (
+      "CASE WHEN lower(e.label) = lower(:word) THEN 0 "
+      "WHEN lower(e.label) LIKE lower(:prefix) ESCAPE '\\' THEN 1 ELSE 2 END, length(e.label), e.path"
+    )
+    params = {
+      "word": word, "pattern": pattern, "prefix": pattern[1:], "lower": lower, "upper": upper,
+      "limit": limit + 1, "offset": offset,
+    }
+    if len(word) >= 3:
+      # trigram 색인은 세 글자 이상일 때 사용 가능
+      params["match"] = '"' + word.replace('"', '""') + '"'
+      sql = (
+        "SELECT e.* FROM entries_fts f JOIN entries e ON e.rowid = f.rowid "
+        "WHERE entries_fts MATCH :match AND e.path >= :lower AND e.path < :upper "
+        f"ORDER BY {rank} LIMIT :limit OFFSET :offset"
+      )
+    else:
+      sql = (
+        "SELECT e.* FROM entries e WHERE e.path >= :lower AND e.path < :upper "
+        "AND e.label LIKE :pattern ESCAPE '\\' "
+        f"ORDER BY {rank} LIMIT :limit OFFSET :offset"
+      )
+    rows = [dict(row) for row in self.connect().execute(sql, params)]
+    real_paths = {}
+    for row in rows[:limit]:
+      row["dir"] = self._real_path(row["parent"], real_paths)
+    return rows[:limit], len(rows) > limit
+
+  def is_empty(self):
+    return self.connect().execute("SELECT 1 FROM scanned_dirs LIMIT 1").fetchone() is None
+
+  def children(self, directory, depth=1, dirs_only=False):
+    """
+    directory의 직속 항목을 이름순 노드 목록으로 반환합니다. depth가 2 이상이면 하위 폴더의 children도 채웁니다.
+    펼치는 폴더는 mtime을 확인해 바뀌었을 때만 다시 읽고, 펼치지 않은 폴더에는 hasChildren만 표시합니다.
+    """
+    directory = os.fspath(directory).rstrip('/') or '/'
+    self._ensure_fresh(directory)
+    sql = "SELECT name, is_dir, size, mtime FROM entries WHERE parent = ?"
+    if dirs_only:
+      sql += " AND is_dir = 1"
+    rows = self.connect().execute(sql + " ORDER BY label, name", (path_key(directory),)).fetchall()
+
+    nodes = []
+    for row in rows:
+      path = os.path.join(directory, row["name"])
+      node = {"name": row["name"], "path": path, "isDir": bool(row["is_dir"]), "size": row["size"], "mtime": row["mtime"]}
+      if row["is_dir"]:
+        if depth > 1:
+          node["children"] = self.children(path, depth - 1, dirs_only)
+        else:
+          node["hasChildren"] = self._has_children(path, dirs_only)
+      nodes.append(node)
+    return nodes
+
+  def subtree(self, directory, dirs_only=False):
+    """
+    directory 하위 전체의 실제 경로를 정렬해 반환. mtime이 바뀐 폴더만 다시 읽은 뒤 인덱스에서 조회하며,
+    경로는 children()처럼 저장된 실제 이름(name)을 상위 경로에 이어 붙여 만듭니다 (NFD 이름 유지).
+    """
+    directory = os.fspath(directory).rstrip('/') or '/'
+    if not os.path.isdir(directory):
+      raise FileNotFoundError(directory)
+    self.scan(directory)
+    lower, upper = subtree_bounds(path_key(directory))
+    sql = "SELECT path, parent, name, is_dir FROM entries WHERE path >= ? AND path < ?"
+    if dirs_only:
+      sql += " AND is_dir = 1"
+    # 키 순서로 읽으면 상위 폴더가 항상 하위 항목보다 먼저 나옴
+    real_paths = {path_key(directory): directory}
+    result = []
+    for row in self.connect().execute(sql + " ORDER BY path", (lower, upper)):
+      parent = real_paths.get(row["parent"])
+      if parent is None:
+        continue
+      path = os.path.join(parent, row["name"])
+      if row["is_dir"]:
+        real_paths[row["path"]] = path
+      result.append(path)
+    result.sort()
+    return result
+
+  def scan(self, path=None):
+    """path(기본값 루트) 하위를 순회하며 mtime이 바뀐 폴더의 목록만 다시 읽음"""
+    stack = [os.fspath(path) if path is not None else self.root]
+    conn = self.connect()
+    while stack:
+      current = stack.pop()
+      try:
+        st = os.stat(current)
+      except OSError:
+        continue
+      row = conn.execute("SELECT mtime FROM scanned_dirs WHERE path = ?", (path_key(current),)).fetchone()
+      if row is None or row["mtime"] != st.st_mtime:
+        self._refresh_dir(current, st)
+      key = path_key(current)
+      stack.extend(
+        os.path.join(current, r["name"])
+        for r in conn.execute("SELECT name FROM entries WHERE parent = ? AND is_dir = 1", (key,))
+      )
+
+  def changed(self, *paths):
+    """파일/폴더가 생성, 수정, 삭제된 뒤 호출. 상위 폴더 목록을 다시 읽고 폴더이면 하위도 스캔"""
+    parents = []
+    for path in paths:
+      path = os.fspath(path).rstrip('/')
+      parent = os.path.dirname(path)
+      if parent not in parents:
+        parents.append(parent)
+    for parent in parents:
+      self._refresh_dir(parent)
+    for path in paths:
+      path = os.fspath(path).rstrip('/')
+      if os.path.isdir(path):
+        self._invalidate(path)
+        self.scan(path)
+
+  def refresh(self, *dirs):
+    """폴더의 직속 목록만 바뀐 경우 호출. 그 폴더만 다시 읽고 새로 생긴 하위 폴더는 스캔"""
+    conn = self.connect()
+    for path in dirs:
+      path = os.fspath(path).rstrip('/') or '/'
+      self._refresh_dir(path)
+      new_dirs = conn.execute(
+        "SELECT name FROM entries WHERE parent = ? AND is_dir = 1 "
+        "AND path NOT IN (SELECT path FROM scanned_dirs)",
+        (path_key(path),),
+      ).fetchall()
+      for row in new_dirs:
+        self.scan(os.path.join(path, row["name"]))
+
+  def moved(self, src, dst):
+    """이름 변경/이동 후 호출. 하위 항목 경로를 새 경로로 바꿔 재스캔 없이 재사용"""
+    src, dst = os.fspath(src).rstrip('/'), os.fspath(dst).rstrip('/')
+    src_key, dst_key = path_key(src), path_key(dst)
+    lower, upper = subtree_bounds(src_key)
+    conn = self.connect()
+    with conn:
+      self._discard(conn, dst_key)
+      for table, has_parent in (("entries", True), ("scanned_dirs", False)):
+        assignments = "path = ? || substr(path, ?)" + (", parent = ? || substr(parent, ?)" if has_parent else "")
+        params = (dst_key, len(src_key) + 1) + ((dst_key, len(src_key) + 1) if has_parent else ())
+        conn.execute(f"UPDATE {table} SET {assignments} WHERE path >= ? AND path < ?", params + (lower, upper))
+      conn.execute("UPDATE scanned_dirs SET path = ? WHERE path = ?", (dst_key, src_key))
+    self._refresh_dir(os.path.dirname(src))
+    if os.path.dirname(dst) != os.path.dirname(src):
+      self._refresh_dir(os.path.dirname(dst))
+
+  def start_rescan(self, interval=600):
+    """백그라운드 스레드에서 interval초마다 전체 재스캔 (처음 한 번만 시작)"""
+    if self._rescan_thread is not None:
+      return
+    def run():
+      while True:
+        try:
+          self.scan()
+        except Exception as e:
+          print(f"Error rescanning name index: {e}")
+        time.sleep(interval)
+    self._rescan_thread = threading.Thread(target=run, name="name-index-rescan", daemon=True)
+    self._rescan_thread.start()
+
+  def _refresh_dir(self, path, st=None):
+    """폴더의 직속 항목을 읽어 추가/삭제/변경분만 반영"""
+    key = path_key(path)
+    if key != self.root_key and not key.startswith(self.root_key + '/'):
+      return
+    conn = self.connect()
+    try:
+      st = st or os.stat(path)
+      with os.scandir(path) as it:
+        entries = list(it)
+    except OSError:
+      # 폴더가 사라졌으면 하위 항목도 제거
+      with conn:
+        self._discard(conn, key)
+      return
+
+    current = {}
+    for entry in entries:
+      if is_hidden(entry.name):
+        continue
+      try:
+        is_dir = entry.is_dir(follow_symlinks=False)
+        entry_st = entry.stat(follow_symlinks=False)
+      except OSError:
+        continue
+      label = unicodedata.normalize("NFC", entry.name)
+      current[path_key(os.path.join(path, entry.name))] = (entry.name, label, int(is_dir), 0 if is_dir else entry_st.st_size, entry_st.st_mtime)
+
+    stored = {
+      r["path"]: (r["name"], r["label"], r["is_dir"], r["size"], r["mtime"])
+      for r in conn.execute("SELECT path, name, label, is_dir, size, mtime FROM entries WHERE parent = ?", (key,))
+    }
+    with conn:
+      for child_key in stored.keys() - current.keys():
+        self._discard(conn, child_key)
+      for child_key, values in current.items():
+        if stored.get(child_key) != values:
+          if child_key in stored and stored[child_key][2] != values[2]:
+            # 파일 <-> 폴더로 바뀐 경우 이전 하위 항목 제거
+            self._discard(conn, child_key)
+          conn.execute(
+            "INSERT INTO entries (path, parent, name, label, is_dir, size, mtime) VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET name = excluded.name, label = excluded.label, is_dir = excluded.is_dir, "
+            "size = excluded.size, mtime = excluded.mtime",
+            (child_key, key) + values,
+          )
+      conn.execute("INSERT OR REPLACE INTO scanned_dirs (path, mtime) VALUES (?, ?)", (key, st.st_mtime))
+
+  def _real_path(self, key, real_paths):
+    """경로 키(NFC)에 해당하는 실제 경로. 저장된 이름을 루트부터 이어 붙임 (real_paths는 조회 결과 캐시)"""
+    if key == self.root_key:
+      return self.root
+    if key not in real_paths:
+      row = self.connect().execute("SELECT parent, name FROM entries WHERE path = ?", (key,)).fetchone()
+      if row is None:
+        real_paths[key] = key
+      else:
+        real_paths[key] = os.path.join(self._real_path(row["parent"], real_paths), row["name"])
+    return real_paths[key]
+
+  def _ensure_fresh(self, path):
+    """폴더를 처음 보거나 mtime이 바뀌었으면 직속 항목을 다시 읽음"""
+    st = os.stat(path)
+    row = self.connect().execute("SELECT mtime FROM scanned_dirs WHERE path = ?", (path_key(path),)).fetchone()
+    if row is None or row["mtime"] != st.st_mtime:
+      self._refresh_dir(path, st)
+
+  def _has_children(self, path, dirs_only):
+    """아직 읽지 않은 폴더는 펼쳐 볼 수 있도록 True"""
+    key = path_key(path)
+    conn = self.connect()
+    if conn.execute("SELECT 1 FROM scanned_dirs WHERE path = ?", (key,)).fetchone() is None:
+      return True
+    sql = "SELECT 1 FROM entries WHERE parent = ?" + (" AND is_dir = 1" if dirs_only else "") + " LIMIT 1"
+    return conn.execute(sql, (key,)).fetchone() is not None
+
+  def _invalidate(self, path):
+    """하위 폴더의 스캔 기록을 지워 다음 scan()에서 모두 다시 읽게 함"""
+    key = path_key(path)
+    lower, upper = subtree_bounds(key)
+    conn = self.connect()
+    with conn:
+      conn.execute("DELETE FROM scanned_dirs WHERE path = ? OR (path >= ? AND path < ?)", (key, lower, upper))
+
+  def _discard(self, conn, key):
+    lower, upper = subtree_bounds(key)
+    conn.execute("DELETE FROM entries WHERE path = ? OR (path >= ? AND path < ?)", (key, lower, upper))
+    conn.execute("DELETE FROM scanned_dirs WHERE path = ? OR (path >= ? AND path < ?)", (key, lower, upper))
@@ -0,0 +1,188 @@
+import os
+import imghdr
+import cv2
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from PIL import Image, UnidentifiedImageError, ExifTags
+from pdf2image import convert_from_path
+from pillow_heif import register_heif_opener
+
+# 썸네일 렌더링 함수들. 프로세스 풀에서 실행되므로 모두 모듈 최상위 함수로 둔다.
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+
+def get_render_pool():
+  """CPU 수만큼의 워커를 갖는 썸네일 렌더링/문서 보정용 프로세스 풀 (처음 사용할 때 생성)"""
+  global _render_pool
+  with _render_pool_lock:
+    if _render_pool is None:
+      _render_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, initializer=register_heif_opener)
+  return _render_pool
+
+
+def render_thumbnail(file_path, thumb_type, img_size, backgroundColor):
+  """썸네일 종류에 맞는 렌더링 함수를 호출해 PNG 바이트를 반환"""
+  if thumb_type == 'image':
+    return renderImageThumbnail(file_path, img_size, backgroundColor)
+  elif thumb_type == 'video':
+    return renderVideoThumbnail(file_path, img_size, backgroundColor)
+  elif thumb_type == 'pdf':
+    return renderPdfThumbnail(file_path, img_size)
+  return None
+
+
+def _exif_orientation(img):
+  """EXIF Orientation 태그 값 (없으면 1)"""
+  try:
+    return img.getexif().get(0x0112, 1)
+  except Exception:
+    return 1
+
+
+def _apply_orientation(img, orientation):
+  if orientation == 3:
+    return img.rotate(180, expand=True)
+  elif orientation == 6:
+    return img.rotate(270, expand=True)
+  elif orientation == 8:
+    return img.rotate(90, expand=True)
+  return img
+
+
+def _embedded_thumbnail(img, img_size):
+  """
+  JPEG의 EXIF(IFD1)에 내장된 썸네일이 타일 크기 이상이고 원본과 비율이 같으면 반환합니다.
+  비율이 다른 썸네일(레터박스 등)은 사용하지 않습니다.
+  """
+  raw = img.info.get('exif')
+  if not raw:
+    return None
+  try:
+    ifd1 = img.getexif().get_ifd(ExifTags.IFD.IFD1)
+    offset, length = ifd1.get(0x0201), ifd1.get(0x0202)  # JPEGInterchangeFormat(Length)
+    if not offset or not length:
+      return None
+    start = 6 if raw.startswith(b'Exif\x00\x00') else 0
+    thumb = Image.open(BytesIO(raw[start + offset:start + offset + length]))
+    thumb.load()
+  except Exception:
+    return None
+  if max(thumb.size) < img_size:
+    return None
+  if abs(thumb.width / thumb.height - img.width / img.height) > 0.02:
+    return None
+  return thumb
+
+
+def renderImageThumbnail(file_path, img_size=150, backGroundColor=False):
+  """
+  이미지 썸네일을 PNG 바이트로 생성.
+  JPEG은 내장 썸네일이나 DCT 축소 디코딩(draft)을 사용해 원본 해상도 전체를 디코딩하지 않고,
+  EXIF 회전은 축소된 이미지에 적용합니다.
+  """
+  ext = os.path.splitext(str(file_path))[-1].lower()
+  # 이미지가 올바르게 열리는지 확인 (imghdr는 HEIC/HEIF를 인식하지 못하므로 확장자로 보완)
+  if imghdr.what(file_path) in ['png', 'jpeg', 'jpg', 'gif', 'bmp', 'tiff', 'webp', 'heic'] or ext in ('.heic', '.heif'):
+    try:
+      with Image.open(file_path) as img:
+        orientation = _exif_orientation(img)
+        source = _embedded_thumbnail(img, img_size) if img.format == 'JPEG' else None
+        if source is None:
+          # JPEG은 목표 크기의 2배 이상을 유지하는 가장 작은 배율(1/2, 1/4, 1/8)로만 디코딩
+          img.draft(None, (img_size * 2, img_size * 2))
+          source = img
+
+        if backGroundColor:
+          source.thumbnail((img_size, img_size), Image.LANCZOS)
+        else:
+          source.thumbnail((img_size, img_size))
+        #EXIF 데이터를 사용하여 이미지 회전
+        source = _apply_orientation(source, orientation)
+
+        img_buffer = BytesIO()
+        if backGroundColor:
+          img_out = Image.new('RGBA', (img_size, img_size), backGroundColor)
+          img_out.paste(source, ((img_size - source.width) // 2, (img_size - source.height) // 2))
+          img_out.save(img_buffer, format="PNG")  # PNG 또는 원하는 포맷
+        else:
+          source.save(img_buffer, format='PNG')
+
+        return img_buffer.getvalue()
+    except UnidentifiedImageError as e:
+      print(f"Error processing {file_path}: {e}")
+  else:
+      print(f"File {file_path} is not a valid image.")
+
+
+def extractPosterFrame(file_path):
+  """
+  OpenCV로 동영상 시작 부분의 키프레임을 읽어 RGB PIL 이미지로 반환합니다.
+  컨테이너 전체를 분석하지 않고 첫 프레임만 디코딩하며, 첫 프레임이 거의 검은 화면이면
+  1초 지점으로 이동해 한 번 더 읽습니다. 읽지 못하면 None.
+  """
+  cap = cv2.VideoCapture(str(file_path))
+  try:
+    if not cap.isOpened():
+      return None
+    ok, frame = cap.read()
+    if ok and frame.mean() < 8:
+      cap.set(cv2.CAP_PROP_POS_MSEC, 1000)
+      ok_later, later = cap.read()
+      if ok_later:
+        frame = later
+    if not ok:
+      return None
+    return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+  finally:
+    cap.release()
+
+
+def renderVideoThumbnail(file_path, img_size, backgroundColor):
+  """
+  동영상 파일 경로를 입력받아 썸네일 이미지를 생성한 뒤 PNG 바이트로 반환합니다.
+
+  :param file_path: 동영상 파일 경로
+  :param img_size: 썸네일 크기 (너비와 높이 최대값)
+  :return: PNG 썸네일 바이트
+  """
+  try:
+    # 동영상 시작 부분의 대표 프레임 추출
+    img = extractPosterFrame(file_path)
+    if img is None:
+      print(f"Error processing video file {file_path}: no frame could be read")
+      return None
+
+    # 썸네일 생성
+    max_size = (img_size, img_size)
+    img.thumbnail(max_size, Image.LANCZOS)
+    img_out = Image.new('RGBA', (img_size, img_size), backgroundColor)
+    img_out.paste(img, ((img_size - img.width) // 2, (img_size - img.height) // 2))
+
+    # BytesIO 객체에 이미지 저장
+    output = BytesIO()
+    img_out.save(output, format='PNG')  # PNG 형식으로 저장
+    return output.getvalue()
+
+  except Exception as e:
+    print(f"Error processing video file {file_path}: {e}")
+    return None
+
+
+def renderPdfThumbnail(file_path, width):
+  """
+  PDF 첫 페이지를 너비 width 픽셀로 렌더링해 PNG 바이트로 반환합니다.
+  기본 200 DPI로 전체 페이지를 그린 뒤 줄이지 않고 pdftoppm이 처음부터 목표 너비로 그리게 합니다.
+  """
+  try:
+    images = convert_from_path(file_path, first_page=1, last_page=1, size=(width, None), single_file=True)
+    if not images:
+      return None
+    output = BytesIO()
+    images[0].save(output, format='PNG')
+    return output.getvalue()
+  except Exception as e:
+    print(f"Error processing pdf file {file_path}: {e}")
+    return None
@@ -0,0 +1,36 @@
+import sqlite3
+import threading
+import unicodedata
+from pathlib import Path
+
+
+def path_key(path):
+  """MacOS의 NFD 파일명과 요청으로 들어온 NFC 경로가 같은 키가 되도록 정규화"""
+  return unicodedata.normalize("NFC", str(path)).rstrip('/') or '/'
+
+
+def subtree_bounds(key):
+  """key 하위 경로 전체를 범위 조건(>= lower, < upper)으로 표현 ('/' 다음 문자는 '0')"""
+  return key.rstrip('/') + '/', key.rstrip('/') + '0'
+
+
+class SQLiteStore:
+  """스레드마다 커넥션을 따로 여는 SQLite 저장소 기반 클래스"""
+  schema = ""
+
+  def __init__(self, db_path):
+    self.db_path = Path(db_path)
+    self.db_path.parent.mkdir(parents=True, exist_ok=True)
+    self._local = threading.local()
+    with self.connect() as conn:
+      conn.executescript(self.schema)
+
+  def connect(self):
+    conn = getattr(self._local, "conn", None)
+    if conn is None:
+      conn = sqlite3.connect(str(self.db_path), timeout=30)
+      conn.row_factory = sqlite3.Row
+      conn.execute("PRAGMA journal_mode=WAL")
+      conn.execute("PRAGMA synchronous=NORMAL")
+      self._local.conn = conn
+    return conn
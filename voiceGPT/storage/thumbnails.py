@@ -0,0 +1,132 @@
+import os
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from .store import SQLiteStore, path_key, subtree_bounds
+
+
+class ThumbnailStore(SQLiteStore):
+  """
+  (경로, 크기, 수정 시각, 파일 크기, 변형)으로 키를 만들어 PNG 썸네일을 디스크에 캐시하는 저장소.
+
+  원본이 바뀌면 키가 달라지므로 별도 무효화 없이 새 썸네일이 만들어지고,
+  오래된 항목은 전체 용량이 max_bytes를 넘을 때 마지막 사용 시각 순(LRU)으로 삭제됩니다.
+  """
+  schema = """
+  CREATE TABLE IF NOT EXISTS thumbnails (
+    key TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    accessed REAL NOT NULL
+  );
+  CREATE INDEX IF NOT EXISTS ix_thumbnails_accessed ON thumbnails (accessed);
+  CREATE INDEX IF NOT EXISTS ix_thumbnails_path ON thumbnails (path);
+  """
+
+  def __init__(self, cache_dir, max_bytes=1024 * 1024 * 1024, workers=2):
+    self.cache_dir = Path(cache_dir)
+    self.max_bytes = max_bytes
+    self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail-warm")
+    self._pending = set()
+    self._pending_lock = threading.Lock()
+    super().__init__(self.cache_dir / "thumbnails.db")
+
+  @staticmethod
+  def make_key(path, size, variant=""):
+    """원본 파일 상태로 캐시 키를 만들고 (키, 원본 수정 시각)을 반환"""
+    st = os.stat(path)
+    raw = f"{path_key(path)}|{size}|{st.st_mtime_ns}|{st.st_size}|{variant}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest(), st.st_mtime
+
+  def get(self, key):
+    """캐시된 PNG 바이트를 반환. 없으면 None"""
+    try:
+      data = self._file(key).read_bytes()
+    except FileNotFoundError:
+      return None
+    conn = self.connect()
+    with conn:
+      conn.execute("UPDATE thumbnails SET accessed = ? WHERE key = ?", (time.time(), key))
+    return data
+
+  def put(self, key, path, data):
+    target = self._file(key)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(f".{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, target)
+    conn = self.connect()
+    with conn:
+      conn.execute(
+        "INSERT OR REPLACE INTO thumbnails (key, path, bytes, accessed) VALUES (?, ?, ?, ?)",
+        (key, path_key(path), len(data), time.time()),
+      )
+    self._evict()
+
+  def get_or_render(self, path, size, render, variant=""):
+    """
+    캐시에서 썸네일을 찾고, 없으면 render()로 PNG 바이트를 만들어 저장합니다.
+    (키, 원본 수정 시각, PNG 바이트 또는 None)을 반환합니다.
+    """
+    key, mtime = self.make_key(path, size, variant)
+    data = self.get(key)
+    if data is None:
+      data = render()
+      if data:
+        self.put(key, path, data)
+    return key, mtime, data
+
+  def warm(self, jobs):
+    """(경로, 크기, 변형, render) 목록을 백그라운드에서 미리 생성"""
+    for path, size, variant, render in jobs:
+      token = (path_key(path), size, variant)
+      with self._pending_lock:
+        if token in self._pending:
+          continue
+        self._pending.add(token)
+      self._executor.submit(self._warm_one, token, path, size, variant, render)
+
+  def discard(self, path):
+    """삭제/이동된 경로(폴더이면 하위 전체)의 썸네일 제거"""
+    key = path_key(path)
+    lower, upper = subtree_bounds(key)
+    conn = self.connect()
+    with conn:
+      rows = conn.execute(
+        "SELECT key FROM thumbnails WHERE path = ? OR (path >= ? AND path < ?)", (key, lower, upper)
+      ).fetchall()
+      conn.execute("DELETE FROM thumbnails WHERE path = ? OR (path >= ? AND path < ?)", (key, lower, upper))
+    for row in rows:
+      self._file(row["key"]).unlink(missing_ok=True)
+
+  def _warm_one(self, token, path, size, variant, render):
+    try:
+      self.get_or_render(path, size, render, variant)
+    except Exception as e:
+      print(f"Error warming thumbnail {path}: {e}")
+    finally:
+      with self._pending_lock:
+        self._pending.discard(token)
+
+  def _evict(self):
+    """용량 초과 시 오래 사용하지 않은 썸네일부터 삭제 (상한의 90%까지)"""
+    conn = self.connect()
+    total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM thumbnails").fetchone()[0]
+    if total <= self.max_bytes:
+      return
+    target = self.max_bytes * 0.9
+    victims = []
+    for row in conn.execute("SELECT key, bytes FROM thumbnails ORDER BY accessed"):
+      if total <= target:
+        break
+      victims.append(row["key"])
+      total -= row["bytes"]
+    with conn:
+      conn.executemany("DELETE FROM thumbnails WHERE key = ?", [(key,) for key in victims])
+    for key in victims:
+      self._file(key).unlink(missing_ok=True)
+
+  def _file(self, key):
+    return self.cache_dir / "thumbnails" / key[:2] / f"{key}.png"
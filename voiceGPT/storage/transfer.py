@@ -0,0 +1,181 @@
+import os
+import sys
+import time
+import errno
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .delete import remove_path
+
+COPY_CHUNK_SIZE = 64 * 1024 * 1024  # copy_file_range/sendfile 한 번에 넘기는 최대 크기
+READ_SIZE = 1024 * 1024
+REPORT_INTERVAL = 0.5  # 진행률 기록 간격(초)
+
+
+class TransferProgress:
+  """여러 스레드에서 처리한 바이트/항목 수를 모아 일정 간격으로 job.progress()에 기록"""
+
+  def __init__(self, job, bytes_total=0, items_total=0):
+    self.job = job
+    self.bytes_total = bytes_total
+    self.items_total = items_total
+    self.bytes_done = 0
+    self.items_done = 0
+    self.current = None
+    self._lock = threading.Lock()
+    self._reported = 0
+
+  def add_bytes(self, count):
+    with self._lock:
+      self.bytes_done += count
+    self.report()
+
+  def item_done(self, current=None):
+    with self._lock:
+      self.items_done += 1
+      self.current = current
+    self.report(force=True)
+
+  def report(self, force=False):
+    now = time.monotonic()
+    if self.job is None or (not force and now - self._reported < REPORT_INTERVAL):
+      return
+    self._reported = now
+    if self.bytes_total:
+      value = min(self.bytes_done / self.bytes_total, 1.0)
+    else:
+      value = self.items_done / self.items_total if self.items_total else 0
+    self.job.progress(
+      value, bytesDone=self.bytes_done, bytesTotal=self.bytes_total,
+      itemsDone=self.items_done, itemsTotal=self.items_total, current=self.current,
+    )
+
+
+def tree_size(path):
+  """파일이면 크기, 폴더면 하위 파일 크기 합계 (심볼릭 링크는 링크로 복사하므로 제외)"""
+  if os.path.islink(path):
+    return 0
+  if not os.path.isdir(path):
+    return os.stat(path).st_size
+  total = 0
+  stack = [path]
+  while stack:
+    with os.scandir(stack.pop()) as entries:
+      for entry in entries:
+        try:
+          if entry.is_dir(follow_symlinks=False):
+            stack.append(entry.path)
+          elif entry.is_file(follow_symlinks=False):
+            total += entry.stat(follow_symlinks=False).st_size
+        except OSError:
+          continue
+  return total
+
+
+def same_device(src, target_dir):
+  return os.stat(src, follow_symlinks=False).st_dev == os.stat(target_dir).st_dev
+
+
+def copy_file(src, dst, progress=None):
+  """
+  파일 내용을 커널 안에서 복사합니다 (copy_file_range → sendfile → 읽기/쓰기 순으로 시도).
+  복사한 바이트 수를 progress에 반영하고 권한/수정 시각도 복사합니다.
+  """
+  if os.path.islink(src):
+    os.symlink(os.readlink(src), dst)
+    return
+  with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+    size = os.fstat(fsrc.fileno()).st_size
+    _copy_fd(fsrc.fileno(), fdst.fileno(), size, progress)
+  shutil.copystat(src, dst)
+
+
+def _copy_fd(src_fd, dst_fd, size, progress):
+  copied = 0
+  for method in ("copy_file_range", "sendfile"):
+    func = getattr(os, method, None)
+    if func is None or (method == "sendfile" and not sys.platform.startswith("linux")):
+      continue
+    try:
+      while copied < size:
+        if method == "copy_file_range":
+          sent = func(src_fd, dst_fd, min(COPY_CHUNK_SIZE, size - copied))
+        else:
+          sent = func(dst_fd, src_fd, copied, min(COPY_CHUNK_SIZE, size - copied))
+        if sent == 0:
+          break
+        copied += sent
+        if progress is not None:
+          progress.add_bytes(sent)
+      return
+    except OSError as e:
+      # 파일시스템이 지원하지 않으면 다음 방법으로 이어서 복사
+      if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.ENOTSUP, errno.EOPNOTSUPP, errno.EBADF):
+        raise
+  os.lseek(src_fd, copied, os.SEEK_SET)
+  os.lseek(dst_fd, copied, os.SEEK_SET)
+  buffer = bytearray(READ_SIZE)
+  view = memoryview(buffer)
+  while True:
+    read = os.readv(src_fd, [buffer])
+    if not read:
+      break
+    os.write(dst_fd, view[:read])
+    if progress is not None:
+      progress.add_bytes(read)
+
+
+def copy_tree(src, dst, progress=None, workers=4):
+  """
+  폴더 구조를 먼저 만든 뒤 파일들을 스레드 풀에서 병렬로 복사합니다.
+  폴더의 수정 시각은 안의 파일을 모두 복사한 뒤 맞춥니다.
+  """
+  dirs = []
+  files = []
+  for current, dir_names, file_names in os.walk(src):
+    relative = os.path.relpath(current, src)
+    target = os.path.normpath(os.path.join(dst, relative))
+    os.makedirs(target, exist_ok=True)
+    dirs.append((current, target))
+    for dir_name in list(dir_names):
+      if os.path.islink(os.path.join(current, dir_name)):
+        # 폴더 심볼릭 링크는 따라가지 않고 링크로 복사
+        dir_names.remove(dir_name)
+        file_names.append(dir_name)
+    files.extend((os.path.join(current, name), os.path.join(target, name)) for name in file_names)
+
+  with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="copy") as executor:
+    for future in [executor.submit(copy_file, s, d, progress) for s, d in files]:
+      future.result()
+  for source_dir, target_dir in reversed(dirs):
+    shutil.copystat(source_dir, target_dir)
+
+
+def copy_item(src, dst, staging, progress=None, workers=4):
+  """
+  src를 staging 경로에 복사한 뒤 dst로 이름을 바꿔, 중간에 실패해도 dst에 반쯤 복사된 항목이 남지 않게 합니다.
+  """
+  remove_path(staging)
+  try:
+    if os.path.isdir(src) and not os.path.islink(src):
+      copy_tree(src, staging, progress, workers)
+    else:
+      copy_file(src, staging, progress)
+    if os.path.lexists(dst):
+      raise FileExistsError(errno.EEXIST, "File already exists", dst)
+    os.rename(staging, dst)
+  except BaseException:
+    remove_path(staging)
+    raise
+
+
+def move_item(src, dst, staging, progress=None, workers=4):
+  """같은 파일시스템이면 os.rename, 아니면 복사 후 원본 삭제"""
+  try:
+    os.rename(src, dst)
+    return
+  except OSError as e:
+    if e.errno != errno.EXDEV:
+      raise
+  copy_item(src, dst, staging, progress, workers)
+  remove_path(src)
@@ -0,0 +1,182 @@
+import os
+import time
+import uuid
+import hashlib
+from .store import SQLiteStore
+
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+SESSION_TTL = 2 * 24 * 60 * 60  # 이틀 동안 갱신되지 않은 세션은 정리
+READ_SIZE = 1024 * 1024
+
+
+class UploadSessionStore(SQLiteStore):
+  """
+  재개 가능한 분할 업로드 세션 저장소.
+
+  세션을 만들 때 대상 폴더에 숨김 임시 파일(.<파일명>.<세션ID>.upload)을 전체 크기로 만들어 두고,
+  각 청크는 인덱스 위치(index * chunk_size)에 pwrite로 기록합니다. 순서와 상관없이 동시에 받을 수 있으며,
+  받은 청크 번호는 SQLite에 남으므로 연결이 끊겨도 빠진 청크만 다시 보내면 됩니다.
+  완료 시 크기/해시를 검증한 뒤 최종 경로로 원자적으로 이름을 바꿉니다.
+  """
+  schema = """
+  CREATE TABLE IF NOT EXISTS upload_sessions (
+    id TEXT PRIMARY KEY,
+    target TEXT NOT NULL,
+    staging TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    chunk_size INTEGER NOT NULL,
+    total_chunks INTEGER NOT NULL,
+    hash TEXT,
+    hash_algorithm TEXT,
+    fingerprint TEXT,
+    kind TEXT NOT NULL,
+    updated REAL NOT NULL
+  );
+  CREATE INDEX IF NOT EXISTS ix_upload_sessions_target ON upload_sessions (target);
+  CREATE TABLE IF NOT EXISTS upload_chunks (
+    session_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    PRIMARY KEY (session_id, idx)
+  );
+  """
+
+  def create(self, target, size, chunk_size, kind="file", file_hash=None, hash_algorithm="sha256", fingerprint=None):
+    """
+    업로드 세션을 만들고 세션 정보를 반환합니다.
+    같은 대상/크기/청크 크기/해시(또는 fingerprint)로 진행 중인 세션이 있으면 그 세션을 이어서 사용합니다.
+    """
+    if size < 0:
+      raise ValueError("size must not be negative")
+    if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+      raise ValueError(f"chunkSize must be between {MIN_CHUNK_SIZE} and {MAX_CHUNK_SIZE}")
+    if file_hash:
+      hashlib.new(hash_algorithm)  # 지원하지 않는 알고리즘이면 ValueError
+      file_hash = file_hash.lower()
+    self.expire()
+
+    conn = self.connect()
+    row = conn.execute(
+      "SELECT * FROM upload_sessions WHERE target = ? AND size = ? AND chunk_size = ? "
+      "AND hash IS ? AND fingerprint IS ? ORDER BY updated DESC",
+      (target, size, chunk_size, file_hash, fingerprint),
+    ).fetchone()
+    if row is not None and os.path.exists(row["staging"]):
+      return dict(row)
+
+    session_id = uuid.uuid4().hex
+    staging = os.path.join(os.path.dirname(target), f".{os.path.basename(target)}.{session_id}.upload")
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # 전체 크기로 미리 만들어 두면 청크가 어떤 순서로 와도 제 위치에 기록됨 (sparse 파일)
+    fd = os.open(staging, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+      os.ftruncate(fd, size)
+    finally:
+      os.close(fd)
+
+    session = {
+      "id": session_id, "target": target, "staging": staging, "size": size, "chunk_size": chunk_size,
+      "total_chunks": max(1, -(-size // chunk_size)), "hash": file_hash,
+      "hash_algorithm": hash_algorithm if file_hash else None, "fingerprint": fingerprint,
+      "kind": kind, "updated": time.time(),
+    }
+    with conn:
+      conn.execute(
+        "INSERT INTO upload_sessions (id, target, staging, size, chunk_size, total_chunks, hash, hash_algorithm, "
+        "fingerprint, kind, updated) VALUES (:id, :target, :staging, :size, :chunk_size, :total_chunks, :hash, "
+        ":hash_algorithm, :fingerprint, :kind, :updated)",
+        session,
+      )
+    return session
+
+  def get(self, session_id):
+    row = self.connect().execute("SELECT * FROM upload_sessions WHERE id = ?", (session_id,)).fetchone()
+    return dict(row) if row is not None else None
+
+  def missing(self, session):
+    """아직 받지 못한 청크 인덱스 목록"""
+    received = {
+      row["idx"] for row in self.connect().execute("SELECT idx FROM upload_chunks WHERE session_id = ?", (session["id"],))
+    }
+    return [index for index in range(session["total_chunks"]) if index not in received]
+
+  def write_chunk(self, session, index, stream):
+    """청크를 index 위치에 기록. 청크 길이가 맞지 않으면 ValueError"""
+    if not 0 <= index < session["total_chunks"]:
+      raise ValueError(f"chunk index {index} out of range")
+    offset = index * session["chunk_size"]
+    expected = min(session["chunk_size"], session["size"] - offset)
+
+    written = 0
+    fd = os.open(session["staging"], os.O_WRONLY)
+    try:
+      while written <= expected:
+        data = stream.read(min(READ_SIZE, expected - written + 1))
+        if not data:
+          break
+        if written + len(data) > expected:
+          raise ValueError(f"chunk {index} is larger than {expected} bytes")
+        os.pwrite(fd, data, offset + written)
+        written += len(data)
+    finally:
+      os.close(fd)
+    if written != expected:
+      raise ValueError(f"chunk {index} has {written} bytes, expected {expected}")
+
+    conn = self.connect()
+    with conn:
+      conn.execute("INSERT OR IGNORE INTO upload_chunks (session_id, idx) VALUES (?, ?)", (session["id"], index))
+      conn.execute("UPDATE upload_sessions SET updated = ? WHERE id = ?", (time.time(), session["id"]))
+
+  def finalize(self, session):
+    """
+    모든 청크를 받았는지와 해시를 확인한 뒤 임시 파일을 최종 경로로 옮기고 최종 경로를 반환합니다.
+    빠진 청크가 있거나 해시가 다르면 ValueError.
+    """
+    missing = self.missing(session)
+    if missing:
+      raise ValueError(f"{len(missing)} chunks are missing")
+    if os.path.getsize(session["staging"]) != session["size"]:
+      raise ValueError("uploaded size does not match")
+
+    fd = os.open(session["staging"], os.O_RDONLY)
+    try:
+      if session["hash"]:
+        digest = hashlib.new(session["hash_algorithm"])
+        while data := os.read(fd, READ_SIZE):
+          digest.update(data)
+        if digest.hexdigest() != session["hash"]:
+          self.abort(session)
+          raise ValueError("hash mismatch")
+    finally:
+      os.close(fd)
+
+    fd = os.open(session["staging"], os.O_WRONLY)
+    try:
+      os.fsync(fd)
+    finally:
+      os.close(fd)
+    os.replace(session["staging"], session["target"])
+    self._forget(session["id"])
+    return session["target"]
+
+  def abort(self, session):
+    try:
+      os.remove(session["staging"])
+    except FileNotFoundError:
+      pass
+    self._forget(session["id"])
+
+  def expire(self, max_age=SESSION_TTL):
+    """오래 갱신되지 않은 세션과 임시 파일 정리"""
+    rows = self.connect().execute(
+      "SELECT * FROM upload_sessions WHERE updated < ?", (time.time() - max_age,)
+    ).fetchall()
+    for row in rows:
+      self.abort(dict(row))
+
+  def _forget(self, session_id):
+    conn = self.connect()
+    with conn:
+      conn.execute("DELETE FROM upload_chunks WHERE session_id = ?", (session_id,))
+      conn.execute("DELETE FROM upload_sessions WHERE id = ?", (session_id,))
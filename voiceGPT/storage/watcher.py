@@ -0,0 +1,335 @@
+import os
+import sys
+import time
+import errno
+import ctypes
+import ctypes.util
+import select
+import struct
+import threading
+from .name_index import is_hidden
+
+# inotify 상수 (linux/inotify.h)
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+  IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+  | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class FileWatcher:
+  """
+  저장소 루트 아래의 파일 변경을 감지해 구독자에게 묶음으로 알려주는 감시자.
+
+  Linux에서는 inotify로 폴더마다 watch를 걸고, 사용할 수 없거나 watch 개수 한도에 걸리면
+  폴더 mtime을 주기적으로 비교하는 폴링 방식으로 바뀝니다.
+  이벤트는 debounce초 동안 조용해지거나 max_delay초가 지나면 한 번에 전달하며, 같은 폴더에서
+  collapse_threshold개 넘게 바뀌면 "그 폴더의 직속 목록이 바뀜" 하나로 합치므로 압축 해제처럼
+  대량 변경이 생겨도 구독자는 몇 번의 갱신만 하면 됩니다.
+
+  구독자는 callback(paths, dirs)로 받습니다. paths는 생성/수정/삭제된 파일 또는 폴더(폴더이면
+  하위 전체가 바뀌었을 수 있음), dirs는 직속 목록만 다시 읽으면 되는 폴더입니다. inotify 이벤트를
+  놓친 경우(대기열 넘침)와 폴링 방식에서는 mtime이 바뀐 폴더만 dirs로 알립니다. 폴더 mtime에
+  드러나지 않는 기존 파일 내용 변경은 이때 감지되지 않습니다.
+  """
+
+  def __init__(self, root, mode="auto", debounce=1.0, max_delay=10.0, poll_interval=10.0, collapse_threshold=64):
+    self.root = os.fspath(root).rstrip('/') or '/'
+    self.mode = mode
+    self.debounce = debounce
+    self.max_delay = max_delay
+    self.poll_interval = poll_interval
+    self.collapse_threshold = collapse_threshold
+    self.backend = None
+    self._subscribers = []
+    self._pending = set()
+    self._pending_dirs = set()
+    self._first_event = None
+    self._last_event = None
+    self._cond = threading.Condition()
+    self._stop = threading.Event()
+    self._threads = []
+    self._start_lock = threading.Lock()
+
+  def subscribe(self, callback):
+    """callback(paths, dirs)를 등록. paths는 변경된 파일/폴더, dirs는 직속 목록이 바뀐 폴더 경로 목록"""
+    self._subscribers.append(callback)
+
+  def start(self):
+    """감시 스레드와 전달 스레드를 시작 (처음 한 번만 수행)"""
+    with self._start_lock:
+      if self._threads or self.mode == "off" or not os.path.isdir(self.root):
+        return
+      self._stop.clear()
+      watch = self._poll_loop
+      if self.mode in ("auto", "inotify") and sys.platform.startswith("linux"):
+        try:
+          inotify = _Inotify()
+          watch = lambda: self._inotify_loop(inotify)
+        except OSError as e:
+          print(f"Error starting inotify watcher, falling back to polling: {e}")
+      for target, name in ((watch, "fs-watch"), (self._dispatch_loop, "fs-watch-dispatch")):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+  def stop(self):
+    self._stop.set()
+    with self._cond:
+      self._cond.notify_all()
+    for thread in self._threads:
+      thread.join(timeout=5)
+    self._threads = []
+
+  def notify(self, *paths):
+    """변경 경로를 대기열에 추가 (감시 백엔드가 호출)"""
+    self._enqueue(self._pending, paths)
+
+  def notify_dirs(self, *dirs):
+    """직속 목록이 바뀐 폴더를 대기열에 추가"""
+    self._enqueue(self._pending_dirs, dirs)
+
+  def _enqueue(self, pending, paths):
+    now = time.monotonic()
+    with self._cond:
+      if not self._pending and not self._pending_dirs:
+        self._first_event = now
+      pending.update(paths)
+      self._last_event = now
+      self._cond.notify_all()
+
+  def _dispatch_loop(self):
+    while not self._stop.is_set():
+      with self._cond:
+        while not self._pending and not self._pending_dirs and not self._stop.is_set():
+          self._cond.wait()
+        # 조용해질 때까지(또는 최대 지연까지) 기다렸다가 한 번에 전달
+        while not self._stop.is_set():
+          now = time.monotonic()
+          deadline = min(self._last_event + self.debounce, self._first_event + self.max_delay)
+          if now >= deadline:
+            break
+          self._cond.wait(deadline - now)
+        paths, self._pending = self._pending, set()
+        dirs, self._pending_dirs = self._pending_dirs, set()
+      if not paths and not dirs:
+        continue
+      paths, dirs = self.coalesce(paths, dirs)
+      for callback in self._subscribers:
+        try:
+          callback(paths, dirs)
+        except Exception as e:
+          print(f"Error handling file changes: {e}")
+
+  def coalesce(self, paths, dirs=()):
+    """
+    (paths, dirs)로 정리. 한 폴더에 변경이 많으면 그 폴더의 목록 변경(dirs) 하나로 합치고,
+    상위 경로가 paths에 이미 포함된 경로와 폴더는 뺍니다.
+    """
+    paths, dirs = set(paths), set(dirs)
+    by_parent = {}
+    for path in paths:
+      by_parent.setdefault(os.path.dirname(path), []).append(path)
+    for parent, children in by_parent.items():
+      if len(children) > self.collapse_threshold and (parent == self.root or parent.startswith(self.root.rstrip('/') + '/')):
+        paths.difference_update(children)
+        dirs.add(parent)
+
+    result = []
+    for path in sorted(paths):
+      if result and (path == result[-1] or path.startswith(result[-1].rstrip('/') + '/')):
+        continue
+      result.append(path)
+    covered = lambda path: any(path == deep or path.startswith(deep.rstrip('/') + '/') for deep in result)
+    return result, [path for path in sorted(dirs) if not covered(path)]
+
+  # --- inotify 백엔드 ---
+
+  def _inotify_loop(self, inotify):
+    self.backend = "inotify"
+    wd_paths = {}
+    dir_mtimes = {}  # 감시 중인 폴더의 마지막으로 확인한 mtime (이벤트를 놓쳤을 때 비교용)
+    try:
+      if not self._watch_tree(inotify, wd_paths, dir_mtimes, self.root):
+        raise OSError(errno.ENOSPC, "inotify watch limit reached")
+      while not self._stop.is_set():
+        readable, _, _ = select.select([inotify.fd], [], [], 1.0)
+        if not readable:
+          continue
+        try:
+          data = os.read(inotify.fd, 64 * 1024)
+        except BlockingIOError:
+          continue
+        for wd, mask, name in _parse_events(data):
+          if mask & IN_Q_OVERFLOW:
+            # 이벤트를 놓쳤으므로 mtime이 바뀐 폴더만 목록을 다시 읽도록 알림
+            self._recheck_dirs(dir_mtimes)
+            continue
+          if mask & IN_IGNORED:
+            dir_mtimes.pop(wd_paths.pop(wd, None), None)
+            continue
+          base = wd_paths.get(wd)
+          if base is None:
+            continue
+          if not name:
+            # 감시 중인 폴더 자체가 삭제/이동됨. 상위 폴더 watch의 이벤트로 처리됨
+            continue
+          if is_hidden(name):
+            continue
+          path = os.path.join(base, name)
+          if mask & (IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO):
+            _record_mtime(dir_mtimes, base)
+          if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+            if not self._watch_tree(inotify, wd_paths, dir_mtimes, path):
+              raise OSError(errno.ENOSPC, "inotify watch limit reached")
+          self.notify(path)
+    except OSError as e:
+      print(f"Error in inotify watcher, falling back to polling: {e}")
+      if not self._stop.is_set():
+        self._poll_loop()
+    finally:
+      inotify.close()
+
+  def _watch_tree(self, inotify, wd_paths, dir_mtimes, top):
+    """top 하위 모든 폴더에 watch를 검. watch 개수 한도에 걸리면 False"""
+    stack = [top]
+    while stack:
+      current = stack.pop()
+      try:
+        wd = inotify.add_watch(current, WATCH_MASK)
+      except OSError as e:
+        if e.errno == errno.ENOSPC:
+          return False
+        continue  # 그 사이 삭제되었거나 접근할 수 없는 폴더
+      wd_paths[wd] = current
+      _record_mtime(dir_mtimes, current)
+      try:
+        with os.scandir(current) as entries:
+          for entry in entries:
+            if not is_hidden(entry.name) and entry.is_dir(follow_symlinks=False):
+              stack.append(entry.path)
+      except OSError:
+        continue
+    return True
+
+  def _recheck_dirs(self, dir_mtimes):
+    """기록된 mtime과 다른 폴더를 목록 변경으로 알림. 없어진 폴더는 상위 폴더의 변경으로 반영됨"""
+    for path, mtime in list(dir_mtimes.items()):
+      try:
+        current = os.stat(path).st_mtime_ns
+      except OSError:
+        dir_mtimes.pop(path, None)
+        continue
+      if current != mtime:
+        dir_mtimes[path] = current
+        self.notify_dirs(path)
+
+  # --- 폴링 백엔드 ---
+
+  def _poll_loop(self):
+    """폴더 mtime만 비교해 바뀐 폴더의 하위 폴더 목록을 다시 읽고 목록 변경으로 알림"""
+    self.backend = "poll"
+    snapshot = {}
+    self._poll_once(snapshot, report=False)
+    while not self._stop.wait(self.poll_interval):
+      try:
+        self._poll_once(snapshot, report=True)
+      except Exception as e:
+        print(f"Error polling for file changes: {e}")
+
+  def _poll_once(self, snapshot, report):
+    """snapshot: {폴더: (mtime_ns, 하위 폴더 이름 목록)}. 파일별 상태는 보관하지 않음"""
+    seen = set()
+    stack = [self.root]
+    while stack:
+      current = stack.pop()
+      seen.add(current)
+      try:
+        mtime = os.stat(current).st_mtime_ns
+      except OSError:
+        continue
+      previous = snapshot.get(current)
+      if previous is None or previous[0] != mtime:
+        subdirs = _list_subdirs(current)
+        if subdirs is None:
+          continue
+        if report:
+          self.notify_dirs(current)
+        snapshot[current] = (mtime, subdirs)
+      stack.extend(os.path.join(current, name) for name in snapshot[current][1])
+    for path in snapshot.keys() - seen:
+      del snapshot[path]
+
+
+def _record_mtime(dir_mtimes, path):
+  try:
+    dir_mtimes[path] = os.stat(path).st_mtime_ns
+  except OSError:
+    dir_mtimes.pop(path, None)
+
+
+def _list_subdirs(path):
+  """숨김 항목을 제외한 하위 폴더 이름 목록. 읽을 수 없으면 None"""
+  subdirs = []
+  try:
+    with os.scandir(path) as it:
+      for entry in it:
+        try:
+          if not is_hidden(entry.name) and entry.is_dir(follow_symlinks=False):
+            subdirs.append(entry.name)
+        except OSError:
+          continue
+  except OSError:
+    return None
+  return subdirs
+
+
+def _parse_events(data):
+  offset = 0
+  while offset + EVENT_HEADER.size <= len(data):
+    wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+    offset += EVENT_HEADER.size
+    name = data[offset:offset + length].rstrip(b"\0")
+    offset += length
+    yield wd, mask, os.fsdecode(name)
+
+
+class _Inotify:
+  """ctypes로 libc의 inotify 함수를 감싼 최소 래퍼"""
+
+  def __init__(self):
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    self._add_watch = libc.inotify_add_watch
+    self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    if self.fd < 0:
+      err = ctypes.get_errno()
+      raise OSError(err, os.strerror(err))
+
+  def add_watch(self, path, mask):
+    wd = self._add_watch(self.fd, os.fsencode(path), mask)
+    if wd < 0:
+      err = ctypes.get_errno()
+      raise OSError(err, os.strerror(err), path)
+    return wd
+
+  def close(self):
+    try:
+      os.close(self.fd)
+    except OSError:
+      pass
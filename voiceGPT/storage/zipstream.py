@@ -0,0 +1,155 @@
+import os
+import time
+import uuid
+import zipfile
+
+# 이미 압축된 형식은 다시 압축해도 크기가 거의 줄지 않으므로 STORED로 저장
+STORED_EXTENSIONS = {
+  '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.heif',
+  '.mp4', '.mov', '.avi', '.mkv', '.wmv', '.flv', '.m4v', '.webm',
+  '.mp3', '.m4a', '.aac', '.ogg', '.flac',
+  '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar',
+  '.pdf', '.docx', '.xlsx', '.pptx', '.hwpx',
+}
+CHUNK_SIZE = 1024 * 1024
+
+
+def compress_type_for(name):
+  """파일 확장자에 따라 ZIP 압축 방식을 결정"""
+  if os.path.splitext(name)[1].lower() in STORED_EXTENSIONS:
+    return zipfile.ZIP_STORED
+  return zipfile.ZIP_DEFLATED
+
+
+class _StreamBuffer:
+  """
+  ZipFile이 쓰는 바이트를 모아두었다가 꺼내갈 수 있는 쓰기 전용 스트림.
+  seek/tell을 지원하지 않으므로 ZipFile은 로컬 헤더 뒤에 data descriptor를 붙여 기록합니다.
+  """
+  def __init__(self):
+    self._chunks = []
+
+  def write(self, data):
+    self._chunks.append(bytes(data))
+    return len(data)
+
+  def flush(self):
+    pass
+
+  def drain(self):
+    data = b''.join(self._chunks)
+    self._chunks.clear()
+    return data
+
+
+def _zipinfo(arcname, st, compress_type, is_dir=False):
+  date_time = time.localtime(st.st_mtime)[:6]
+  # ZIP 형식은 1980년 이전 날짜를 표현할 수 없음
+  if date_time[0] < 1980:
+    date_time = (1980, 1, 1, 0, 0, 0)
+  zinfo = zipfile.ZipInfo(arcname + ('/' if is_dir else ''), date_time)
+  zinfo.external_attr = (st.st_mode & 0xFFFF) << 16
+  if is_dir:
+    zinfo.external_attr |= 0x10
+    zinfo.compress_type = zipfile.ZIP_STORED
+  else:
+    zinfo.compress_type = compress_type
+    # 크기를 미리 알려 4GB 이상 파일은 ZIP64 헤더로 기록되게 함
+    zinfo.file_size = st.st_size
+  return zinfo
+
+
+def iter_zip(folder_path, chunk_size=CHUNK_SIZE):
+  """
+  폴더를 순회하며 ZIP 바이트를 바로 만들어 내보내는 제너레이터.
+  임시 파일 없이 파일을 읽는 대로 헤더와 데이터를 내보내므로 첫 응답 바이트까지의 시간이 폴더 크기와 무관합니다.
+  """
+  folder_path = os.fspath(folder_path)
+  buffer = _StreamBuffer()
+  with zipfile.ZipFile(buffer, 'w', allowZip64=True) as zf:
+    for current, dirs, files in os.walk(folder_path):
+      dirs.sort()
+      rel_dir = os.path.relpath(current, folder_path)
+      if rel_dir != '.' and not files and not dirs:
+        # 빈 폴더도 압축 파일에 남김
+        try:
+          zf.writestr(_zipinfo(rel_dir, os.stat(current), None, is_dir=True), b'')
+        except OSError as e:
+          print(f"Error adding directory {current} to zip: {e}")
+        yield buffer.drain()
+
+      for name in sorted(files):
+        file_path = os.path.join(current, name)
+        arcname = name if rel_dir == '.' else os.path.join(rel_dir, name)
+        try:
+          with open(file_path, 'rb') as src:
+            zinfo = _zipinfo(arcname, os.fstat(src.fileno()), compress_type_for(name))
+            with zf.open(zinfo, 'w') as dest:
+              while chunk := src.read(chunk_size):
+                dest.write(chunk)
+                data = buffer.drain()
+                if data:
+                  yield data
+        except OSError as e:
+          # 읽을 수 없는 파일은 건너뛰고 나머지를 계속 전송
+          print(f"Error adding {file_path} to zip: {e}")
+        data = buffer.drain()
+        if data:
+          yield data
+  # 중앙 디렉토리(central directory)는 ZipFile을 닫을 때 기록됨
+  yield buffer.drain()
+
+
+def write_zip(target_path, entries, progress=None, chunk_size=CHUNK_SIZE):
+  """
+  (파일 경로, 압축 내 이름) 목록으로 ZIP 파일을 만듭니다.
+  파일은 chunk_size씩 읽어 쓰므로 메모리 사용량이 파일 크기와 무관하고, 4GB가 넘는 파일/압축 파일은 ZIP64로 기록됩니다.
+  숨김 임시 파일에 쓴 뒤 target_path로 이름을 바꾸므로 실패해도 반쯤 만든 파일이 남지 않습니다.
+  """
+  staging = os.path.join(os.path.dirname(target_path), f".{os.path.basename(target_path)}.{uuid.uuid4().hex}.part")
+  try:
+    with zipfile.ZipFile(staging, 'w', allowZip64=True) as zf:
+      for file_path, arcname in entries:
+        _write_entry(zf, file_path, arcname, progress, chunk_size)
+    os.replace(staging, target_path)
+  except BaseException:
+    try:
+      os.remove(staging)
+    except FileNotFoundError:
+      pass
+    raise
+
+
+def _write_entry(zf, file_path, arcname, progress, chunk_size):
+  try:
+    with open(file_path, 'rb') as src:
+      zinfo = _zipinfo(arcname, os.fstat(src.fileno()), compress_type_for(arcname))
+      with zf.open(zinfo, 'w') as dest:
+        while chunk := src.read(chunk_size):
+          dest.write(chunk)
+          if progress is not None:
+            progress.add_bytes(len(chunk))
+  except OSError as e:
+    # 읽을 수 없는 파일은 건너뛰고 나머지를 계속 압축
+    print(f"Error adding {file_path} to zip: {e}")
+  if progress is not None:
+    progress.item_done(arcname)
+
+
+def extract_zip(archive_path, dest, progress=None):
+  """
+  ZIP 파일을 항목별로 풀어 dest에 저장하고 새로 생긴 최상위 이름 목록을 반환합니다.
+  각 항목은 zipfile.extract로 나누어 읽어 쓰므로 메모리 사용량이 항목 크기와 무관하며,
+  압축 밖 경로를 가리키는 항목 이름은 dest 안으로 정리됩니다.
+  """
+  top_level = set()
+  with zipfile.ZipFile(archive_path) as zf:
+    for member in zf.infolist():
+      target = zf.extract(member, dest)
+      top = os.path.relpath(target, dest).split(os.sep)[0]
+      if top not in ('.', '..'):
+        top_level.add(top)
+      if progress is not None:
+        progress.add_bytes(member.file_size)
+        progress.item_done(member.filename)
+  return sorted(top_level)
@@ -1,11 +1,10 @@
-from flask import Blueprint, jsonify, url_for, render_template, flash, request, g, current_app, send_from_directory, abort, send_file, Response
+from flask import Blueprint, jsonify, url_for, render_template, flash, request, g, current_app, send_from_directory, abort, send_file, Response, has_app_context
 from werkzeug.utils import redirect
 import cv2
 import numpy as np
 import pillow_heif
 import os
 import shutil
-import imghdr
 import base64
 import datetime
 import configparser
@@ -19,13 +18,31 @@ import pyshorteners
 import mimetypes
 import time
 import zipfile
+import json
+import threading
 from .auth_views import login_required
+from .. import db
+from ..models import SharedFolder
+from ..storage import CACHE_DIR
+from ..storage.store import path_key, subtree_bounds
+from ..storage.dir_index import DirectoryIndex
+from ..storage.name_index import NameIndex
+from ..storage.watcher import FileWatcher
+from ..storage.listing import ListingCache, SORT_KEYS, format_modified
+from ..storage.thumbnails import ThumbnailStore
+from ..storage.metadata import MetadataStore
+from ..storage.zipstream import iter_zip, write_zip, extract_zip
+from ..storage.fileserve import send_file_response
+from ..storage.uploads import UploadSessionStore
+from ..storage.jobs import JobQueue
+from ..storage.transfer import TransferProgress, tree_size, same_device, copy_item, move_item
+from ..storage.delete import resolve_path, remove_path, move_to_trash, expired_trash, ItemLimit, DeleteLimitReached
+from ..storage.docscan import rectify_documents
+from ..storage.render import renderImageThumbnail, renderVideoThumbnail, render_thumbnail, get_render_pool
+from sqlalchemy import and_, or_
+from concurrent.futures import as_completed
 from pathlib import Path
-from pdf2image import convert_from_path
-from io import BytesIO
-from PIL import Image, UnidentifiedImageError, ExifTags
-from pymediainfo import MediaInfo
-from moviepy.editor import VideoFileClip
+from PIL import Image, UnidentifiedImageError
 from urllib.parse import quote
 
 config = configparser.ConfigParser()
@@ -35,6 +52,96 @@ user_list = [user.strip() for user in authorized_users.split(',') if user.strip(
 
 bp = Blueprint('cloudstorage', __name__, url_prefix='/cloudstorage')
 root_dir = Path('/Volumes/X31')
+dir_index = DirectoryIndex(root_dir, CACHE_DIR / 'dir_index.db')
+name_index = NameIndex(root_dir, CACHE_DIR / 'name_index.db')
+metadata_store = MetadataStore(root_dir, CACHE_DIR / 'metadata.db')
+thumbnail_store = ThumbnailStore(CACHE_DIR, max_bytes=int(os.getenv('CLOUDSTORAGE_THUMBNAIL_CACHE_MB', '1024')) * 1024 * 1024)
+upload_sessions = UploadSessionStore(CACHE_DIR / 'uploads.db')
+job_queue = JobQueue(CACHE_DIR / 'jobs.db', workers=int(os.getenv('CLOUDSTORAGE_JOB_WORKERS', '2')))
+job_queue.add_pool('transfer', workers=int(os.getenv('CLOUDSTORAGE_TRANSFER_WORKERS', '2')))
+listing_cache = ListingCache(lambda path: calculate_directory_size(path), max_dirs=int(os.getenv('CLOUDSTORAGE_LISTING_CACHE_DIRS', '256')))
+file_watcher = FileWatcher(root_dir, mode=os.getenv('CLOUDSTORAGE_WATCHER', 'auto'))
+LISTING_FIELDS = {"name": "_name", "type": "_type", "size": "_size", "modified": "_modified", "link": "_link", "thumbnail": "_thumbnail"}
+MEDIA_FIELDS = {"resolution": "_resolution", "taken": "_taken", "duration": "_duration"}  # 메타데이터 저장소에서 읽는 목록 항목
+TRANSFER_FILE_WORKERS = int(os.getenv('CLOUDSTORAGE_COPY_WORKERS', '4'))  # 폴더 복사 시 동시에 복사할 파일 수
+DELETE_BACKGROUND_THRESHOLD = 2000  # 하위 항목이 이보다 많은 폴더는 백그라운드 작업으로 삭제
+TRASH_MAX_AGE = int(os.getenv('CLOUDSTORAGE_TRASH_DAYS', '30')) * 24 * 60 * 60
+USAGE_SAMPLE_INTERVAL = int(os.getenv('CLOUDSTORAGE_USAGE_SAMPLE_HOURS', '6')) * 60 * 60
+PDF_PREVIEW_WIDTH = int(os.getenv('CLOUDSTORAGE_PDF_PREVIEW_WIDTH', '500'))  # 상세 정보 창의 PDF 첫 페이지 미리보기 너비
+trash_purge_lock = threading.Lock()
+trash_purge_job = None  # 진행 중인 휴지통 비우기 작업 ID
+share_migration_lock = threading.Lock()
+share_migration_done = False
+share_app = None  # 백그라운드 이동 작업에서 shared_folder 테이블을 고칠 때 쓰는 앱
+
+@bp.record_once
+def rememberApp(state):
+  global share_app
+  share_app = state.app
+
+def resourcesChanged(*paths):
+  """파일/폴더를 생성, 수정, 삭제한 뒤 호출해 크기/이름 인덱스, 목록 캐시, 메타데이터, 썸네일 캐시를 갱신"""
+  dir_index.changed(*paths)
+  name_index.changed(*paths)
+  listing_cache.invalidate(*paths)
+  metadata_store.changed(*paths)
+  for path in paths:
+    # 썸네일 키에 파일 mtime/크기가 들어가므로 폴더 변경으로 하위 썸네일을 지울 필요는 없음
+    if not os.path.isdir(path):
+      thumbnail_store.discard(path)
+
+def directoriesChanged(*dirs):
+  """폴더의 직속 목록만 바뀐 경우(대량 변경, 감시 이벤트 유실, 폴링) 그 폴더 단위로만 인덱스와 캐시를 갱신"""
+  dir_index.refresh(*dirs)
+  name_index.refresh(*dirs)
+  listing_cache.invalidate(*dirs, descendants=False)
+  metadata_store.changed(*dirs)
+
+def resourceMoved(src, dst):
+  """이름 변경/이동 후 호출해 인덱스의 경로를 옮기고 이전 경로의 썸네일을 제거"""
+  dir_index.moved(src, dst)
+  name_index.moved(src, dst)
+  listing_cache.invalidate(src, dst)
+  metadata_store.moved(src, dst)
+  thumbnail_store.discard(src)
+  moveSharedFolders(src, dst)
+
+def moveSharedFolders(src, dst):
+  """이름 변경/이동한 폴더(와 그 하위 폴더)의 공유 링크가 새 경로를 가리키도록 shared_folder 경로를 바꿈"""
+  if has_app_context():
+    return updateSharedFolderPaths(src, dst)
+  if share_app is not None:
+    with share_app.app_context():
+      updateSharedFolderPaths(src, dst)
+
+def updateSharedFolderPaths(src, dst):
+  src_key, dst_key = path_key(src), path_key(dst)
+  try:
+    migrateShelveShareLinks()
+    lower, upper = subtree_bounds(src_key)
+    folders = SharedFolder.query.filter(or_(SharedFolder.path == src_key, and_(SharedFolder.path >= lower, SharedFolder.path < upper))).all()
+    if not folders:
+      return
+    # 대상 경로에 남아 있던 링크는 이미 지워진 폴더의 것이므로 경로가 겹치지 않게 먼저 삭제
+    lower, upper = subtree_bounds(dst_key)
+    SharedFolder.query.filter(or_(SharedFolder.path == dst_key, and_(SharedFolder.path >= lower, SharedFolder.path < upper))).delete(synchronize_session=False)
+    for folder in folders:
+      folder.path = dst_key + folder.path[len(src_key):]
+    db.session.commit()
+  except Exception as e:
+    db.session.rollback()
+    print(f"Error moving shared folder links: {e}")
+
+def externalChanges(paths, dirs):
+  """Finder, NEIS/ScienceON 작업 등 API 밖에서 바뀐 파일도 인덱스와 썸네일 캐시에 반영"""
+  if paths:
+    resourcesChanged(*paths)
+  if dirs:
+    directoriesChanged(*dirs)
+
+file_watcher.subscribe(externalChanges)
+# 새로 생기거나 바뀐 PDF는 상세 정보 창을 열기 전에 미리보기를 만들어 둠
+file_watcher.subscribe(lambda paths, dirs: warmPdfPreviews(changedPdfFiles(paths + dirs)))
 
 def convert_heic_to_jpg(img_path):
   ext = os.path.splitext(img_path)[-1].lower()
@@ -57,150 +164,162 @@ def convert_heic_to_jpg(img_path):
     print(f"지원되는 HEIC/HEIF 파일이 아닙니다: {img_path}")
     return img_path
   
-def order_points(pts):
-  rect = np.zeros((4,2), dtype="float32")
-  s = pts.sum(axis=1)
-  rect[0] = pts[np.argmin(s)] # 좌상
-  rect[2] = pts[np.argmax(s)] # 우하
-  diff = np.diff(pts, axis=1)
-  rect[1] = pts[np.argmin(diff)] # 우상
-  rect[3] = pts[np.argmax(diff)] # 좌하
-  return rect
-
-def transform_and_binaried_image(img_path, area_val):
-  # 이미지 불러오기
-  img = cv2.imread(img_path)
-  if img is None:
-    raise FileNotFoundError(f"이미지 파일을 찾을 수 없습니다: {img_path}")
-  img_height, img_width = img.shape[:2]
-  gray_image = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-  _, th = cv2.threshold(gray_image, 0, 255, cv2.THRESH_BINARY+cv2.THRESH_OTSU)
-
-  # 외곽선 찾기
-  contours, _ = cv2.findContours(th, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
-
-  for pts in contours:
-    if cv2.contourArea(pts) < area_val or len(pts) < 4:
-      continue
-    epsilon = 0.02 * cv2.arcLength(pts, True)
-    approx = cv2.approxPolyDP(pts, epsilon, True)
-    print('approx: ', len(approx))
-
-    if len(approx) == 4 or len(approx) == 6:
-      src_points = np.array([p[0] for p in approx], dtype="float32")
-      src_points = order_points(src_points)  # 꼭짓점 올바른 순서로
-      dst_points = np.array([
-        [0, 0],
-        [img_width - 1, 0],
-        [img_width - 1, img_height - 1],
-        [0, img_height - 1]
-      ], dtype="float32")
-      M = cv2.getPerspectiveTransform(src_points, dst_points)
-      result_img = cv2.warpPerspective(img, M, (img_width, img_height))
-      # gray_result = cv2.cvtColor(result_img, cv2.COLOR_BGR2GRAY)
-      # th_result = cv2.adaptiveThreshold(
-      #   gray_result, 255,
-      #   cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
-      #   51, 13
-      # )
-      # cv2.imwrite(img_path, cv2.cvtColor(th_result, cv2.COLOR_GRAY2BGR))
-      cv2.imwrite(img_path, result_img)
-      return
-  # 만약 적합한 사각형을 찾지 못했을 경우 원본 그대로 저장(혹은 예외)
-  cv2.imwrite(img_path, gray_image)
-
-def listSubdirectoryPaths(path):
-  path = Path(path)  # Ensure path is a Path object
-  subdirectories = set()
-  initial_subdirectories = [
-    str(path / p) for p in os.listdir(path)
-    if not p.startswith(('.', '$'))
-    and p != 'System Volume Information'
-    and (path / p).is_dir()
+def processUploadedImage(payload, job):
+  """업로드가 끝난 학습지 사진들을 백그라운드에서 JPG로 변환하고 문서 영역을 반듯하게 보정"""
+  img_paths = [convert_heic_to_jpg(path) for path in payload.get("paths") or [payload["path"]]]
+  job.progress(0.3)
+  rectified = rectify_documents(img_paths)
+  resourcesChanged(*img_paths)
+  return [
+    {"path": img_path.split(str(root_dir))[-1], "rectified": result}
+    for img_path, result in zip(img_paths, rectified)
   ]
 
-  for sub in initial_subdirectories:
-    subdirectories.add(sub)
-    subdirectories.update(listSubdirectoryPaths(sub))
-    
-  return list(subdirectories)
+job_queue.register('image', processUploadedImage)
+
+def transferResources(payload, job):
+  """
+  복사/이동 작업. payload: {"mode": "copy" | "move", "items": [[원본 경로, 대상 경로], ...]}
+  같은 파일시스템 안의 이동은 os.rename으로 끝내고, 나머지는 바이트 단위 진행률을 남기며 복사합니다.
+  """
+  move = payload["mode"] == "move"
+  items = payload["items"]
+  progress = TransferProgress(job, items_total=len(items))
+  # 이름만 바꾸면 되는 이동과 이미 끝난 항목은 복사할 바이트가 없으므로 합계에서 제외
+  progress.bytes_total = sum(
+    tree_size(src) for src, dst in items
+    if os.path.lexists(src) and not os.path.lexists(dst) and not (move and same_device(src, os.path.dirname(dst)))
+  )
+  progress.report(force=True)
+
+  transferred = []
+  for src, dst in items:
+    if os.path.lexists(dst):
+      # 서버 재시작 후 다시 실행된 작업이면 이미 끝난 항목. 복사는 staging에서 이름을 바꿔 완성하므로
+      # 대상이 있으면 복사가 끝난 것이고, 다른 파일시스템으로의 이동이면 원본 삭제만 마저 함
+      if job.resumed and move and os.path.lexists(src) and not same_device(src, os.path.dirname(dst)):
+        remove_path(src)
+        resourcesChanged(src, dst)
+      if job.resumed or (move and not os.path.lexists(src)):
+        transferred.append(dst.split(str(root_dir))[-1])
+        progress.item_done(os.path.basename(dst))
+        continue
+      raise FileExistsError(f"File already exists: {dst}")
+    staging = os.path.join(os.path.dirname(dst), f".{os.path.basename(dst)}.{job.id}.part")
+    if move:
+      move_item(src, dst, staging, progress, TRANSFER_FILE_WORKERS)
+      resourceMoved(src, dst)
+    else:
+      copy_item(src, dst, staging, progress, TRANSFER_FILE_WORKERS)
+      resourcesChanged(dst)
+    transferred.append(dst.split(str(root_dir))[-1])
+    progress.item_done(os.path.basename(dst))
+  return transferred
+
+job_queue.register('copy', transferResources, pool='transfer')
+job_queue.register('move', transferResources, pool='transfer')
+
+def zipResources(payload, job):
+  """압축 작업. payload: {"target": 만들 zip 경로, "items": [압축할 파일/폴더 경로, ...]}"""
+  entries = []
+  for item in payload["items"]:
+    if os.path.isdir(item):  # 폴더일 경우 내부 파일까지 압축
+      for root, _, files in os.walk(item):
+        for file in files:
+          file_path = os.path.join(root, file)
+          entries.append((file_path, os.path.relpath(file_path, root_dir)))  # 압축 내 상대 경로 지정
+    else:  # 단일 파일일 경우 직접 압축
+      entries.append((item, os.path.basename(item)))
+
+  progress = TransferProgress(job, bytes_total=sum(tree_size(file_path) for file_path, _ in entries), items_total=len(entries))
+  progress.report(force=True)
+  write_zip(payload["target"], entries, progress)
+  resourcesChanged(payload["target"])
+  return payload["target"].split(str(root_dir))[-1]
+
+def unzipResources(payload, job):
+  """압축 해제 작업. payload: {"archive": zip 경로, "dest": 풀어 놓을 폴더}"""
+  with zipfile.ZipFile(payload["archive"]) as zip_ref:
+    members = zip_ref.infolist()
+  progress = TransferProgress(job, bytes_total=sum(member.file_size for member in members), items_total=len(members))
+  progress.report(force=True)
+  top_level = extract_zip(payload["archive"], payload["dest"], progress)
+  # 압축 해제로 생긴 최상위 항목만 인덱스 갱신
+  resourcesChanged(*[os.path.join(payload["dest"], name) for name in top_level])
+  return [os.path.join(payload["dest"], name).split(str(root_dir))[-1] for name in top_level]
+
+job_queue.register('zip', zipResources, pool='transfer')
+job_queue.register('unzip', unzipResources, pool='transfer')
+
+def deleteResources(payload, job):
+  """삭제 작업. payload: {"paths": [삭제할 파일/폴더 경로, ...], "total": 예상 항목 수}"""
+  progress = TransferProgress(job, items_total=payload.get("total", len(payload["paths"])))
+  for path in payload["paths"]:
+    if os.path.lexists(path):
+      remove_path(path, progress)
+      resourcesChanged(path)
+  return [path.split(str(root_dir))[-1] for path in payload["paths"]]
+
+job_queue.register('delete', deleteResources, pool='transfer')
 
 def encodeImageToBase64(file_path, img_size=150, backGroundColor=False):
-  # 이미지가 올바르게 열리는지 확인
-  if imghdr.what(file_path) in ['png', 'jpeg', 'jpg', 'gif', 'bmp', 'tiff', 'webp', 'heic']:
-    try:
-      with Image.open(file_path) as img:
-        #EXIF 데이터를 사용하여 이미지 회전
-        try:
-          for orientation in ExifTags.TAGS.keys():
-            if ExifTags.TAGS[orientation] == 'Orientation':
-                break
-          exif = img._getexif()
-          if exif is not None:
-            orientation = exif.get(orientation, None)
-            if orientation == 3:
-                img = img.rotate(180, expand=True)
-            elif orientation == 6:
-                img = img.rotate(270, expand=True)
-            elif orientation == 8:
-                img = img.rotate(90, expand=True)
-        except (AttributeError, KeyError, IndexError):
-          # EXIF 데이터가 없는 경우 처리
-          pass
-        img_buffer = BytesIO()
-        if backGroundColor:
-          max_size = (img_size, img_size)
-          img.thumbnail(max_size, Image.LANCZOS)
-          img_out = Image.new('RGBA', (img_size, img_size), backGroundColor)
-          img_out.paste(img, ((img_size - img.width) // 2, (img_size - img.height) // 2))
-          img_out.save(img_buffer, format="PNG")  # PNG 또는 원하는 포맷
-        else:
-          img.thumbnail((img_size, img_size))
-          img.save(img_buffer, format='PNG')
-          
-        img_buffer.seek(0)
-        # 이미지를 Base64로 인코딩하여 저장
-        thumbnail_base64 = base64.b64encode(img_buffer.getvalue()).decode('utf-8')
-        return thumbnail_base64   
-    except UnidentifiedImageError as e:
-      print(f"Error processing {file_path}: {e}")
-  else:
-      print(f"File {file_path} is not a valid image.")
+  thumbnail = renderImageThumbnail(file_path, img_size, backGroundColor)
+  if thumbnail:
+    # 이미지를 Base64로 인코딩하여 반환
+    return base64.b64encode(thumbnail).decode('utf-8')
 
 def encodeVideoToBase64(file_path, img_size, backgroundColor):
-  """
-  동영상 파일 경로를 입력받아 썸네일 이미지를 생성한 뒤 Base64로 인코딩하여 반환합니다.
+  thumbnail = renderVideoThumbnail(file_path, img_size, backgroundColor)
+  if thumbnail:
+    # Base64로 인코딩
+    return base64.b64encode(thumbnail).decode('utf-8')
+  return None
 
-  :param file_path: 동영상 파일 경로
-  :param img_size: 썸네일 크기 (너비와 높이 최대값)
-  :return: Base64로 인코딩된 썸네일 이미지
+def getCachedThumbnail(file_path, thumb_type, img_size, backgroundColor):
   """
-  try:
-    # 동영상을 열고 첫 번째 프레임을 추출
-    with VideoFileClip(file_path) as video:
-      frame = video.get_frame(0)  # 첫 번째 프레임 (0초)
-      img = Image.fromarray(frame)  # Numpy 배열을 PIL 이미지로 변환
-      
-      # 썸네일 생성
-      # img.thumbnail((img_size, img_size))
-      max_size = (img_size, img_size)
-      img.thumbnail(max_size, Image.LANCZOS)
-      img_out = Image.new('RGBA', (img_size, img_size), backgroundColor)
-      img_out.paste(img, ((img_size - img.width) // 2, (img_size - img.height) // 2))
-      # img_out.save(img_buffer, format="PNG")  # PNG 또는 원하는 포맷
-      
-      # BytesIO 객체에 이미지 저장
-      output = BytesIO()
-      img_out.save(output, format='PNG')  # PNG 형식으로 저장
-      output.seek(0)
-      
-      # Base64로 인코딩
-      thumbnail_base64 = base64.b64encode(output.getvalue()).decode('utf-8')
-      return thumbnail_base64
-
-  except Exception as e:
-    print(f"Error processing video file {file_path}: {e}")
-    return None
+  썸네일 캐시에서 PNG 바이트를 찾고, 없으면 생성해 저장합니다.
+  (캐시 키, 원본 수정 시각, PNG 바이트)를 반환합니다.
+  """
+  file_path = str(file_path)
+  return thumbnail_store.get_or_render(
+    file_path, img_size,
+    lambda: render_thumbnail(file_path, thumb_type, img_size, backgroundColor),
+    variant=f"{thumb_type}:{backgroundColor}",
+  )
+
+def warmThumbnails(items, img_size, backgroundColor=(255, 255, 255, 0)):
+  """폴더 목록 응답 후, 목록의 이미지/동영상 썸네일을 백그라운드에서 미리 생성 (프로세스 풀 사용)"""
+  pool = get_render_pool()
+  jobs = []
+  for file_path, thumb_type in items:
+    jobs.append((
+      file_path, img_size, f"{thumb_type}:{backgroundColor}",
+      lambda file_path=file_path, thumb_type=thumb_type: pool.submit(
+        render_thumbnail, file_path, thumb_type, img_size, backgroundColor).result(),
+    ))
+  thumbnail_store.warm(jobs)
+
+def warmPdfPreviews(paths):
+  """PDF 첫 페이지 미리보기를 상세 정보 창과 같은 너비로 백그라운드에서 미리 생성"""
+  if paths:
+    warmThumbnails([(path, 'pdf') for path in paths], PDF_PREVIEW_WIDTH, (246, 247, 250, 255))
+
+def changedPdfFiles(paths):
+  """변경 경로 중 PDF 파일 목록. 폴더(대량 변경이 합쳐진 경우)는 바로 아래의 PDF 파일들"""
+  pdf_files = []
+  for path in paths:
+    if os.path.isdir(path):
+      try:
+        with os.scandir(path) as entries:
+          pdf_files.extend(
+            entry.path for entry in entries
+            if entry.name.lower().endswith('.pdf') and not entry.name.startswith('.') and entry.is_file()
+          )
+      except OSError:
+        continue
+    elif path.lower().endswith('.pdf') and os.path.isfile(path):
+      pdf_files.append(path)
+  return list(dict.fromkeys(pdf_files))
 
 def convert_size(size_bytes):
   """바이트 크기를 사람이 읽을 수 있는 형식으로 변환"""
@@ -222,24 +341,8 @@ def get_folder_info(folder_path):
   if not os.path.isdir(folder_path):
     return {"error": "The specified path is not a folder."}
 
-  # 초기 변수 설정
-  total_files = 0
-  total_folders = 0
-  total_size = 0
-  latest_modification_time = os.path.getmtime(folder_path)  # 초기값은 폴더의 수정 시간
-
-  # 폴더 내 파일 및 하위 폴더를 순회
-  for root, dirs, files in os.walk(folder_path):
-    total_folders += len(dirs)
-    total_files += len(files)
-    for file in files:
-      file_path = os.path.join(root, file)
-      total_size += os.path.getsize(file_path)
-      latest_modification_time = max(latest_modification_time, os.path.getmtime(file_path))
-
-    for folder in dirs:
-      folder_path = os.path.join(root, folder)
-      latest_modification_time = max(latest_modification_time, os.path.getmtime(folder_path))
+  # 파일 수, 폴더 수, 크기, 최종 수정 시각은 디렉토리 인덱스에서 조회
+  folder_stat = dir_index.stat(folder_path)
 
   # 폴더 생성 및 수정 날짜 가져오기
   creation_time = os.path.getctime(folder_path)
@@ -247,107 +350,56 @@ def get_folder_info(folder_path):
   # 결과 반환
   return {
     "위치": os.path.abspath(current_path),
-    "파일": total_files,
-    "폴더": total_folders,
-    "크기": convert_size(total_size),
+    "파일": folder_stat["files"],
+    "폴더": folder_stat["dirs"],
+    "크기": convert_size(folder_stat["size"]),
     "올린 날짜": datetime.datetime.fromtimestamp(creation_time).strftime("%Y-%m-%d %H:%M:%S"),
-    "수정한 날짜": datetime.datetime.fromtimestamp(latest_modification_time).strftime("%Y-%m-%d %H:%M:%S"),
+    "수정한 날짜": datetime.datetime.fromtimestamp(folder_stat["latest"]).strftime("%Y-%m-%d %H:%M:%S"),
   }
 
 def get_file_info(file_path):
+  """상세 정보 창에 표시할 파일 정보. 이미지/동영상이면 해상도, 촬영 일시, 길이도 포함 (메타데이터 저장소에서 조회)"""
   if not os.path.exists(file_path):
     return {"error": "The specified file does not exist."}
   
   if not os.path.isfile(file_path):
     return {"error": "The specified path is not a file."}
   
-  # 파일 정보 가져오기
-  current_path = str(file_path)
-  current_path = current_path.split('/Volumes/X31')[1]
-  file_size = os.path.getsize(file_path)  # 파일 크기
-  creation_time = os.path.getctime(file_path)  # 파일 생성 시간
-  modification_time = os.path.getmtime(file_path)  # 마지막 수정 시간
-  
-  # 사람이 읽을 수 있는 형식으로 변환
-  creation_date = datetime.datetime.fromtimestamp(creation_time).strftime("%Y-%m-%d %H:%M:%S")
-  modification_date = datetime.datetime.fromtimestamp(modification_time).strftime("%Y-%m-%d %H:%M:%S")
-  
-  # 결과 반환
-  return {
-    "위치": '/'.join(current_path.split('/')[:-1]),
-    "크기": convert_size(file_size),
-    "올린 날짜": creation_date,
-    "수정한 날짜": modification_date,
-  }
-
-def get_video_metadata(file_path):
-  current_path = str(file_path)
-  current_path = current_path.split('/Volumes/X31')[1]
-
-  if not os.path.exists(file_path):
-    return {"error": "The specified file does not exist."}
-  
-  if not os.path.isfile(file_path):
-    return {"error": "The specified path is not a file."}
-
-  # 공통 정보
-  file_size = os.path.getsize(file_path)
-  creation_time = os.path.getctime(file_path)
-  modification_time = os.path.getmtime(file_path)
-  creation_date = datetime.datetime.fromtimestamp(creation_time).strftime("%Y-%m-%d %H:%M:%S")
-  modification_date = datetime.datetime.fromtimestamp(modification_time).strftime("%Y-%m-%d %H:%M:%S")
+  # 파일 상태와 미디어 정보는 (경로, 수정 시각, 크기)가 바뀌었을 때만 다시 추출
+  meta = metadata_store.get(file_path)
   current_path = str(file_path)
-  current_path = current_path.split('/Volumes/X31')[1]
+  current_path = current_path.split(str(root_dir))[1]
 
-  video_info = {
+  # 결과 반환
+  info = {
     "위치": '/'.join(current_path.split('/')[:-1]),
-    "크기": convert_size(file_size),
-    "올린 날짜": creation_date,
-    "수정한 날짜": modification_date,
+    "크기": convert_size(meta["size"]),
+    "올린 날짜": datetime.datetime.fromtimestamp(meta["ctime"]).strftime("%Y-%m-%d %H:%M:%S"),
+    "수정한 날짜": datetime.datetime.fromtimestamp(meta["mtime_ns"] / 1e9).strftime("%Y-%m-%d %H:%M:%S"),
   }
-
-  try:
-    # MediaInfo를 통해 메타데이터 분석
-    media_info = MediaInfo.parse(file_path)
-    for track in media_info.tracks:
-      if track.track_type == "General":
-        # Encoded_Date, Tagged_Date 등의 정보 추출
-        if track.encoded_date:
-          video_info["촬영 일시"] = parse_mediainfo_date(track.encoded_date)
-        elif track.tagged_date:
-          video_info["촬영 일시"] = parse_mediainfo_date(track.tagged_date)
-      elif track.track_type == "Video":
-        video_info["해상도"] = f"{track.width}x{track.height}"
-        video_info["길이"] = track.duration / 1000 if track.duration else None  # 초 단위로 변환
-  except Exception as e:
-    video_info["error"] = f"Error parsing media file: {e}"
-  
-  return video_info
-
-def parse_mediainfo_date(date_str):
-  """
-  MediaInfo에서 제공하는 날짜 문자열을 파싱합니다.
-  예: UTC 2025-01-24 14:30:00 -> 2025-01-24 14:30:00
-  """
-  try:
-    if date_str.startswith("UTC"):
-      date_str = date_str.replace("UTC ", "")
-    return datetime.datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%d %H:%M:%S")
-  except ValueError:
-    return date_str  # 원본 문자열을 반환 (알 수 없는 형식인 경우)
+  info.update(mediaFields(meta))
+  if meta["error"]:
+    info["error"] = f"Error parsing media file: {meta['error']}"
+  return info
+
+def mediaFields(meta):
+  """메타데이터 행에서 해상도/촬영 일시/길이 중 값이 있는 것만 표시용 이름으로 반환"""
+  fields = {}
+  if meta["width"] and meta["height"]:
+    fields["해상도"] = f"{meta['width']}x{meta['height']}"
+  if meta["taken"]:
+    fields["촬영 일시"] = meta["taken"]
+  if meta["kind"] == 'video':
+    fields["길이"] = meta["duration"]
+  return fields
 
 def calculate_directory_size(directory):
-  """디렉토리의 총 크기를 계산"""
-  total_size = 0
-  for root, dirs, files in os.walk(directory):
-    for file in files:
-      file_path = os.path.join(root, file)
-      try:
-        total_size += os.path.getsize(file_path)
-      except FileNotFoundError:
-        # 파일이 삭제되었거나 접근할 수 없는 경우를 처리
-        continue
-  return total_size
+  """디렉토리의 총 크기를 인덱스에서 조회 (변경된 폴더만 다시 스캔)"""
+  try:
+    return dir_index.stat(directory)["size"]
+  except FileNotFoundError:
+    # 폴더가 삭제되었거나 접근할 수 없는 경우를 처리
+    return 0
 
 @bp.route("/main/")
 @login_required
@@ -355,6 +407,12 @@ def main():
   if g.user.username not in user_list:
     flash('클라우드 저장소는 인가받은 사용자만 이용가능합니다. 관리자에게 문의하세요.')
     return redirect(url_for('main.index'))
+  dir_index.warm_async()  # 첫 목록 조회 전에 크기 인덱스를 백그라운드에서 구축
+  dir_index.start_sampling(USAGE_SAMPLE_INTERVAL)  # 사용량 추이를 위한 주기적 스냅샷
+  job_queue.resume()  # 서버 재시작으로 중단된 작업 다시 실행
+  name_index.start_rescan()  # 이름 검색 인덱스를 주기적으로 재스캔
+  metadata_store.crawl_async()  # 기간별 사진/동영상 조회를 위해 미디어 메타데이터를 백그라운드에서 채움
+  file_watcher.start()  # 저장소 파일 변경 감시
   current_loc = f"{str(root_dir)}/"
   root_list = [ current_loc + p  for p in os.listdir(root_dir) if not p.startswith(('.', '$')) and p != 'System Volume Information']
 #   return jsonify({"message": root_list}), 200
@@ -369,36 +427,50 @@ def listDirectoryContents():
     if not current_loc.exists() or not current_loc.is_dir():
         return jsonify({"message": "Directory not found"}), 404
     
-    directory_tree = listSubdirectoryPaths(current_loc)
-    directory_tree.sort()
+    # 이름 인덱스의 폴더 트리에서 조회 (mtime이 바뀐 폴더만 다시 읽음)
+    directory_tree = name_index.subtree(current_loc, dirs_only=True)
     # root_dir 경로를 제거하고 상대 경로로 변환
     directory_tree = ['/' + str(Path(dir).relative_to(root_dir)) for dir in directory_tree]
-    #directory_tree = [dir.split(str(root_dir), 1)[-1] for dir in directory_tree]
 
-    # print(directory_tree)
     return jsonify({"message": directory_tree}), 200
   except Exception as e:
     print(f"An unexpected error occurred: {e}")
     return jsonify({"message": "An unexpected error occurred"}), 500
-  
-
-def listDirectoryTree(path):
-  path = Path(path)  # Ensure it's a Path object
-  all_paths = []
-
-  for item in path.iterdir():
-    # 숨김 파일/폴더 및 시스템 디렉토리 무시
-    if item.name.startswith(('.', '$')) or item.name == 'System Volume Information':
-      continue
-
-    all_paths.append(str(item))  # 파일 또는 디렉토리 경로 추가
 
-    if item.is_dir():
-      # 재귀적으로 하위 내용 추가
-      all_paths.extend(listDirectoryTree(item))
+@bp.route("/directoryTree/", methods=['GET'])
+# @login_required
+def listDirectoryTreeNodes():
+  """
+  폴더 트리를 필요한 만큼만 반환합니다.
+  ?path=/폴더&depth=1&dirsOnly=1 -> path의 자식 노드(depth 단계까지). 펼치지 않은 폴더에는 hasChildren이 붙습니다.
+  """
+  dir_path = request.args.get('path', '/')
+  depth = request.args.get('depth', 1, type=int)
+  dirs_only = request.args.get('dirsOnly', '0') in ('1', 'true')
+  if not 1 <= depth <= 5:
+    return jsonify({"error": "depth must be between 1 and 5"}), 400
+
+  current_loc = os.path.normpath(str(root_dir) + '/' + dir_path.strip('/'))
+  if not (current_loc == str(root_dir) or current_loc.startswith(str(root_dir) + '/')):
+    return jsonify({"error": "Invalid path."}), 400
+  if not os.path.isdir(current_loc):
+    return jsonify({"error": "Directory not found"}), 404
 
-  return all_paths
+  try:
+    nodes = name_index.children(current_loc, depth, dirs_only)
+    return jsonify({"message": relativeTreeNodes(nodes)}), 200
+  except Exception as e:
+    print(f"An unexpected error occurred: {e}")
+    return jsonify({"message": "An unexpected error occurred"}), 500
 
+def relativeTreeNodes(nodes):
+  """트리 노드의 path를 root_dir 기준 상대 경로로 바꾸고 수정 시각 형식을 목록과 맞춤"""
+  for node in nodes:
+    node["path"] = '/' + str(Path(node["path"]).relative_to(root_dir))
+    node["modified"] = format_modified(node.pop("mtime"))
+    if "children" in node:
+      relativeTreeNodes(node["children"])
+  return nodes
 
 @bp.route("/directoryAllContents/", methods=['GET'])
 # @login_required
@@ -413,14 +485,14 @@ def listAllContents():
     if not current_loc.exists() or not current_loc.is_dir():
         return jsonify({"message": "Directory not found"}), 404
     
-    # directory_tree = listSubdirectoryPaths(f'{current_loc}/NEIS/{school}/{year}/{semester}학기')
-    directory_tree = listDirectoryTree(f'{current_loc}/NEIS/{school}/{year}/{semester}학기')
-    directory_tree.sort()
+    semester_loc = f'{current_loc}/NEIS/{school}/{year}/{semester}학기'
+    if not os.path.isdir(semester_loc):
+      return jsonify({"message": "Directory not found"}), 404
+    # 이름 인덱스의 스냅샷에서 조회 (mtime이 바뀐 폴더만 다시 읽음)
+    directory_tree = name_index.subtree(semester_loc)
     # root_dir 경로를 제거하고 상대 경로로 변환
     directory_tree = ['/' + str(Path(dir).relative_to(root_dir)) for dir in directory_tree]
-    #directory_tree = [dir.split(str(root_dir), 1)[-1] for dir in directory_tree]
 
-    # print(directory_tree)
     return jsonify({"message": directory_tree}), 200
   except Exception as e:
     print(f"An unexpected error occurred: {e}")
@@ -436,69 +508,114 @@ def listDirectoryDetails(dir_path):
     if not current_loc.exists():
       return jsonify({"message": "Directory not found"}), 404
     
-    directory_info = []
+    # 폴더 mtime이 그대로면 캐시된 목록을 사용
+    entries = listing_cache.get(current_loc).entries
+    directory_info = [
+      {field: entry[field] for field in LISTING_FIELDS.values() if field != '_link'} for entry in entries
+    ]
+    addSharedLinks(current_loc, directory_info, entries)
+
+    response = jsonify({"message": directory_info})
+    # 요청한 크기의 썸네일과 PDF 미리보기를 응답 전송 후 백그라운드에서 미리 생성
+    scheduleThumbnailWarming(response, current_loc, entries, request.args.get('thumbnailSize', type=int))
+    scheduleMetadataFill(response, current_loc, entries)
+    return response, 200
 
-    # 해당 디렉토리 내의 파일 목록을 가져옵니다.
-    with os.scandir(current_loc) as entries:
-      for entry in entries:
-        file_path = os.path.join(current_loc, entry)
-        name, ext = os.path.splitext(entry)
-        name = name.split('/')[-1]
-        ext = ext.lower()
-        shared_link = None
-        image = None
-
-        if name.startswith(('.', '$')) or name == 'System Volume Information':
-          continue
-
-        # 디렉토리인지 파일인지 판별
-        if entry.is_dir():
-          type_ = 'Directory'
-          size_bytes = calculate_directory_size(file_path)  # 디렉토리 크기 계산
-          with shelve.open('path_short_url.dat') as d:
-            shared_link = d.get(file_path)
-            # print("link:", link)
-        else:
-          type_ = ext
-          size_bytes = entry.stat().st_size
-
-        modification_time = datetime.datetime.fromtimestamp(entry.stat().st_mtime)
-        hour = modification_time.hour
-        period = "오전" if hour < 12 else "오후"
-        hour_12 = hour if 1 <= hour <= 12 else (hour - 12 if hour > 12 else 12)
-        modified_time_str = modification_time.strftime(f"%Y. %m. %d. {period} {hour_12}:%M")
-        directory_info.append({
-          "_name": name + ext,
-          "_type": type_,
-          "_size": size_bytes,
-          "_modified": modified_time_str,
-          "_link": shared_link,
-        })
-
-        if ext in ('.png', '.jpeg', '.jpg', '.gif', '.bmp', '.tiff', '.webp', '.heic'):
-          try:
-            # thumbnail_base64 = encodeImageToBase64(file_path, 146, (255, 255, 255, 0))
-            # directory_info[-1]['_thumbnail'] = thumbnail_base64
-            directory_info[-1]['_thumbnail'] = 'image'
-          except Exception as e:
-            print(f"Error processing {entry}: {e}")
-            continue
-        elif ext in ('.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv'):
-          try:
-            # thumbnail_base64 = encodeVideoToBase64(file_path, 146, (255, 255, 255, 0))
-            # directory_info[-1]['_thumbnail'] = thumbnail_base64
-            directory_info[-1]['_thumbnail'] = 'video'
-          except Exception as e:
-            pass
-        else:
-          directory_info[-1]['_thumbnail'] = ''
-
-    return jsonify({"message": directory_info}), 200
+  except Exception as e:
+    print(f"An unexpected error occurred: {e}")
+    return jsonify({"message": "An unexpected error occurred"}), 500
 
+@bp.route("/directoryPage/", defaults={'dir_path': ''}, methods=['GET'])
+@bp.route("/directoryPage/<path:dir_path>", methods=['GET'])
+# @login_required
+def listDirectoryPage(dir_path):
+  """
+  폴더 목록을 정렬 기준(sort: name/modified/size/type, order: asc/desc)에 따라 limit개씩 반환합니다.
+  다음 페이지는 응답의 nextCursor를 cursor로 넘겨 받고, fields(예: name,size,link)로 필요한 항목만 받을 수 있습니다.
+  fields에 resolution/taken/duration을 넣으면 메타데이터 저장소에 채워진 값을 함께 반환합니다(아직 없으면 null).
+  """
+  sort = request.args.get('sort', 'name')
+  order = request.args.get('order', 'asc')
+  limit = request.args.get('limit', 200, type=int)
+  fields = [field.strip() for field in request.args.get('fields', ','.join(LISTING_FIELDS)).split(',') if field.strip()]
+  if sort not in SORT_KEYS or order not in ('asc', 'desc') or not 1 <= limit <= 1000:
+    return jsonify({"error": "Invalid request."}), 400
+  if any(field not in LISTING_FIELDS and field not in MEDIA_FIELDS for field in fields):
+    return jsonify({"error": f"Unknown field. Available fields: {', '.join([*LISTING_FIELDS, *MEDIA_FIELDS])}"}), 400
+
+  try:
+    current_loc = root_dir / dir_path if dir_path != '' else root_dir
+    if not current_loc.is_dir():
+      return jsonify({"error": "Directory not found"}), 404
+
+    listing = listing_cache.get(current_loc)
+    try:
+      entries, next_cursor = listing.page(sort, order, limit, request.args.get('cursor'))
+    except ValueError as e:
+      return jsonify({"error": str(e)}), 400
+
+    directory_info = [
+      {LISTING_FIELDS[field]: entry[LISTING_FIELDS[field]] for field in fields if field in LISTING_FIELDS and field != 'link'}
+      for entry in entries
+    ]
+    if 'link' in fields:
+      addSharedLinks(current_loc, directory_info, entries)
+    if any(field in MEDIA_FIELDS for field in fields):
+      addMediaFields(current_loc, directory_info, entries, [field for field in fields if field in MEDIA_FIELDS])
+
+    response = jsonify({"message": directory_info, "nextCursor": next_cursor, "total": len(listing.entries)})
+    scheduleThumbnailWarming(response, current_loc, entries, request.args.get('thumbnailSize', type=int))
+    scheduleMetadataFill(response, current_loc, entries)
+    return response, 200
   except Exception as e:
     print(f"An unexpected error occurred: {e}")
     return jsonify({"message": "An unexpected error occurred"}), 500
-  
+
+def addSharedLinks(current_loc, directory_info, entries):
+  """목록 항목에 _link를 채움. 하위 폴더의 공유 링크는 한 번의 쿼리로 조회"""
+  dir_paths = {
+    os.path.join(current_loc, entry['_name']): info
+    for info, entry in zip(directory_info, entries) if entry['_type'] == 'Directory'
+  }
+  shared_links = findSharedLinks(list(dir_paths))
+  for info in directory_info:
+    info['_link'] = None
+  for file_path, info in dir_paths.items():
+    info['_link'] = shared_links.get(file_path)
+
+def addMediaFields(current_loc, directory_info, entries, fields):
+  """목록 항목에 해상도/촬영 일시/길이를 채움. 폴더 전체의 메타데이터를 한 번의 쿼리로 조회"""
+  media = metadata_store.lookup(current_loc)
+  for info, entry in zip(directory_info, entries):
+    meta = media.get(unicodedata.normalize("NFC", entry['_name']))
+    values = {
+      "resolution": f"{meta['width']}x{meta['height']}" if meta and meta["width"] and meta["height"] else None,
+      "taken": meta["taken"] if meta else None,
+      "duration": meta["duration"] if meta else None,
+    }
+    for field in fields:
+      info[MEDIA_FIELDS[field]] = values[field]
+
+def scheduleMetadataFill(response, current_loc, entries):
+  """응답 전송 후 목록의 파일 메타데이터(상태, 해상도, 촬영 일시 등)를 백그라운드에서 채움"""
+  file_paths = [os.path.join(current_loc, entry['_name']) for entry in entries if entry['_type'] != 'Directory']
+  if file_paths:
+    response.call_on_close(lambda: metadata_store.warm(file_paths))
+
+def scheduleThumbnailWarming(response, current_loc, entries, thumbnail_size=None):
+  """
+  응답 전송 후 목록의 이미지/동영상 썸네일(thumbnailSize를 요청한 경우)과 PDF 미리보기를 백그라운드에서 미리 생성.
+  이미 캐시에 있는 항목은 조회만 하므로 같은 폴더를 다시 열어도 비용이 거의 없습니다.
+  """
+  thumbnail_items = [
+    (os.path.join(current_loc, entry['_name']), entry['_thumbnail']) for entry in entries if entry['_thumbnail']
+  ] if thumbnail_size else []
+  pdf_paths = [os.path.join(current_loc, entry['_name']) for entry in entries if entry['_type'] == '.pdf']
+  if thumbnail_items:
+    response.call_on_close(lambda: warmThumbnails(thumbnail_items, thumbnail_size))
+  if pdf_paths:
+    response.call_on_close(lambda: warmPdfPreviews(pdf_paths))
+
 @bp.route("/generateThumbnail/", methods=['POST'])
 def generateThumbnail():
   data = request.get_json()
@@ -508,15 +625,122 @@ def generateThumbnail():
   try:
     thumbnail_base64 = None
     resource_path = str(root_dir) + data['path']
-    if data["type"] == 'image':
-      thumbnail_base64 = encodeImageToBase64(resource_path, int(data["size"]), (255, 255, 255, 0))
-    elif data["type"] == "video":
-      thumbnail_base64 = encodeVideoToBase64(resource_path, int(data["size"]), (255, 255, 255, 0))
+    if data["type"] in ('image', 'video'):
+      _, _, thumbnail = getCachedThumbnail(resource_path, data["type"], int(data["size"]), (255, 255, 255, 0))
+      if thumbnail:
+        thumbnail_base64 = base64.b64encode(thumbnail).decode('utf-8')
 
     return jsonify({"message": thumbnail_base64}), 200
   except Exception as e:
     print(f"An unexpected error occurred: {e}")
     return jsonify({"message": "An unexpected error occurred"}), 500
+
+@bp.route("/generateThumbnails/", methods=['POST'])
+def generateThumbnails():
+  """
+  여러 썸네일을 한 번에 요청받아 프로세스 풀에서 병렬로 생성하고,
+  완성되는 순서대로 한 줄에 하나씩 NDJSON으로 전송합니다.
+  요청: {"items": [{"path": "/폴더/사진.jpg", "type": "image", "size": 148}, ...]}
+  응답 줄: {"path": ..., "size": ..., "message": <base64 PNG 또는 null>}
+  잘못된 항목은 요청 전체를 실패시키지 않고 "error"를 담은 줄로 응답합니다.
+  """
+  data = request.get_json()
+  if not data or not isinstance(data.get("items"), list):
+    return jsonify({"error": "Invalid request. 'items' is required."}), 400
+
+  background = (255, 255, 255, 0)
+  items = []
+  invalid = []
+  for item in data["items"][:1000]:
+    if not isinstance(item, dict):
+      invalid.append((None, None, "Invalid item."))
+      continue
+    rel_path, thumb_type, img_size = item.get("path"), item.get("type"), item.get("size")
+    if not isinstance(rel_path, str) or not rel_path:
+      invalid.append((rel_path, img_size, "'path' is required."))
+      continue
+    if thumb_type not in ('image', 'video'):
+      invalid.append((rel_path, img_size, "'type' must be 'image' or 'video'."))
+      continue
+    try:
+      img_size = int(img_size)
+    except (TypeError, ValueError):
+      invalid.append((rel_path, img_size, "'size' must be an integer."))
+      continue
+    if img_size <= 0:
+      invalid.append((rel_path, img_size, "'size' must be positive."))
+      continue
+    items.append((rel_path, str(root_dir) + rel_path, thumb_type, img_size))
+
+  def encode_line(rel_path, img_size, thumbnail, error=None):
+    payload = {
+      "path": rel_path,
+      "size": img_size,
+      "message": base64.b64encode(thumbnail).decode('utf-8') if thumbnail else None,
+    }
+    if error:
+      payload["error"] = error
+    return json.dumps(payload, ensure_ascii=False) + "\n"
+
+  def generate():
+    for rel_path, img_size, error in invalid:
+      yield encode_line(rel_path, img_size, None, error)
+    pool = get_render_pool()
+    futures = {}
+    # 캐시에 있는 썸네일은 바로 보내고, 없는 것만 프로세스 풀로 넘김
+    for rel_path, resource_path, thumb_type, img_size in items:
+      try:
+        key, _ = thumbnail_store.make_key(resource_path, img_size, f"{thumb_type}:{background}")
+      except OSError:
+        yield encode_line(rel_path, img_size, None)
+        continue
+      thumbnail = thumbnail_store.get(key)
+      if thumbnail is not None:
+        yield encode_line(rel_path, img_size, thumbnail)
+        continue
+      future = pool.submit(render_thumbnail, resource_path, thumb_type, img_size, background)
+      futures[future] = (rel_path, resource_path, img_size, key)
+
+    for future in as_completed(futures):
+      rel_path, resource_path, img_size, key = futures[future]
+      try:
+        thumbnail = future.result()
+      except Exception as e:
+        print(f"Error processing {resource_path}: {e}")
+        thumbnail = None
+      if thumbnail:
+        thumbnail_store.put(key, resource_path, thumbnail)
+      yield encode_line(rel_path, img_size, thumbnail)
+
+  return Response(generate(), mimetype="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+@bp.route("/thumbnail/<path:item_path>", methods=['GET'])
+def serveThumbnail(item_path):
+  """캐시된 썸네일을 image/png로 전송 (ETag/Last-Modified로 304 재검증 지원)"""
+  try:
+    thumb_type = request.args.get('type', 'image')
+    img_size = request.args.get('size', 146, type=int)
+    resource_path = str(root_dir / item_path)
+    if thumb_type not in ('image', 'video') or not os.path.isfile(resource_path):
+      return jsonify({"error": "The specified file does not exist."}), 404
+
+    background = (255, 255, 255, 0)
+    etag, _ = thumbnail_store.make_key(resource_path, img_size, f"{thumb_type}:{background}")
+    if request.if_none_match.contains(etag):
+      response = Response(status=304)
+    else:
+      etag, mtime, thumbnail = getCachedThumbnail(resource_path, thumb_type, img_size, background)
+      if not thumbnail:
+        return jsonify({"error": "Failed to generate thumbnail."}), 415
+      response = Response(thumbnail, mimetype='image/png')
+      response.last_modified = datetime.datetime.fromtimestamp(mtime)
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True  # 매번 재검증하되 변경이 없으면 304
+    return response.make_conditional(request)
+  except Exception as e:
+    print(f"An unexpected error occurred: {e}")
+    return jsonify({"message": "An unexpected error occurred"}), 500
     
 @bp.route("/getDriveUsage/", methods=['GET'])
 @login_required  
@@ -538,6 +762,44 @@ def get_drive_usage():
     print(f"An unexpected error occurred: {e}")
     return jsonify({"message": "An unexpected error occurred"}), 500
   
+@bp.route("/driveUsageStats/", methods=['GET'])
+@login_required
+def getDriveUsageStats():
+  """
+  저장소 사용량 통계. path(기본값 루트)의 크기순 하위 폴더와 전체 확장자별 합계를 top개씩,
+  최근 days일 동안의 사용량 스냅샷을 함께 반환합니다.
+  디렉토리 인덱스에 저장된 집계만 읽으므로 파일 수와 관계없이 바로 응답합니다.
+  """
+  top = request.args.get('top', 10, type=int)
+  days = request.args.get('days', 90, type=int)
+  if not 1 <= top <= 100 or days < 0:
+    return jsonify({"error": "Invalid request."}), 400
+
+  try:
+    target_loc = root_dir / request.args.get('path', '').strip('/')
+    if not target_loc.is_dir():
+      return jsonify({"error": "Directory not found"}), 404
+    usage = dir_index.usage(target_loc, top, since=time.time() - days * 24 * 60 * 60)
+    if usage is None:
+      # 아직 집계되지 않은 경우 백그라운드에서 구축하고 잠시 후 다시 요청하도록 안내
+      dir_index.warm_async()
+      return jsonify({"message": None, "indexing": True}), 202
+
+    root_key = path_key(root_dir)
+    total, used, free = shutil.disk_usage(root_dir)
+    return jsonify({"message": {
+      "disk": {"total": total, "used": used, "free": free},
+      "size": usage["size"],
+      "files": usage["files"],
+      "dirs": usage["dirs"],
+      "folders": [{**folder, "path": folder["path"][len(root_key):]} for folder in usage["folders"]],
+      "extensions": usage["extensions"],
+      "history": usage["history"],
+    }}), 200
+  except Exception as e:
+    print(f"An unexpected error occurred: {e}")
+    return jsonify({"message": "An unexpected error occurred"}), 500
+
 @bp.route("/getThumbnailAndDetails//", defaults={'item_path': ''}, methods=['GET'])
 @bp.route("/getThumbnailAndDetails/<path:item_path>", methods=['GET'])
 # @login_required
@@ -556,38 +818,20 @@ def getThumbnailAndDetails(item_path):
       name, ext = os.path.splitext(target_loc)
       ext = ext.lower()
       if ext == '.pdf':
-        images = convert_from_path(target_loc, first_page=1, last_page=1)
-        image = images[0]
-        
-        # BytesIO 객체에 이미지 저장
-        output = BytesIO()
-        image.save(output, format='PNG')  # PNG 형식으로 저장
-        output.seek(0)
-      
-        # Base64로 인코딩
-        thumbnail_base64 = base64.b64encode(output.getvalue()).decode('utf-8')
+        # 목표 너비로 렌더링한 첫 페이지를 경로+수정 시각 기준으로 캐시
+        _, _, thumbnail = getCachedThumbnail(target_loc, 'pdf', PDF_PREVIEW_WIDTH, (246, 247, 250, 255))
+        thumbnail_base64 = base64.b64encode(thumbnail).decode('utf-8') if thumbnail else None
         return jsonify({"type": "pdf", "info": get_file_info(target_loc), "data": thumbnail_base64}), 200
       elif ext in ['.png', '.jpeg', '.jpg', '.gif', '.bmp', '.tiff', '.webp', '.heic']:
         # 이미지 파일인 경우
         image_info = get_file_info(target_loc)
-        with Image.open(target_loc) as image:
-          width, height = image.size
-          image_info["해상도"] = f"{width}x{height}"
-          
-          # Exif 데이터를 이용해 촬영 일시 확인
-          exif_data = image._getexif()
-          if exif_data:
-            for tag, value in exif_data.items():
-              decoded_tag = ExifTags.TAGS.get(tag, tag)
-              if decoded_tag == "DateTimeOriginal":
-                image_info["촬영 일시"] = value
-                break
-
-          thumbnail_base64 = encodeImageToBase64(target_loc, 500, (246, 247, 250, 255))
-          return jsonify({"type": "image", "info": image_info, "data": thumbnail_base64}), 200
+        _, _, thumbnail = getCachedThumbnail(target_loc, 'image', 500, (246, 247, 250, 255))
+        thumbnail_base64 = base64.b64encode(thumbnail).decode('utf-8') if thumbnail else None
+        return jsonify({"type": "image", "info": image_info, "data": thumbnail_base64}), 200
       elif ext in ['.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv']:
-        video_info = get_video_metadata(target_loc)
-        thumbnail_base64 = encodeVideoToBase64(str(target_loc), 500, (246, 247, 250, 255))
+        video_info = get_file_info(target_loc)
+        _, _, thumbnail = getCachedThumbnail(target_loc, 'video', 500, (246, 247, 250, 255))
+        thumbnail_base64 = base64.b64encode(thumbnail).decode('utf-8') if thumbnail else None
         return jsonify({"type": "video", "info": video_info, "data": thumbnail_base64}), 200
       else:
         return jsonify({"type": f"{ext.lstrip('.')}", "info": get_file_info(target_loc)}), 200
@@ -596,43 +840,37 @@ def getThumbnailAndDetails(item_path):
     return jsonify({"message": "An unexpected error occurred"}), 500
   
 
-# 파일 크기에 따른 청크 크기 설정 (사이즈: 청크 크기)
-CHUNK_SIZES = {
-  1 * 1024 * 1024: 1024 * 64,   # 1MB 이상 100MB 미만 → 64KB
-  100 * 1024 * 1024: 1024 * 128,  # 100MB 이상 500MB 이하 → 128KB
-  500 * 1024 * 1024: 1024 * 512,  # 500MB 이상 1GB 미만 → 512KB
-  1 * 1024 * 1024 * 1024: 1024 * 1024  # 1GB 이상 → 1MB
-}
-
-def generate_large_file(file_path, chunk_unit):
-  """파일을 청크 단위로 읽어서 반환하는 제너레이터"""
-  with open(file_path, "rb") as file:
-    while chunk := file.read(chunk_unit):  # 8KB 단위로 읽기
-      yield chunk
-
-def send_large_file(file_path, chunk_size, filename):
-  """ 큰 파일을 스트리밍으로 전송하는 함수 """
-  file_size = os.path.getsize(file_path)  # 🔥 파일 크기 가져오기
-  # 파일명을 URL-encoded UTF-8로 변환 (RFC 5987 표준 적용)
-  encoded_filename = quote(filename, encoding='utf-8')
-
-  return Response(
-    generate_large_file(file_path, chunk_size),  # ✅ 들여쓰기 정리
-    mimetype="application/octet-stream",
-    headers={
-      "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}",
-      "Content-Length": str(file_size),  # ✅ 올바른 형식
-    }
-)
+@bp.route("/mediaByDate/", methods=['GET'])
+# @login_required
+def listMediaByDate():
+  """
+  촬영 일시가 from 이상 to 미만인 사진(kind=image) 또는 동영상(kind=video)을 촬영 순서로 반환합니다.
+  예: /mediaByDate/?from=2025-03-01&to=2025-04-01&path=2025학년도&offset=0&limit=200
+  메타데이터 저장소에서 조회하므로 파일을 열지 않으며, pending은 아직 분석 대기 중인 파일 수입니다.
+  """
+  kind = request.args.get('kind', 'image')
+  start, end = request.args.get('from'), request.args.get('to')
+  offset = request.args.get('offset', 0, type=int)
+  limit = request.args.get('limit', 200, type=int)
+  if kind not in ('image', 'video') or not start or not end or offset < 0 or not 1 <= limit <= 1000:
+    return jsonify({"error": "Invalid request. 'from' and 'to' are required."}), 400
 
-def determineSendMethod(file_path, file_name):
-  file_size = os.path.getsize(file_path)
-  if file_size < 1 * 1024 * 1024:  # 1MB 미만
-    return send_file(file_path, as_attachment=True)
-  
-  # 파일 크기에 맞는 청크 크기 찾기
-  chunk_size = next((size for limit, size in CHUNK_SIZES.items() if file_size < limit), 1024 * 1024)
-  return send_large_file(file_path, chunk_size, file_name)
+  try:
+    scope = root_dir / request.args.get('path', '').strip('/')
+    if not scope.is_dir():
+      return jsonify({"error": "Directory not found"}), 404
+    rows, has_more = metadata_store.taken_between(start, end, kind, scope, offset, limit)
+    root_key = path_key(root_dir)
+    results = [{
+      "path": row["path"][len(root_key):],
+      "name": os.path.basename(row["path"]),
+      "size": row["size"],
+      **mediaFields(row),
+    } for row in rows]
+    return jsonify({"message": results, "offset": offset + len(results), "hasMore": has_more, "pending": metadata_store.pending()}), 200
+  except Exception as e:
+    print(f"An unexpected error occurred: {e}")
+    return jsonify({"message": "An unexpected error occurred"}), 500
 
 @bp.route("/sendFileResponse/<path:item_path>", methods=['GET'])
 # @login_required
@@ -643,40 +881,15 @@ def sendFileResponse(item_path):
       return jsonify({"error": "The specified file does not exist."}), 404
 
     if os.path.isdir(file_path):
-      # 고유한 ZIP 파일명 생성
-      timestamp = int(time.time())
-      folder_name = os.path.basename(file_path)
-      zip_filename = f"{folder_name}"
-      zip_folder = os.path.join(root_dir, f"temp_zips_{timestamp}")
-      os.makedirs(zip_folder, exist_ok=True)
-
-      zip_path = os.path.join(zip_folder, zip_filename)
-
-      # 폴더를 ZIP으로 압축
-      shutil.make_archive(zip_path, 'zip', file_path)
-      zip_path += ".zip"  # 명시적으로 .zip 추가
-
-      # ZIP 파일이 정상적으로 생성되었는지 확인
-      if not os.path.exists(zip_path):
-        return jsonify({"error": "Failed to create ZIP file."}), 500
-
-      # ZIP 파일을 스트리밍 방식으로 전송
-      response = determineSendMethod(zip_path, zip_filename)
-
-      # 응답이 완료된 후 ZIP 삭제를 보장
-      def cleanup():
-        try:
-          if os.path.exists(zip_path):
-            os.remove(zip_path)
-          if os.path.exists(zip_folder):
-            os.rmdir(zip_folder)
-        except Exception as e:
-          print(f"Error deleting ZIP file: {e}")
-
-      response.call_on_close(cleanup)  # ✅ 응답이 종료될 때 ZIP 삭제 실행
-      return response
+      # 임시 ZIP 파일을 만들지 않고 폴더를 읽는 대로 압축해 바로 스트리밍
+      zip_filename = quote(f"{os.path.basename(file_path)}.zip", encoding='utf-8')
+      return Response(
+        iter_zip(file_path),
+        mimetype="application/zip",
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{zip_filename}"},
+      )
     else:
-      return determineSendMethod(file_path, os.path.basename(item_path))
+      return send_file_response(file_path, download_name=os.path.basename(item_path), as_attachment=True)
 
   except Exception as e:
     print(f"An unexpected error occurred: {e}")
@@ -686,75 +899,55 @@ def normalize_path(path, form="NFC"):
   """MacOS에서 한글 파일명을 정상 처리하도록 정규화"""
   return unicodedata.normalize(form, path)
 
-def remove_readonly(func, path, _):
-  """읽기 전용 파일 삭제를 위한 권한 변경"""
-  os.chmod(path, stat.S_IWRITE)
-  func(path)
-
-def should_skip_file(file_path):
-  """MacOS의 AppleDouble 숨김 파일(`._`)은 삭제 대상에서 제외"""
-  return os.path.basename(file_path).startswith("._")
-
-def delete_file(file_path):
-  """파일 삭제 시도 (NFD → 실패 시 NFC)"""
-  if should_skip_file(file_path):
-    print(f"Skipping AppleDouble file: {file_path}")
-    return
-  
-  try:
-    os.remove(normalize_path(file_path, "NFD"))
-  except FileNotFoundError:
-    os.remove(normalize_path(file_path, "NFC"))
-
-def delete_directory(directory_path):
-  """폴더 내 모든 파일 및 하위 폴더 삭제 후, 최상위 폴더 삭제"""
-  directory_path = normalize_path(directory_path, "NFC")  # ✅ 폴더는 NFC 정규화
-
-  # 🔹 폴더 내부의 모든 파일 삭제
-  for root, _, files in os.walk(directory_path, topdown=False):
-    for file_name in files:
-      delete_file(os.path.join(root, file_name))
-
-  # 🔹 삭제 대상 폴더 내 모든 하위 디렉토리 목록 저장
-  all_dirs = [
-    normalize_path(os.path.join(root, dir_name), "NFC")
-    for root, dirs, _ in os.walk(directory_path, topdown=False)
-    for dir_name in dirs
-  ]
-
-  # 🔹 하위 폴더부터 삭제
-  for dir_path in all_dirs:
-    try:
-      shutil.rmtree(dir_path, onerror=remove_readonly)
-    except FileNotFoundError:
-      shutil.rmtree(normalize_path(dir_path, "NFD"), onerror=remove_readonly)
-
-  # 🔹 최상위 폴더 삭제
-  try:
-    shutil.rmtree(directory_path, onerror=remove_readonly)
-  except FileNotFoundError:
-    shutil.rmtree(normalize_path(directory_path, "NFD"), onerror=remove_readonly)
+def purgeExpiredTrash():
+  """보관 기간이 지난 휴지통 항목을 백그라운드에서 비움. 앞선 비우기 작업이 아직 대기/실행 중이면 새로 만들지 않음"""
+  global trash_purge_job
+  with trash_purge_lock:
+    if trash_purge_job is not None:
+      job = job_queue.get(trash_purge_job)
+      if job is not None and job["status"] in ('queued', 'running'):
+        return
+    expired = expired_trash(root_dir, TRASH_MAX_AGE)
+    trash_purge_job = job_queue.submit('delete', {"paths": expired}) if expired else None
 
 @bp.route("/deleteResource/", methods=['POST'])
 @login_required
 def deleteResponse():
+  """
+  파일/폴더 삭제. {"trash": true}이면 .trash로 이름만 바꿔 즉시 응답하고,
+  하위 항목이 많은 폴더(또는 {"background": true})는 백그라운드 작업으로 지운 뒤 jobId를 반환합니다.
+  """
   data = request.get_json()
   if not data or "path" not in data:
     return jsonify({"error": "Invalid request. 'path' is required."}), 400
 
-  resource_path = normalize_path(str(root_dir) + '/' + data["path"], "NFD")
-  print(resource_path)
-
-  # ✅ 존재 여부 확인
-  if not os.path.exists(resource_path):
+  # ✅ 존재 여부 확인 (NFD/NFC 중 실제로 있는 이름으로 한 번만 결정)
+  resource_path = resolve_path(os.path.normpath(str(root_dir) + '/' + data["path"]))
+  if resource_path is None or not resource_path.startswith(str(root_dir) + '/'):
     return jsonify({"error": "The specified file or directory does not exist."}), 404
 
   try:
-    if os.path.isfile(resource_path):
-      delete_file(resource_path)
-    elif os.path.isdir(resource_path):
-      delete_directory(resource_path)
-
+    if data.get("trash"):
+      move_to_trash(resource_path, root_dir)
+      resourcesChanged(resource_path)
+      purgeExpiredTrash()
+      return jsonify({"message": f"Moved to trash: {data['path']}"}), 200
+
+    # 진행률 표시용 항목 수는 이미 집계된 값만 사용 (없으면 0 = 알 수 없음)
+    stats = dir_index.cached(resource_path) if os.path.isdir(resource_path) and not os.path.islink(resource_path) else None
+    total = 1 + stats["files"] + stats["dirs"] if stats else 0
+    if data.get("background"):
+      job_id = job_queue.submit('delete', {"paths": [resource_path], "total": total})
+      return jsonify({"message": f"Deleting: {data['path']}", "jobId": job_id}), 202
+
+    # 지우면서 항목 수를 세다가 많으면 멈추고 나머지를 백그라운드 작업으로 넘김
+    limit = ItemLimit(DELETE_BACKGROUND_THRESHOLD)
+    try:
+      remove_path(resource_path, limit)
+    except DeleteLimitReached:
+      job_id = job_queue.submit('delete', {"paths": [resource_path], "total": max(total - limit.items_done, 0)})
+      return jsonify({"message": f"Deleting: {data['path']}", "jobId": job_id}), 202
+    resourcesChanged(resource_path)
     return jsonify({"message": f"Successfully deleted: {data['path']}"}), 200
 
   except Exception as e:
@@ -771,36 +964,49 @@ def create_folder_at_path():
   target_path = str(root_dir) + data["path"]
   try:
    os.mkdir(target_path)
+   resourcesChanged(target_path)
    return jsonify({"message": f"Successfully created: {data['path']}"}), 200
   except Exception as e:
     print(f"Error Createing Directory: {e}")
     return jsonify({"message": "An unexpected error occurred"}), 500
 
-@bp.route("/copyResourcesToDirectory/", methods=['POST'])
-@login_required
-def copy_resources():
-  data = request.get_json()
+def planTransfer(data):
+  """
+  복사/이동 요청을 검사해 ([원본, 대상] 목록, None) 또는 (None, 오류 응답)을 반환
+  """
   if not data or 'resource_path' not in data or "target_path" not in data:
-    return jsonify({"error": "Invalid request."}), 400
+    return None, (jsonify({"error": "Invalid request."}), 400)
 
   resource_paths = [os.path.join(root_dir, item[1:]) if item.startswith('/') else os.path.join(root_dir, item) for item in data['resource_path']]
   target_path = str(root_dir) + data['target_path']
 
   if not os.path.exists(target_path):
-    return jsonify({"error": "Target directory does not exist."}), 400
+    return None, (jsonify({"error": "Target directory does not exist."}), 400)
 
-  try:
-    for item in resource_paths:
-      if not os.path.exists(item):
-        return jsonify({"error": f"Resource does not exist: {item}"}), 400
+  items = []
+  for item in resource_paths:
+    if not os.path.exists(item):
+      return None, (jsonify({"error": f"Resource does not exist: {item}"}), 400)
 
-      destination = os.path.join(target_path, os.path.basename(item))
-      if os.path.exists(destination):
-        return jsonify({"error": f"File already exists: {destination}"}), 400
+    destination = os.path.join(target_path, os.path.basename(item))
+    if os.path.exists(destination):
+      return None, (jsonify({"error": f"File already exists: {destination}"}), 400)
+    if os.path.normpath(target_path).startswith(os.path.normpath(item) + '/'):
+      return None, (jsonify({"error": f"Cannot transfer a folder into itself: {item}"}), 400)
+    items.append([item, destination])
+  return items, None
 
-      shutil.copy(item, destination)
+@bp.route("/copyResourcesToDirectory/", methods=['POST'])
+@login_required
+def copy_resources():
+  items, error = planTransfer(request.get_json())
+  if error:
+    return error
 
-    return jsonify({"message": f"Successfully copied to: {target_path}"}), 200
+  try:
+    # 복사는 백그라운드 작업으로 실행하고 진행 상황은 /jobs/<id>로 확인
+    job_id = job_queue.submit('copy', {"mode": "copy", "items": items})
+    return jsonify({"message": "Copy started", "jobId": job_id}), 202
   except Exception as e:
     print(f"Error Moving Process: {e}")
     return jsonify({"message": "An unexpected error occurred"}), 500
@@ -808,28 +1014,13 @@ def copy_resources():
 @bp.route("/moveResourcesToDirectory/", methods=['POST'])
 @login_required
 def move_resources():
-  data = request.get_json()
-  if not data or 'resource_path' not in data or "target_path" not in data:
-    return jsonify({"error": "Invalid request."}), 400
-
-  resource_paths = [os.path.join(root_dir, item[1:]) if item.startswith('/') else os.path.join(root_dir, item) for item in data['resource_path']]
-  target_path = str(root_dir) + data['target_path']
-
-  if not os.path.exists(target_path):
-    return jsonify({"error": "Target directory does not exist."}), 400
+  items, error = planTransfer(request.get_json())
+  if error:
+    return error
 
   try:
-    for item in resource_paths:
-      if not os.path.exists(item):
-        return jsonify({"error": f"Resource does not exist: {item}"}), 400
-
-      destination = os.path.join(target_path, os.path.basename(item))
-      if os.path.exists(destination):
-        return jsonify({"error": f"File already exists: {destination}"}), 400
-
-      shutil.move(item, destination)
-
-    return jsonify({"message": f"Successfully moved to: {target_path}"}), 200
+    job_id = job_queue.submit('move', {"mode": "move", "items": items})
+    return jsonify({"message": "Move started", "jobId": job_id}), 202
   except Exception as e:
     print(f"Error Moving Process: {e}")
     return jsonify({"message": "An unexpected error occurred"}), 500
@@ -846,11 +1037,15 @@ def unzip_and_store_resources():
   full_path = str(root_dir) + data['resource_path']
   extract_to = str(root_dir) + current_path
   
-  try:
-   with zipfile.ZipFile(full_path, 'r') as zip_ref:
-     zip_ref.extractall(extract_to)
+  if not zipfile.is_zipfile(full_path):
+    return jsonify({"error": f"Not a zip file: {zipfile_name}"}), 400
+  if not os.path.isdir(extract_to):
+    return jsonify({"error": "Target directory does not exist."}), 400
 
-   return jsonify({"message": f"Successfully extracted for: {zipfile_name}"}), 200
+  try:
+   # 압축 해제는 백그라운드 작업으로 실행하고 진행 상황은 /jobs/<id>로 확인
+   job_id = job_queue.submit('unzip', {"archive": full_path, "dest": extract_to})
+   return jsonify({"message": f"Extracting: {zipfile_name}", "jobId": job_id}), 202
   except Exception as e:
     print(f"Error Unzipping Process: {e}")
     return jsonify({"message": "An unexpected error occurred"}), 500
@@ -867,19 +1062,13 @@ def zip_and_save_resources():
   zipfile_name = f"{os.path.basename(resource_paths[0])}.zip" if len(resource_paths) == 1 and os.path.isdir(resource_paths[0]) else "압축_파일.zip"
   full_path = os.path.join(root_dir, current_path, zipfile_name)
   
+  if not all(os.path.exists(item) for item in resource_paths):
+    return jsonify({"error": "Resource does not exist."}), 400
+
   try:
-   with zipfile.ZipFile(full_path, 'w', zipfile.ZIP_DEFLATED) as myzip:
-     for item in resource_paths:
-        if os.path.isdir(item):  # 폴더일 경우 내부 파일까지 압축
-          for root, _, files in os.walk(item):
-            for file in files:
-              file_path = os.path.join(root, file)
-              arcname = os.path.relpath(file_path, root_dir)  # 압축 내 상대 경로 지정
-              myzip.write(file_path, arcname)
-        else:  # 단일 파일일 경우 직접 압축
-          myzip.write(item, os.path.basename(item))
-
-   return jsonify({"message": f"Successfully compressed as: {zipfile_name}"}), 200
+   # 압축은 백그라운드 작업으로 실행하고 진행 상황은 /jobs/<id>로 확인
+   job_id = job_queue.submit('zip', {"target": full_path, "items": resource_paths})
+   return jsonify({"message": f"Compressing as: {zipfile_name}", "jobId": job_id}), 202
   except Exception as e:
     print(f"Error Zipping Process: {e}")
     return jsonify({"message": "An unexpected error occurred"}), 500
@@ -895,6 +1084,7 @@ def rename_resource():
   rename_path = str(root_dir) + data["renamed_path"]
   try:
    os.rename(resource_path, rename_path)
+   resourceMoved(resource_path, rename_path)
    return jsonify({"message": f"Successfully renamed: '{data['resource_path']}' to '{data['renamed_path']}'"}), 200
   except Exception as e:
     print(f"Error Createing Directory: {e}")
@@ -921,8 +1111,10 @@ def saveUploadedImageFromChunks():
     # 모든 조각이 업로드되면 최종 파일로 저장
     if chunk_index == total_chunks - 1:
       os.rename(save_path, os.path.join(target_path, file_name))
-      transform_and_binaried_image(convert_heic_to_jpg(os.path.join(target_path, file_name)), 400)
-      return jsonify({"message": "Upload complete"}), 200
+      resourcesChanged(os.path.join(target_path, file_name))
+      # HEIC 변환과 기울기 보정은 백그라운드 작업으로 처리
+      job_id = job_queue.submit('image', {"path": os.path.join(target_path, file_name)})
+      return jsonify({"message": "Upload complete", "jobId": job_id}), 200
 
     return jsonify({"message": "Chunk received"}), 200
   except Exception as e:
@@ -950,6 +1142,7 @@ def saveUploadedFileFromChunks():
     # 모든 조각이 업로드되면 최종 파일로 저장
     if chunk_index == total_chunks - 1:
       os.rename(save_path, os.path.join(target_path, file_name))
+      resourcesChanged(os.path.join(target_path, file_name))
       return jsonify({"message": "Upload complete"}), 200
 
     return jsonify({"message": "Chunk received"}), 200
@@ -986,12 +1179,153 @@ def saveUploadedFolderFromChunks():
         os.remove(final_path)
 
       os.rename(save_path, final_path)
+      resourcesChanged(final_path)
       return jsonify({"message": "Upload complete"}), 200
     return jsonify({"message": "Chunk received"}), 200
   except Exception as e:
     print(f"Error Saving File: {e}")
     return jsonify({"message": "An unexpected error occurred"}), 500
 
+def uploadSessionInfo(session):
+  return {
+    "sessionId": session["id"],
+    "chunkSize": session["chunk_size"],
+    "totalChunks": session["total_chunks"],
+    "missing": upload_sessions.missing(session),
+  }
+
+@bp.route("/uploadSessions/", methods=['POST'])
+# @login_required
+def createUploadSession():
+  try:
+    data = request.get_json()
+    if not data or "fileName" not in data or "size" not in data:
+      return jsonify({"error": "Invalid request. 'fileName' and 'size' are required."}), 400
+
+    directory = data.get("directory", "").strip('/')
+    file_name = os.path.basename(data["fileName"])
+    target = os.path.normpath(os.path.join(str(root_dir), directory, file_name))
+    if not file_name or not target.startswith(str(root_dir) + '/'):
+      return jsonify({"error": "Invalid upload path."}), 400
+
+    session = upload_sessions.create(
+      target,
+      int(data["size"]),
+      int(data.get("chunkSize", 4 * 1024 * 1024)),
+      kind="image" if data.get("kind") == "image" else "file",
+      file_hash=data.get("hash"),
+      hash_algorithm=data.get("hashAlgorithm", "sha256"),
+      fingerprint=str(data["fingerprint"]) if data.get("fingerprint") is not None else None,
+    )
+    return jsonify({"message": uploadSessionInfo(session)}), 201
+  except ValueError as e:
+    return jsonify({"error": str(e)}), 400
+  except Exception as e:
+    print(f"Error Creating Upload Session: {e}")
+    return jsonify({"message": "An unexpected error occurred"}), 500
+
+@bp.route("/uploadSessions/<session_id>", methods=['GET'])
+# @login_required
+def getUploadSession(session_id):
+  session = upload_sessions.get(session_id)
+  if session is None:
+    return jsonify({"error": "Upload session not found"}), 404
+  return jsonify({"message": uploadSessionInfo(session)}), 200
+
+@bp.route("/uploadSessions/<session_id>/chunks/<int:chunk_index>", methods=['PUT'])
+# @login_required
+def saveUploadChunk(session_id, chunk_index):
+  try:
+    session = upload_sessions.get(session_id)
+    if session is None:
+      return jsonify({"error": "Upload session not found"}), 404
+
+    # 청크는 요청 본문 그대로 받아 해당 위치에 기록 (여러 청크를 동시에 보내도 됨)
+    upload_sessions.write_chunk(session, chunk_index, request.stream)
+    return jsonify({"message": "Chunk received"}), 200
+  except ValueError as e:
+    return jsonify({"error": str(e)}), 400
+  except Exception as e:
+    print(f"Error Saving Chunk: {e}")
+    return jsonify({"message": "An unexpected error occurred"}), 500
+
+@bp.route("/uploadSessions/<session_id>/complete", methods=['POST'])
+# @login_required
+def completeUploadSession(session_id):
+  try:
+    session = upload_sessions.get(session_id)
+    if session is None:
+      return jsonify({"error": "Upload session not found"}), 404
+
+    missing = upload_sessions.missing(session)
+    if missing:
+      return jsonify({"error": "Chunks are missing", "missing": missing}), 409
+    try:
+      final_path = upload_sessions.finalize(session)
+    except ValueError as e:
+      return jsonify({"error": str(e)}), 422
+
+    resourcesChanged(final_path)
+    if session["kind"] == "image":
+      # HEIC 변환과 기울기 보정은 백그라운드 작업으로 처리
+      job_id = job_queue.submit('image', {"path": final_path})
+      return jsonify({"message": "Upload complete", "jobId": job_id}), 200
+    return jsonify({"message": "Upload complete"}), 200
+  except Exception as e:
+    print(f"Error Completing Upload: {e}")
+    return jsonify({"message": "An unexpected error occurred"}), 500
+
+@bp.route("/uploadSessions/<session_id>", methods=['DELETE'])
+# @login_required
+def abortUploadSession(session_id):
+  session = upload_sessions.get(session_id)
+  if session is None:
+    return jsonify({"error": "Upload session not found"}), 404
+  upload_sessions.abort(session)
+  return jsonify({"message": "Upload aborted"}), 200
+
+def jobStatus(job):
+  return {key: job[key] for key in ("id", "kind", "status", "progress", "detail", "result", "error", "created", "updated")}
+
+@bp.route("/jobs/", methods=['GET'])
+# @login_required
+def getJobs():
+  # ?ids=a,b,c 로 여러 작업 상태를 한 번에 조회
+  job_ids = [job_id for job_id in request.args.get('ids', '').split(',') if job_id][:200]
+  if not job_ids:
+    return jsonify({"error": "Invalid request. 'ids' is required."}), 400
+  return jsonify({"message": [jobStatus(job) for job in job_queue.get_many(job_ids)]}), 200
+
+@bp.route("/jobs/<job_id>", methods=['GET'])
+# @login_required
+def getJob(job_id):
+  job = job_queue.get(job_id)
+  if job is None:
+    return jsonify({"error": "Job not found"}), 404
+  return jsonify({"message": jobStatus(job)}), 200
+
+@bp.route("/jobs/<job_id>/events", methods=['GET'])
+# @login_required
+def streamJobEvents(job_id):
+  """작업 상태가 바뀔 때마다 Server-Sent Events로 전송하고, 끝나면 스트림을 닫음"""
+  if job_queue.get(job_id) is None:
+    return jsonify({"error": "Job not found"}), 404
+
+  def generate():
+    last_updated = None
+    while True:
+      job = job_queue.get(job_id)
+      if job is None:
+        return
+      if job["updated"] != last_updated:
+        last_updated = job["updated"]
+        yield f"data: {json.dumps(jobStatus(job), ensure_ascii=False)}\n\n"
+      if job["status"] in ('done', 'failed'):
+        return
+      time.sleep(0.5)
+
+  return Response(generate(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @bp.route("/view/<path:file_path>", methods=['GET'])
 # @login_required
 def serveMediaResource(file_path):
@@ -1001,9 +1335,8 @@ def serveMediaResource(file_path):
     if not os.path.exists(target_path):
       return jsonify({"error": "File not found"}), 404
 
-     # MIME 타입 자동 추론
-    mime_type, _ = mimetypes.guess_type(target_path)
-    return send_file(target_path, mimetype=mime_type, as_attachment=False)
+    # Range/조건부 요청을 지원해 동영상 탐색 시 필요한 구간만 전송
+    return send_file_response(target_path)
   except Exception as e:
     print(f"Error Serving File: {e}")
     return jsonify({"message": "An unexpected error occurred"}), 500
@@ -1011,85 +1344,131 @@ def serveMediaResource(file_path):
 @bp.route("/searchResourcesInfoList/", methods=["POST"])
 @login_required
 def searchResourcesInfoList():
-  infoList = []
-
+  """
+  이름 검색 인덱스(name_index)에서 dir_path 하위 항목을 찾아 반환합니다.
+  offset/limit으로 나누어 받을 수 있으며, 다음 결과가 있으면 hasMore가 true입니다.
+  """
   data = request.get_json()
   if not data or "dir_path" not in data or "search_word" not in data:
     return jsonify({"error": "Invalid request."}), 400
   
   target_path = str(root_dir) + data["dir_path"]
-  # print(target_path)
 
   if not(os.path.isdir(target_path) and os.path.exists(target_path)):
     return jsonify({"error": "The specified folder does not exist."}), 404
 
   try:
-    search_word = data["search_word"].lower()
-    search_word = normalize_path(search_word, "NFD")
-    for filename in glob.glob(f"{target_path}/**/*{search_word}*", recursive=True):
-      infoList.append(filename)
-    # print(infoList)
-    # return jsonify({"message": infoList}), 200
-    directory_info = []
-    
-    for file_path in infoList:
-      if not os.path.exists(file_path):
-        continue  # 존재하지 않는 파일/디렉토리는 스킵
+    offset = max(0, int(data.get("offset", 0)))
+    limit = min(max(1, int(data.get("limit", 500))), 1000)
+  except (TypeError, ValueError):
+    return jsonify({"error": "Invalid request."}), 400
 
-      name, ext = os.path.splitext(os.path.basename(file_path))
-      ext = ext.lower()
-      image = None
+  try:
+    if name_index.is_empty():
+      # 첫 검색이면 대상 폴더 하위만 먼저 색인하고, 전체는 주기적 재스캔에서 채움
+      name_index.scan(target_path)
+    name_index.start_rescan()
+    rows, has_more = name_index.search(target_path, data["search_word"], offset, limit)
 
-      if name.startswith(('.', '$')) or name == 'System Volume Information':
-        continue
+    directory_info = []
+    for row in rows:
+      # 인덱스의 path/parent는 NFC 키이므로 디스크의 실제 경로(dir + name)를 사용
+      file_path = os.path.join(row["dir"], row["name"])
+      ext = '' if row["is_dir"] else os.path.splitext(row["name"])[1].lower()
 
-      # 디렉토리인지 파일인지 판별
-      if os.path.isdir(file_path):
+      if row["is_dir"]:
         type_ = 'Directory'
         loc = file_path.split(str(root_dir))[-1]
-        size_bytes = calculate_directory_size(file_path)  # 디렉토리 크기 계산
+        size_bytes = calculate_directory_size(file_path)  # 크기 인덱스에서 조회
       else:
         type_ = ext
-        loc = file_path.split(str(root_dir))[-1].split(os.path.basename(file_path))[0]
-        size_bytes = os.stat(file_path).st_size
+        loc = row["dir"].split(str(root_dir))[-1] + '/'
+        size_bytes = row["size"]
 
-      modification_time = datetime.datetime.fromtimestamp(os.stat(file_path).st_mtime)
+      modification_time = datetime.datetime.fromtimestamp(row["mtime"])
       hour = modification_time.hour
       period = "오전" if hour < 12 else "오후"
       hour_12 = hour if 1 <= hour <= 12 else (hour - 12 if hour > 12 else 12)
       modified_time_str = modification_time.strftime(f"%Y. %m. %d. {period} {hour_12}:%M")
       
       entry_info = {
-        "_name": name + ext,
+        "_name": row["name"],
         "_type": type_,
         "_loc": loc,
         "_size": size_bytes,
         "_modified": modified_time_str,
       }
       
-      # 썸네일 생성 로직
       if ext in ('.png', '.jpeg', '.jpg', '.gif', '.bmp', '.tiff', '.webp', '.heic'):
-        try:
-          # entry_info['_thumbnail'] = encodeImageToBase64(file_path, 146, (255, 255, 255, 0))
-          entry_info['_thumbnail'] = 'image'
-        except Exception as e:
-          print(f"Error processing {file_path}: {e}")
-          continue
+        entry_info['_thumbnail'] = 'image'
       elif ext in ('.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv'):
-        try:
-          # entry_info['_thumbnail'] = encodeVideoToBase64(file_path, 146, (255, 255, 255, 0))
-          entry_info['_thumbnail'] = 'video'
-        except Exception as e:
-          entry_info['_thumbnail'] = ''
+        entry_info['_thumbnail'] = 'video'
       else:
         entry_info['_thumbnail'] = ''
       
       directory_info.append(entry_info)
-    return jsonify({"message": directory_info}), 200
+    return jsonify({"message": directory_info, "offset": offset, "hasMore": has_more}), 200
   except Exception as e:
     print(f"Error Seaching File: {e}")
     return jsonify({"message": "An unexpected error occurred"}), 500
-  
+
+def shareSettings(folder):
+  """공유 폴더 행을 기존 shelve 값과 같은 형태(shareLink/edit/password)로 변환"""
+  return {"shareLink": folder.shareLink, "edit": folder.edit, "password": folder.password}
+
+def readShelve(name, shelve_files):
+  """shelve 파일을 읽어 dict로 반환 (파일이 없으면 빈 dict)"""
+  if not any(f == name or f.startswith(name + '.') for f in shelve_files):
+    return {}
+  with shelve.open(name, 'r') as d:
+    return dict(d.items())
+
+def migrateShelveShareLinks():
+  """
+  기존 shelve 파일(path_short_url.dat, uuid_shared_folder.dat)의 공유 링크를 shared_folder 테이블로 한 번만 옮깁니다.
+  옮긴 뒤에는 shelve 파일 이름 뒤에 .migrated를 붙여 다시 읽지 않습니다.
+  """
+  global share_migration_done
+  if share_migration_done:
+    return
+  with share_migration_lock:
+    if share_migration_done:
+      return
+    shelve_files = glob.glob('path_short_url.dat*') + glob.glob('uuid_shared_folder.dat*')
+    shelve_files = [f for f in shelve_files if not f.endswith('.migrated')]
+    if shelve_files:
+      try:
+        # 두 파일 중 하나만 남아 있으면 없는 쪽은 빈 것으로 보고 옮길 수 있는 것만 옮김
+        uuid_by_path = {path_key(path): _uuid for _uuid, path in readShelve('uuid_shared_folder.dat', shelve_files).items()}
+        settings_by_path = {path_key(path): value for path, value in readShelve('path_short_url.dat', shelve_files).items()}
+
+        existing = {folder.path for folder in SharedFolder.query.with_entities(SharedFolder.path)}
+        migrated = 0
+        for path, value in settings_by_path.items():
+          if path in existing or path not in uuid_by_path or not value.get('shareLink'):
+            continue
+          db.session.add(SharedFolder(uuid=uuid_by_path[path], path=path, shareLink=value['shareLink'],
+                                      edit=value.get('edit') or '', password=value.get('password') or ''))
+          migrated += 1
+        db.session.commit()
+        for f in shelve_files:
+          os.rename(f, f + '.migrated')
+        print(f"Migrated {migrated} shared folder links from shelve")
+      except Exception as e:
+        db.session.rollback()
+        print(f"Error migrating shared folder links: {e}")
+        return
+    share_migration_done = True
+
+def findSharedLinks(dir_paths):
+  """폴더 경로 목록의 공유 설정을 한 번의 IN 쿼리로 조회해 {경로: 설정} 반환"""
+  migrateShelveShareLinks()
+  keys = {path_key(path): path for path in dir_paths}
+  if not keys:
+    return {}
+  folders = SharedFolder.query.filter(SharedFolder.path.in_(list(keys))).all()
+  return {keys[folder.path]: shareSettings(folder) for folder in folders}
+
 @bp.route("/generateShortUrlForDirectoryPath/", methods=['POST'])
 @login_required
 def generateShortUrlForDirectoryPath():
@@ -1104,28 +1483,23 @@ def generateShortUrlForDirectoryPath():
     if not(os.path.isdir(target_path) and os.path.exists(target_path)):
       return jsonify({"error": "The specified folder does not exist."}), 404
 
-    shortenURL = None
-    with shelve.open('path_short_url.dat') as d:
-      shortenURL = d.get(target_path)
-
-    if shortenURL is not None:
-      return jsonify({"message": shortenURL}), 200
+    migrateShelveShareLinks()
+    folder = SharedFolder.query.filter_by(path=path_key(target_path)).first()
+    if folder is not None:
+      return jsonify({"message": shareSettings(folder)}), 200
 
     _uuid = uuid.uuid4().hex
     s = pyshorteners.Shortener()
     shortenURL = s.tinyurl.short(f"http://121.189.157.152:8080/cloudstorage/renderSharedDirectoryContents/{_uuid}")
 
-    with shelve.open('uuid_shared_folder.dat') as d:
-      d[_uuid] = target_path
-
-    temp = dict(zip(['shareLink', 'edit', 'password'], [shortenURL, '', '']))
-    # print(temp)
-    with shelve.open('path_short_url.dat') as d:
-      d[target_path] = temp
+    folder = SharedFolder(uuid=_uuid, path=path_key(target_path), shareLink=shortenURL, edit='', password='')
+    db.session.add(folder)
+    db.session.commit()
 
-    return jsonify({"message": temp}), 200
+    return jsonify({"message": shareSettings(folder)}), 200
       
   except Exception as e:
+    db.session.rollback()
     print(f"Error Createing URL: {e}")
     return jsonify({"message": "An unexpected error occurred"}), 500
 
@@ -1137,28 +1511,16 @@ def removeSharedFolderPath():
     if not data or "shareLink" not in data:
       return jsonify({"error": "Invalid request."}), 400
     
-    target = None
-    flag_1 = False 
-    flag_2 = False
-
     try:
-      with shelve.open('path_short_url.dat') as d:
-        for key, value in d.items():
-          if value.get('shareLink') == data['shareLink']:
-            target = key
-            del d[key]
-            flag_1 = True
-
-      with shelve.open('uuid_shared_folder.dat') as d:
-        for key, value in d.items():
-          if value == target:
-            del d[key]
-            flag_2 = True
-
-      if not flag_1 or not flag_2:
-         return jsonify({"message": f"Directory not found: flag_1 {flag_1}, flag_2 {flag_2}"}), 404
+      migrateShelveShareLinks()
+      deleted = SharedFolder.query.filter_by(shareLink=data['shareLink']).delete()
+      db.session.commit()
+
+      if not deleted:
+         return jsonify({"message": "Directory not found"}), 404
       return jsonify({"message": f"Successfully deleted for {data['shareLink']}"}), 200
     except Exception as e:
+      db.session.rollback()
       print(f"Error Rendering URL: {e}")
       return jsonify({"message": "An unexpected error occurred"}), 500
     
@@ -1170,20 +1532,16 @@ def removeSharedFolderPath():
 
 @bp.route("/renderSharedDirectoryContents/<path:_uuid>", methods=["GET"])
 def renderSharedDirectoryContents(_uuid):
-  data = None
   try:
-    with shelve.open('uuid_shared_folder.dat') as d:
-      if d.get(_uuid):
-        basePath = d.get(_uuid).split(str(root_dir))[1]
-
-        with shelve.open('path_short_url.dat') as k:
-          for key, value in k.items():
-            if key == d.get(_uuid):
-              data = k[key]
-        
-        return render_template('cloudStorage/cloudStorageForShare.html', base_path = basePath, edit = data.get('edit'), password = data.get('password'))
-      else:
-        return jsonify({"error": "The specified file or directory does not exist."}), 404
+    migrateShelveShareLinks()
+    folder = SharedFolder.query.filter_by(uuid=_uuid).first()
+    # 경로는 조회용 NFC 키로 저장되어 있으므로 디스크의 실제 이름(macOS는 NFD)으로 바꿔서 전달
+    shared_path = resolve_path(folder.path) if folder is not None else None
+    if shared_path is not None:
+      basePath = shared_path[len(str(root_dir)):]
+      return render_template('cloudStorage/cloudStorageForShare.html', base_path = basePath, edit = folder.edit, password = folder.password)
+    else:
+      return jsonify({"error": "The specified file or directory does not exist."}), 404
   except Exception as e:
     print(f"Error Rendering URL: {e}")
     return jsonify({"message": "An unexpected error occurred"}), 500
@@ -1196,14 +1554,17 @@ def updateSharedFolderSettings():
     if not data or "shareLink" not in data:
       return jsonify({"error": "Invalid request. 'shareLink' is required."}), 400
     
-    with shelve.open('path_short_url.dat') as d:
-      for key, value in d.items():
-        if value.get('shareLink') == data['shareLink']:
-          d[key] = dict(zip(['shareLink', 'edit', 'password'], [data['shareLink'], data['edit'], data['password']]))
-          # print(f"d[key] - {key} : {d[key]}")
-          return jsonify({"message": f"Successfully updated for {data['shareLink']}"}), 200
+    migrateShelveShareLinks()
+    folder = SharedFolder.query.filter_by(shareLink=data['shareLink']).first()
+    if folder is None:
       return jsonify({"message": "Directory not found"}), 404
 
+    folder.edit = data['edit']
+    folder.password = data['password']
+    db.session.commit()
+    return jsonify({"message": f"Successfully updated for {data['shareLink']}"}), 200
+
   except Exception as e:
+    db.session.rollback()
     print(f"Error updating shared folder: {e}")
     return jsonify({"message": "An unexpected error occurred"}), 500
\ No newline at end of file
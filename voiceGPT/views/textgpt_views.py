@@ -1,8 +1,7 @@
-from flask import Blueprint, jsonify, url_for, render_template, flash, request, g, current_app, send_from_directory, abort, send_file, Response
+from flask import Blueprint, jsonify, url_for, render_template, flash, request, g, current_app, send_from_directory, abort, send_file, Response, stream_with_context
 from werkzeug.utils import redirect
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import selectinload
-from openai import OpenAI
 from typing import Optional, Dict, Any
 import json
 import ast
@@ -16,10 +15,17 @@ import re
 import time
 import traceback
 import mimetypes
+import threading
 from .. import db
 from dotenv import load_dotenv
 from .auth_views import login_required
-from ..models import User, Subject, Message, RoleEnum, MsgImage, MsgFile
+from ..storage import CACHE_DIR
+from ..storage.fileserve import send_file_response
+from ..storage.jobs import JobQueue
+from ..openai_gateway import OpenAIGateway
+from ..conversation_cache import ConversationCache
+from ..context_window import MESSAGE_OVERHEAD, count_tokens, message_tokens, fit_history, history_budget
+from ..models import User, Subject, Message, RoleEnum, MsgImage, MsgFile, ConversationSummary
 from pathlib import Path
 from PIL import Image, ExifTags
 from datetime import datetime, timedelta
@@ -33,7 +39,28 @@ config.read('textgpt.ini')
 authorized_users = config['USER']['MEMBER']
 user_list = [user.strip() for user in authorized_users.split(',') if user.strip()]
 
-client = OpenAI()
+# 모든 OpenAI 호출은 게이트웨이의 공유 연결 풀과 동시 호출 제한을 거침
+gateway = OpenAIGateway(
+  max_concurrency=int(os.getenv('OPENAI_GATEWAY_CONCURRENCY', '16')),
+  per_user=int(os.getenv('OPENAI_GATEWAY_PER_USER', '4')),
+  timeout=float(os.getenv('OPENAI_GATEWAY_TIMEOUT', '120')),
+  retries=int(os.getenv('OPENAI_GATEWAY_RETRIES', '2')),
+)
+IMAGE_TIMEOUT = float(os.getenv('OPENAI_GATEWAY_IMAGE_TIMEOUT', '300'))  # 이미지 생성/편집 호출 시간 제한(초)
+# 오래 걸리는 OpenAI 요청은 작업 ID를 바로 돌려주고 결과는 /textgpt/jobs/<id>로 확인 (작업 스레드는 결과 저장에만 사용)
+openai_jobs = JobQueue(CACHE_DIR / 'textgpt_jobs.db', workers=int(os.getenv('TEXTGPT_JOB_WORKERS', '4')), thread_name_prefix="textgpt-job")
+# 질문마다 보낼 이전 대화. TEXTGPT_CONTEXT_REDIS_URL이 있으면 워커 간에 Redis로 공유
+conversation_cache = ConversationCache(
+  max_subjects=int(os.getenv('TEXTGPT_CONTEXT_CACHE_SIZE', '512')),
+  redis_url=os.getenv('TEXTGPT_CONTEXT_REDIS_URL'),
+  ttl=int(os.getenv('TEXTGPT_CONTEXT_CACHE_TTL', '3600')),
+)
+# 토큰 예산으로 잘린 이전 대화를 요약할 모델. 비어 있으면 요약을 만들거나 쓰지 않음
+SUMMARY_MODEL = os.getenv('TEXTGPT_SUMMARY_MODEL', '')
+SUMMARY_REFRESH_TOKENS = int(os.getenv('TEXTGPT_SUMMARY_REFRESH_TOKENS', '2000'))  # 요약되지 않고 잘린 토큰이 이만큼 쌓이면 다시 요약
+SUMMARY_INPUT_TOKENS = int(os.getenv('TEXTGPT_SUMMARY_INPUT_TOKENS', '12000'))  # 요약 한 번에 넘길 최대 토큰
+summary_jobs = set()
+summary_lock = threading.Lock()
 root_dir = Path('/Volumes/X31')
 bp = Blueprint('textgpt', __name__, url_prefix='/textgpt')
 timeLeft = 10
@@ -44,6 +71,73 @@ def encode_image(image_path):
   with open(image_path, "rb") as image_file:
     return base64.b64encode(image_file.read()).decode("utf-8")
 
+def file_payload(file_path):
+  """업로드용 (파일명, 바이트, MIME). 게이트웨이가 다시 시도할 때도 같은 내용을 보낼 수 있도록 미리 읽어 둠"""
+  file_path = Path(file_path)
+  return (file_path.name, file_path.read_bytes(), mimetypes.guess_type(file_path.name)[0] or "application/octet-stream")
+
+
+def submit_openai_job(kind, work, finish=None):
+  """
+  work()가 돌려주는 코루틴(gateway.acall로 OpenAI 호출)을 게이트웨이 이벤트 루프에서 실행하고 202와 작업 ID를 바로 반환합니다.
+  응답이 오면 finish(결과)를 app context 안에서 작업 스레드로 실행해 파일/DB에 저장하고, 그 반환값(없으면 work의 결과)을
+  작업 결과로 남깁니다. 요청 스레드와 작업 스레드 모두 업스트림 응답을 기다리며 묶여 있지 않습니다.
+  """
+  app = current_app._get_current_object()
+  job_id = openai_jobs.start(kind, {"user_id": g.user.id})
+
+  def finish_job(future):
+    result = future.result()
+    if finish is None:
+      return result
+    with app.app_context():
+      try:
+        return finish(result)
+      except Exception:
+        db.session.rollback()
+        raise
+
+  gateway.spawn(work).add_done_callback(lambda future: openai_jobs.complete(job_id, lambda: finish_job(future)))
+  return jsonify({"jobId": job_id}), 202
+
+def save_generated_images(response, upload_folder, username):
+  """생성된 이미지(b64_json)와 256px 썸네일을 업로드 폴더에 저장하고 MsgImage로 기록"""
+  revised_prompt = None
+  msgIds = []
+  for item in response.data:
+    image_data = base64.b64decode(item.b64_json)
+    revised_prompt = item.revised_prompt
+    formatted_now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    file_name = f'{username}_{formatted_now}_{uuid.uuid4().hex}.png'
+
+    # 원본 저장
+    with open(upload_folder / file_name, 'wb') as f:
+      f.write(image_data)
+
+    # 썸네일 저장
+    img = Image.open(io.BytesIO(image_data))
+    img.thumbnail((256, 256))
+    thumbnail_name = f't_{file_name}'
+    img.save(upload_folder / thumbnail_name)
+
+    db.session.add(MsgImage(
+      imagePath=file_name,
+      thumbnailPath=thumbnail_name,
+    ))
+    msgIds.append(thumbnail_name)
+  db.session.commit()
+  return {"revised_prompt": revised_prompt, "msgIds": msgIds}
+
+
+def submit_image_job(generate, upload_folder):
+  """이미지 생성/편집 요청 generate(client)를 작업으로 보내고, 결과 이미지는 작업 스레드에서 저장"""
+  user_id, username = g.user.id, g.user.username
+
+  async def work():
+    return await gateway.acall(generate, user=user_id, timeout=IMAGE_TIMEOUT, retry=False)
+
+  return submit_openai_job('image', work, lambda response: save_generated_images(response, upload_folder, username))
+
 
 def subject_to_dict(subject):
   return {
@@ -82,22 +176,56 @@ def test():
   return render_template('textgpt/textgpt.html')
 
 
+@bp.route("/jobs/<job_id>", methods=["GET"])
+@login_required
+def get_job(job_id):
+  """오래 걸리는 OpenAI 요청의 상태(running/done/failed)와 결과. result는 동기 응답이던 때의 응답 본문과 같음"""
+  job = openai_jobs.get(job_id)
+  if job is None or job["payload"].get("user_id") != g.user.id:
+    return jsonify({"error": "Job not found"}), 404
+  return jsonify({key: job[key] for key in ("id", "kind", "status", "result", "error")}), 200
+
+
 @bp.route("/question/", methods=["POST"])
 @login_required
 def question():
+  """
+  질문에 대한 답변을 작업으로 요청하고 작업 ID를 반환합니다 (결과 {"response": ...}는 /textgpt/jobs/<id>).
+  요청에 "stream": true를 넣으면 답변 토큰을 받는 대로
+  Server-Sent Events(token → done 또는 error)로 전송하고, "subject"(주제 제목)를 함께 보내면
+  완성된 질문/답변을 /textgpt/upload/와 같은 방식으로 저장한 뒤 done 이벤트에 msgIds, subjectId를 담아 보냅니다.
+  """
   data = request.get_json()
   if not data or not all(key in data for key in ('model', 'content', 'system', 'range', 'subject_id', 'images')):
     return jsonify({'error': 'Invalid input'}), 400
-  
+
+  _messages = question_messages(data)
+  if data.get('stream'):
+    return stream_question(data, _messages)
+
+  user_id = g.user.id
+
+  async def work():
+    # print("model: ", _model)
+    # print("messages: ", _messages)
+    completion = await gateway.acall(
+      lambda client: client.chat.completions.create(model=data['model'], messages=_messages),
+      user=user_id,
+    )
+    return {"response": completion.choices[0].message.content}
+
+  return submit_openai_job('question', work)
+
+def question_messages(data):
+  """question 요청 본문으로 system 메시지, 이전 대화(range 쌍), 새 질문(이미지 포함)을 담은 messages를 만듦"""
   _messages = []
-  _model = data['model']
   _content = data['content']
   _system = data['system']
   _range = int(data['range'])
   _subject_id = data['subject_id']
   _images = data['images']
 
-  # print("model: ", _model)
+  # print("model: ", data['model'])
   # print("content: ", _content)
   # print("system: ", _system)
   # print("range: ", _range)
@@ -109,23 +237,10 @@ def question():
     if _system :
       _messages.insert(0, { "role": "system", "content": _system })
 
-    # _range의 숫자의 2배수에 해당하는 아래의 형식과 같은 객체를 전달해야 함.
+    # _range의 숫자의 2배수에 해당하는 최근 메시지 중 모델별 토큰 예산에 들어가는 만큼 시간 순으로 전달해야 함.
     if _subject_id != 'null':
-      previous_records = [None] * (_range * 2)  # 초기화 시 None 사용
-      sub_contents = Message.query.filter_by(subject_id=_subject_id).order_by(Message.create_date.desc()).limit(_range*2).all() 
-      # message_to_dict 함수로 변환 후 리스트를 reverse로 역순 처리
-      sub_content_dicts = [message_to_dict(item) for item in sub_contents]
-      sub_content_dicts.reverse()  # 역순으로 리스트를 뒤집음
-      for idx, obj in enumerate(sub_content_dicts, start=1):
-        if idx%2 == 1:
-          previous_records[idx] = obj
-        else:
-          previous_records[idx-2] = obj
-      result = []
-      cleaned_list = [item for item in previous_records if item is not None]
-      for record in cleaned_list:
-        result.append(dict([('role', record['role']), ('content', record['content'])]))
-      _messages.extend(result)
+      prompt_tokens = count_tokens(_system) + count_tokens(_content) + 2 * MESSAGE_OVERHEAD
+      _messages.extend(conversation_history(_subject_id, _range * 2, data['model'], prompt_tokens))
     
     _messages.append({ "role": "user", "content": _content})
   else:
@@ -142,21 +257,182 @@ def question():
       content.append({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},})
       # content.append({"type": "image_url", "image_url": {"url": _image},})
     _messages.append({"role": "user", "content": content})
-    
-  try:
-    # print("model: ", _model)
-    # print("messages: ", _messages)
-    completion = client.chat.completions.create(
-      model=_model,
-      messages=_messages,
-    )
-  except Exception as e:
-    print("error: ", e)
-    return jsonify({"error": str(e)}), 500
-  
-  response = completion.choices[0].message.content
-  return json.dumps({"response": response}, ensure_ascii=False), 200
+  return _messages
+
+def conversation_history(subject_id, size, model, prompt_tokens):
+  """
+  최근 size개 메시지를 최신 것부터 모델의 토큰 예산만큼 채운 role/content 목록.
+  예산 때문에 잘린 메시지가 있고 요약 모델이 설정되어 있으면, 남은 예산 안에서 저장된 요약을
+  잘린 대화 대신 앞에 넣고, 요약되지 않은 부분이 쌓였으면 새 요약을 백그라운드에서 만듭니다.
+  """
+  window = conversation_cache.window(subject_id, size, load_conversation_window)
+  budget = history_budget(model, prompt_tokens)
+  kept, dropped = fit_history(window, budget)
+  history = [{"role": message["role"], "content": message["content"]} for message in kept]
+  if not dropped or not SUMMARY_MODEL:
+    return history
+
+  boundary = kept[0]["id"] if kept else dropped[-1]["id"] + 1
+  summary = (ConversationSummary.query
+             .filter(ConversationSummary.subject_id == subject_id, ConversationSummary.upto_message_id < boundary)
+             .order_by(ConversationSummary.upto_message_id.desc())
+             .first())
+  used = sum(message_tokens(message) for message in kept)
+  if summary is not None and used + summary.token_count + MESSAGE_OVERHEAD <= budget:
+    history.insert(0, {"role": "system", "content": f"이전 대화 요약:\n{summary.content}"})
+  summarized_upto = summary.upto_message_id if summary is not None else 0
+  unsummarized = sum(message_tokens(message) for message in dropped if message["id"] > summarized_upto)
+  if summary is None or unsummarized >= SUMMARY_REFRESH_TOKENS:
+    schedule_summary(subject_id, dropped[-1]["id"], g.user.id)
+  return history
+
+def load_conversation_window(subject_id, size):
+  """
+  주제의 최근 size개 메시지를 시간 순 목록(id, role, content, tokens)으로 읽음 (conversation_cache가 비었을 때).
+  필요한 컬럼만 조회하므로 msg_images/msg_files 관계는 읽지 않으며, 질문/답변이 같은 시각으로
+  저장된 경우에도 id로 순서를 정합니다. 토큰 수가 저장되지 않은 메시지는 계산해 저장합니다.
+  """
+  rows = (db.session.query(Message.id, Message.role, Message.content, Message.token_count)
+          .filter(Message.subject_id == subject_id)
+          .order_by(Message.create_date.desc(), Message.id.desc())
+          .limit(size)
+          .all())
+  window = []
+  counted = []
+  for message_id, role, content, token_count in reversed(rows):
+    if token_count is None:
+      token_count = count_tokens(content)
+      counted.append({"id": message_id, "token_count": token_count})
+    window.append({"id": message_id, "role": role.value, "content": content, "tokens": token_count})
+  if counted:
+    try:
+      db.session.execute(db.update(Message), counted)
+      db.session.commit()
+    except SQLAlchemyError as e:
+      db.session.rollback()
+      print(f"Error saving message token counts: {e}")
+  return window
+
+def schedule_summary(subject_id, upto_id, user_id):
+  """주제별로 하나씩만 백그라운드에서 요약을 만듦"""
+  key = str(subject_id)
+  with summary_lock:
+    if key in summary_jobs:
+      return
+    summary_jobs.add(key)
+  app = current_app._get_current_object()
+
+  def run():
+    try:
+      with app.app_context():
+        summarize_conversation(subject_id, upto_id, user_id)
+    except Exception as e:
+      print(f"Error summarizing conversation {subject_id}: {e}")
+    finally:
+      with summary_lock:
+        summary_jobs.discard(key)
+
+  threading.Thread(target=run, name="conversation-summary", daemon=True).start()
+
+def summarize_conversation(subject_id, upto_id, user_id):
+  """이전 요약과 그 뒤 upto_id까지의 메시지(최근 SUMMARY_INPUT_TOKENS만큼)를 합친 새 요약을 저장"""
+  previous = (ConversationSummary.query
+              .filter(ConversationSummary.subject_id == subject_id, ConversationSummary.upto_message_id <= upto_id)
+              .order_by(ConversationSummary.upto_message_id.desc())
+              .first())
+  start_id = previous.upto_message_id if previous is not None else 0
+  if start_id == upto_id:
+    return
+  rows = (db.session.query(Message.role, Message.content)
+          .filter(Message.subject_id == subject_id, Message.id > start_id, Message.id <= upto_id)
+          .order_by(Message.id)
+          .all())
+  messages, _ = fit_history([{"role": role.value, "content": content} for role, content in rows], SUMMARY_INPUT_TOKENS)
+  if not messages:
+    return
+  transcript = "\n\n".join(f"{message['role']}: {message['content']}" for message in messages)
+  if previous is not None:
+    transcript = f"이전 요약:\n{previous.content}\n\n이어진 대화:\n{transcript}"
+  completion = gateway.call(
+    lambda client: client.chat.completions.create(
+      model=SUMMARY_MODEL,
+      messages=[
+        {"role": "system", "content": "다음 대화를 이후 대화에 필요한 사실, 결정, 사용자의 요구 위주로 간결하게 요약하세요. 이전 요약이 있으면 합쳐서 하나의 요약으로 만드세요."},
+        {"role": "user", "content": transcript},
+      ],
+    ),
+    user=user_id,
+  )
+  content = completion.choices[0].message.content
+  if not content:
+    return
+  db.session.add(ConversationSummary(
+    subject_id=subject_id,
+    upto_message_id=upto_id,
+    content=content,
+    token_count=count_tokens(content),
+  ))
+  # 새 요약이 이전 요약을 포함하므로 더 오래된 요약은 지움
+  ConversationSummary.query.filter(
+    ConversationSummary.subject_id == subject_id, ConversationSummary.upto_message_id < upto_id
+  ).delete()
+  db.session.commit()
+
+def sse_event(event, payload):
+  return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+def stream_question(data, _messages):
+  """
+  답변을 스트리밍으로 받아 token 이벤트로 바로 전달합니다.
+  브라우저 연결이 끊기면 WSGI 서버가 제너레이터를 닫으므로 finally에서 게이트웨이 스트림을 닫아
+  업스트림 요청을 취소합니다.
+  """
+  user_id = g.user.id
+
+  def generate():
+    stream = None
+    chunks = []
+    try:
+      stream = gateway.stream(
+        lambda client: client.chat.completions.create(model=data['model'], messages=_messages, stream=True),
+        user=user_id,
+      )
+      for chunk in stream:
+        if not chunk.choices:
+          continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+          chunks.append(delta)
+          yield sse_event("token", {"delta": delta})
+    except Exception as e:
+      print("error: ", e)
+      yield sse_event("error", {"error": str(e)})
+      return
+    finally:
+      if stream is not None:
+        stream.close()
+
+    response = "".join(chunks)
+    done = {"response": response}
+    if data.get('subject'):
+      # 완성된 질문/답변을 /textgpt/upload/와 같은 경로로 저장
+      contents = [{'author': 'user', 'desc': data['content']}, {'author': 'assistant', 'desc': response}]
+      try:
+        msgIds, subjectId = save_conversation(
+          user_id, data['subject'], data['model'], data['range'], data['system'],
+          contents, data['images'], data.get('files', []),
+        )
+        done.update({'msgIds': msgIds, 'subjectId': subjectId})
+      except Exception as e:
+        db.session.rollback()
+        yield sse_event("error", {"error": "Database error", "message": str(e), "response": response})
+        return
+    yield sse_event("done", done)
 
+  return Response(
+    stream_with_context(generate()), mimetype="text/event-stream",
+    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+  )
 
 def extract_after_view(url: str) -> str:
   """
@@ -275,23 +551,25 @@ def pdf_file_input():
       }
     })
 
-  # 5) Chat Completions 호출
-  try:
-    completion = client.chat.completions.create(
-      model=_model,
-      messages=[
-        {
-          "role": "user",
-          "content": content_list
-        },
-      ],
+  # 5) Chat Completions 호출 (결과 {"response": ...}는 /textgpt/jobs/<id>로 확인)
+  user_id = g.user.id
+
+  async def work():
+    completion = await gateway.acall(
+      lambda client: client.chat.completions.create(
+        model=_model,
+        messages=[
+          {
+            "role": "user",
+            "content": content_list
+          },
+        ],
+      ),
+      user=user_id,
     )
-    content = completion.choices[0].message.content
-    # JSON 응답
-    return jsonify({"response": content}), 200
-  except Exception as e:
-    print(traceback.format_exc())
-    return jsonify({'error': 'Server error', 'message': str(e)}), 500
+    return {"response": completion.choices[0].message.content}
+
+  return submit_openai_job('pdf_file_input', work)
 
 
 ### Dictionary와 Pydantic 객체를 모두 안전하게 접근하는 함수
@@ -385,55 +663,76 @@ def code_interpreter():
   if errors:
     return jsonify({"error": "File resolution error", "details": errors}), 404
 
-  uploaded_file_ids = []
-  response = None
-  container_ids = set()
-  msg_files = []
+  user_id = g.user.id
+  upload_folder = Path(current_app.config["UPLOAD_FOLDER"])
+  uploads = [file_payload(p) for p in rel_paths]
 
-  try:
-    # ---------- 파일 업로드 ----------
-    for p in rel_paths:
-      file_obj = client.files.create(
-        file=open(p, "rb"),
-        purpose="user_data",
-        expires_after={"anchor": "created_at", "seconds": 3600}
+  async def work():
+    container_ids = set()
+    try:
+      # ---------- 파일 업로드 ----------
+      uploaded_file_ids = []
+      for upload in uploads:
+        file_obj = await gateway.acall(
+          lambda client: client.files.create(
+            file=upload,
+            purpose="user_data",
+            expires_after={"anchor": "created_at", "seconds": 3600}
+          ),
+          user=user_id,
+        )
+        uploaded_file_ids.append(file_obj.id)
+
+      # ---------- Responses API 실행 ----------
+      response = await gateway.acall(
+        lambda client: client.responses.create(
+          model=_model,
+          tools=[{
+            "type": "code_interpreter",
+            "container": {"type": "auto", "file_ids": uploaded_file_ids}
+          }],
+          instructions=_system,
+          input=text,
+        ),
+        user=user_id,
+        timeout=IMAGE_TIMEOUT,
+        retry=False,
       )
-      uploaded_file_ids.append(file_obj.id)
-
-    # ---------- Responses API 실행 ----------
-    response = client.responses.create(
-      model=_model,
-      tools=[{
-        "type": "code_interpreter",
-        "container": {"type": "auto", "file_ids": uploaded_file_ids}
-      }],
-      instructions=_system,
-      input=text,
-    )
 
-    upload_folder = Path(current_app.config["UPLOAD_FOLDER"])
-    upload_folder.mkdir(parents=True, exist_ok=True)
-
-    citations = extract_container_file_citations(response)
-
-    for c in citations:
-      # print(f'container_id: {c["container_id"]}')
-      # print(f'file_id: {c["file_id"]}')
-      # print(f'filename: {c["filename"]}')
-      container_ids.add(c["container_id"])
-
-      # 컨테이너에서 파일 다운로드
-      result = client.containers.files.content.retrieve(
-        file_id=c["file_id"],
-        container_id=c["container_id"],
-      )
-      blob = result.read()  # bytes
-      size = len(blob)
+      files = []
+      for c in extract_container_file_citations(response):
+        # print(f'container_id: {c["container_id"]}')
+        # print(f'file_id: {c["file_id"]}')
+        # print(f'filename: {c["filename"]}')
+        container_ids.add(c["container_id"])
+
+        # 컨테이너에서 파일 다운로드
+        result = await gateway.acall(
+          lambda client: client.containers.files.content.retrieve(
+            file_id=c["file_id"],
+            container_id=c["container_id"],
+          ),
+          user=user_id,
+        )
+        files.append((c["filename"], result.content))  # bytes
+      return getattr(response, "output_text", "") or "", files
+    finally:
+      # 컨테이너 삭제 시도 (실패하더라도 무시)
+      for cid in container_ids:
+        try:
+          await gateway.acall(lambda client: client.containers.delete(cid))
+        except Exception:
+          pass
 
+  def finish(result):
+    output_text, files = result
+    upload_folder.mkdir(parents=True, exist_ok=True)
+    msg_files = []
+    for filename, blob in files:
       # 파일명 중복 방지: "2025-12-03_12-33-44_XXXX-UUID_filename"
       formatted_now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
       unique = uuid.uuid4().hex[:8]
-      save_name = f"{formatted_now}_{unique}_{c['filename']}"
+      save_name = f"{formatted_now}_{unique}_{filename}"
       file_path = upload_folder / save_name
 
       with open(file_path, "wb") as fp:
@@ -443,8 +742,8 @@ def code_interpreter():
       msg_file = MsgFile(
         filePath=str(file_path),
         filename=save_name,
-        size=size,
-        mimeType=mimetypes.guess_type(c["filename"])[0] or "application/octet-stream",
+        size=len(blob),
+        mimeType=mimetypes.guess_type(filename)[0] or "application/octet-stream",
       )
       db.session.add(msg_file)
       db.session.flush()
@@ -455,69 +754,10 @@ def code_interpreter():
       })
 
     db.session.commit()
+    return {"response": output_text, "msg_files": msg_files}
 
-  except Exception:
-    db.session.rollback()
-    current_app.logger.error("code_interpreter error: %s", traceback.format_exc())
-    return jsonify({
-      "error": "Code Interpreter execution failed",
-      "details": traceback.format_exc()
-    }), 500
-
-  finally:
-    # 컨테이너 삭제 시도 (실패하더라도 무시)
-    if container_ids:
-      for cid in container_ids:
-        try:
-          client.containers.delete(cid)
-        except Exception:
-          pass
-
-  # ---------- 응답 반환 ----------
-  output_text = getattr(response, "output_text", "") or ""
-  return jsonify({
-    "response": output_text,
-    "msg_files": msg_files,
-  }), 201
-
-
-# 파일 크기에 따른 청크 크기 설정 (사이즈: 청크 크기)
-CHUNK_SIZES = {
-  1 * 1024 * 1024: 1024 * 64,   # 1MB 이상 100MB 미만 → 64KB
-  100 * 1024 * 1024: 1024 * 128,  # 100MB 이상 500MB 이하 → 128KB
-  500 * 1024 * 1024: 1024 * 512,  # 500MB 이상 1GB 미만 → 512KB
-  1 * 1024 * 1024 * 1024: 1024 * 1024  # 1GB 이상 → 1MB
-}
-
-def generate_large_file(file_path, chunk_unit):
-  """파일을 청크 단위로 읽어서 반환하는 제너레이터"""
-  with open(file_path, "rb") as file:
-    while chunk := file.read(chunk_unit):  # 8KB 단위로 읽기
-      yield chunk
-
-def send_large_file(file_path, chunk_size, filename):
-  """ 큰 파일을 스트리밍으로 전송하는 함수 """
-  file_size = os.path.getsize(file_path)  # 🔥 파일 크기 가져오기
-  # 파일명을 URL-encoded UTF-8로 변환 (RFC 5987 표준 적용)
-  encoded_filename = quote(filename, encoding='utf-8')
-
-  return Response(
-    generate_large_file(file_path, chunk_size),  # ✅ 들여쓰기 정리
-    mimetype="application/octet-stream",
-    headers={
-      "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}",
-      "Content-Length": str(file_size),  # ✅ 올바른 형식
-    }
-)
-
-def determineSendMethod(file_path, file_name):
-  file_size = os.path.getsize(file_path)
-  if file_size < 1 * 1024 * 1024:  # 1MB 미만
-    return send_file(file_path, as_attachment=True)
-  
-  # 파일 크기에 맞는 청크 크기 찾기
-  chunk_size = next((size for limit, size in CHUNK_SIZES.items() if file_size < limit), 1024 * 1024)
-  return send_large_file(file_path, chunk_size, file_name)
+  # ---------- 작업 ID 반환 (결과 {"response", "msg_files"}는 /textgpt/jobs/<id>) ----------
+  return submit_openai_job('code_interpreter', work, finish)
 
 
 @bp.route("/serve_file_by_id/<string:fileId>", methods=["GET"])
@@ -527,7 +767,7 @@ def serve_file_by_id(fileId):
     fid = int(fileId)
     targetFile = MsgFile.query.filter_by(id=fid).first_or_404()
     print(targetFile)
-    return determineSendMethod(targetFile.filePath, targetFile.filename)
+    return send_file_response(targetFile.filePath, download_name=targetFile.filename, as_attachment=True)
   except Exception as e:
     print(f"An unexpected error occurred: {e}")
     return jsonify({"message": "An unexpected error occurred"}), 500
@@ -619,14 +859,21 @@ def web_search():
     
     print("dict_for_tools: ", dict_for_tools)
     
-    # API 호출
-    response = client.responses.create(
-      model=_model.strip(),
-      tools=[dict_for_tools],
-      input=remaining
-    )
+    # API 호출 (결과 {"response": ...}는 /textgpt/jobs/<id>로 확인)
+    user_id = g.user.id
+
+    async def work():
+      response = await gateway.acall(
+        lambda client: client.responses.create(
+          model=_model.strip(),
+          tools=[dict_for_tools],
+          input=remaining
+        ),
+        user=user_id,
+      )
+      return {"response": response.output_text}
 
-    return jsonify({"response": response.output_text}), 200
+    return submit_openai_job('web_search', work)
 
   except Exception as e:
     current_app.logger.error("web_search error: %s", traceback.format_exc())
@@ -692,10 +939,10 @@ def generate_image():
     upload_folder = Path(current_app.config["UPLOAD_FOLDER"])
     # image_path = upload_folder / file_name
 
-    response = None
+    generate = None
     if subjectFlag: 
       if subjectFlag.dalle_model == 'dall-e-3':
-        response = client.images.generate(
+        generate = lambda client: client.images.generate(
           model="dall-e-3",
           prompt=data['prompt'],
           size=subjectFlag.size_of_image,
@@ -706,7 +953,7 @@ def generate_image():
         )
       elif subjectFlag.dalle_model == 'dall-e-2':
         if not data['images']:
-          response = client.images.generate(
+          generate = lambda client: client.images.generate(
             model="dall-e-2",
             prompt=data['prompt'],
             size=subjectFlag.size_of_image,
@@ -738,9 +985,11 @@ def generate_image():
           # print(file_info)
           # print(true_index)
           # print(false_index)
-          response = client.images.edit(
-            image=open(str(file_info[false_index][0]), "rb"),
-            mask=open(str(file_info[true_index][0]), "rb"),
+          img_file = file_payload(str(file_info[false_index][0]))
+          mask_file = file_payload(str(file_info[true_index][0]))
+          generate = lambda client: client.images.edit(
+            image=img_file,
+            mask=mask_file,
             prompt=data['prompt'],
             n=subjectFlag.number_of_images,
             size=subjectFlag.size_of_image,
@@ -758,16 +1007,18 @@ def generate_image():
 
           if is_valid and not has_transparency: # 이미지 변형하기 처리
             # print('variation!')
-            response = client.images.create_variation(
-              image=open(str(file_path), "rb"),
+            img_file = file_payload(str(file_path))
+            generate = lambda client: client.images.create_variation(
+              image=img_file,
               n=subjectFlag.number_of_images,
               size=subjectFlag.size_of_image,
               response_format='b64_json',
             )
           elif is_valid and has_transparency: # 이미지 편집하기 처리
             # print('edit!')
-            response = client.images.edit(
-              image=open(str(file_path), "rb"),
+            img_file = file_payload(str(file_path))
+            generate = lambda client: client.images.edit(
+              image=img_file,
               prompt=data['prompt'],
               n=subjectFlag.number_of_images,
               size=subjectFlag.size_of_image,
@@ -776,7 +1027,7 @@ def generate_image():
           else:
             return jsonify({'error': f'{message}, {message2}'}), 400
     else:
-      response = client.images.generate(
+      generate = lambda client: client.images.generate(
         model="dall-e-3",
         prompt=data['prompt'],
         size="1024x1024",
@@ -786,35 +1037,11 @@ def generate_image():
         response_format='b64_json',
       )
 
-    msgIds = []
-    for item in response.data:
-      image_b64 = item.b64_json
-      image_data = base64.b64decode(image_b64)
-      revised_prompt = item.revised_prompt
-      formatted_now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-      file_name = f'{g.user.username}_{formatted_now}_{uuid.uuid4().hex}.png'
-      image_path = upload_folder / file_name
-
-      with open(image_path, 'wb') as f:
-        f.write(image_data)
-
-      image_file = io.BytesIO(image_data)
-      img = Image.open(image_file)
-      img.thumbnail((256, 256))
-      thumbnail_path = upload_folder / f't_{file_name}'
-      img.save(thumbnail_path)
-
-      message_image = MsgImage(
-        imagePath=file_name,
-        thumbnailPath=f't_{file_name}',
-      )
+    if generate is None:
+      return jsonify({'error': 'Invalid image request.'}), 400
 
-      db.session.add(message_image)
-      #db.session.flush()  # 바로 commit하지 않고 현재 세션 내에서 ID를 불러옴
-      msgIds.append(f't_{file_name}')
-    db.session.commit()
-
-    return jsonify({"revised_prompt": revised_prompt, "msgIds": msgIds}), 200
+    # 결과 {"revised_prompt", "msgIds"}는 /textgpt/jobs/<id>로 확인
+    return submit_image_job(generate, upload_folder)
   except SQLAlchemyError as e:
     db.session.rollback()
     return jsonify({'error': 'Database error', 'message': str(e)}), 500
@@ -832,7 +1059,6 @@ def generate_image_by_imageAPI():
       return jsonify({'error': 'Invalid input'}), 400
 
     upload_folder = Path(current_app.config["UPLOAD_FOLDER"])
-    revised_prompt = None
     imagePathes = []  # [(Path, has_transparency_bool), ...]
 
     # ---------------------------
@@ -888,19 +1114,19 @@ def generate_image_by_imageAPI():
 
     if num_of_images == 0:
       # 새 이미지 생성
-      response = client.images.generate(
+      generate = lambda client: client.images.generate(
         model="gpt-image-1",
         prompt=data['prompt']
       )
 
     elif num_of_images == 1:
       # 단일 이미지 편집
-      with open(str(imagePathes[0][0]), "rb") as img_file:
-        response = client.images.edit(
-            model="gpt-image-1",
-            image=img_file,
-            prompt=data['prompt']
-        )
+      img_file = file_payload(imagePathes[0][0])
+      generate = lambda client: client.images.edit(
+        model="gpt-image-1",
+        image=img_file,
+        prompt=data['prompt']
+      )
 
     else:
       # 다중 이미지 처리
@@ -909,69 +1135,33 @@ def generate_image_by_imageAPI():
 
       if true_count == 0:
         # 모든 이미지 불투명
-        open_files = [open(str(f), "rb") for f, _ in imagePathes]
-        try:
-          response = client.images.edit(
-            model="gpt-image-1",
-            image=open_files,
-            prompt=data['prompt']
-          )
-        finally:
-          for f in open_files:
-            f.close()
+        image_files = [file_payload(f) for f, _ in imagePathes]
+        generate = lambda client: client.images.edit(
+          model="gpt-image-1",
+          image=image_files,
+          prompt=data['prompt']
+        )
 
       elif true_count == 1 and num_of_images == 2:
         # 하나는 mask, 하나는 원본
         true_index = true_indices[0]
         false_index = 1 - true_index
-        with open(str(imagePathes[false_index][0]), "rb") as img_file, \
-              open(str(imagePathes[true_index][0]), "rb") as mask_file:
-          response = client.images.edit(
-            model="gpt-image-1",
-            image=img_file,
-            mask=mask_file,
-            prompt=data['prompt'],
-          )
+        img_file = file_payload(imagePathes[false_index][0])
+        mask_file = file_payload(imagePathes[true_index][0])
+        generate = lambda client: client.images.edit(
+          model="gpt-image-1",
+          image=img_file,
+          mask=mask_file,
+          prompt=data['prompt'],
+        )
       else:
         print("step: 4")
         return jsonify({'error': 'Invalid file set for imageAPI.'}), 400
 
     # ---------------------------
-    # 응답 저장 & DB 기록
+    # 작업 ID 반환 (결과 {"revised_prompt", "msgIds"}는 /textgpt/jobs/<id>)
     # ---------------------------
-    msgIds = []
-    for item in response.data:
-      image_b64 = item.b64_json
-      image_data = base64.b64decode(image_b64)
-      revised_prompt = item.revised_prompt
-
-      formatted_now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-      file_name = f'{g.user.username}_{formatted_now}_{uuid.uuid4().hex}.png'
-      image_path = upload_folder / file_name
-
-      # 원본 저장
-      with open(image_path, 'wb') as f:
-        f.write(image_data)
-
-      # 썸네일 저장
-      image_file = io.BytesIO(image_data)
-      img = Image.open(image_file)
-      img.thumbnail((256, 256))
-      thumbnail_name = f't_{file_name}'
-      thumbnail_path = upload_folder / thumbnail_name
-      img.save(thumbnail_path)
-
-      # DB 저장
-      message_image = MsgImage(
-        imagePath=file_name,
-        thumbnailPath=thumbnail_name,
-      )
-      db.session.add(message_image)
-      msgIds.append(thumbnail_name)
-
-    db.session.commit()
-
-    return jsonify({"revised_prompt": revised_prompt, "msgIds": msgIds}), 200
+    return submit_image_job(generate, upload_folder)
 
   except SQLAlchemyError as e:
     db.session.rollback()
@@ -1006,60 +1196,12 @@ def upload():
     if 'author' not in _content or 'desc' not in _content:
       return jsonify({'error': 'Each content must have author and desc'}), 400
 
-  subjectFlag = Subject.query.filter_by(user_id=g.user.id, title=subject).first()
-  
   try:
-    if subjectFlag is None:
-      _subject = Subject(
-        user_id=g.user.id,
-        title=subject,
-        model=model,
-        range=_range,
-        system=_system,
-        resolution=512,
-        dalle_model='dall-e-3',
-        number_of_images=1,
-        quality_of_image='standard',
-        size_of_image='1024x1024',
-        style_of_image='vivid',
-      )
-      db.session.add(_subject)
-      db.session.flush()
-      mySubject = _subject
-    else:
-      mySubject = subjectFlag
-    
-    msgIds = []
-    for _content in contents:
-      try:
-        role = RoleEnum(_content['author'])
-      except ValueError:
-        return jsonify({'error': f"Invalid role: {_content['author']}"}), 400
-
-      _message = Message(
-        subject_id=mySubject.id,
-        role=role,
-        content=_content['desc'],
-      )
-      db.session.add(_message)
-      db.session.flush()
-      # print(f'Message ID: {_message.id}')
-      msgIds.append(_message.id)
-
-    for _image in _images:
-      parts = _image.split('/')
-      filename = parts[-1]
-      # print(f'filename: {filename}')
-      targetImage = MsgImage.query.filter_by(thumbnailPath=filename).first_or_404()
-      # print(f'targetImage: {targetImage}')
-      targetImage.message_id = int(msgIds[0])
-
-    for _file in _files:
-      targetFile = MsgFile.query.filter_by(id=_file["id"]).first_or_404()
-      targetFile.message_id = msgIds[-1]   # 항상 최신 메시지(assistant)에 연결
-      
-    db.session.commit()
-    return jsonify({'message': 'created!', 'msgIds': msgIds, 'subjectId':mySubject.id }), 201
+    msgIds, subjectId = save_conversation(g.user.id, subject, model, _range, _system, contents, _images, _files)
+    return jsonify({'message': 'created!', 'msgIds': msgIds, 'subjectId': subjectId }), 201
+  except ValueError as e:
+    db.session.rollback()
+    return jsonify({'error': str(e)}), 400
   except SQLAlchemyError as e:
     db.session.rollback()
     return jsonify({'error': 'Database error', 'message': str(e)}), 500
@@ -1067,6 +1209,67 @@ def upload():
     db.session.rollback()
     return jsonify({'error': 'Server error', 'message': str(e)}), 500
 
+def save_conversation(user_id, subject, model, _range, _system, contents, _images, _files):
+  """
+  주제(없으면 생성)에 질문/답변 메시지를 저장하고 첨부 이미지는 첫 메시지, 파일은 마지막 메시지에 연결합니다.
+  (메시지 ID 목록, 주제 ID)를 반환하며 역할이 잘못되었으면 ValueError.
+  """
+  subjectFlag = Subject.query.filter_by(user_id=user_id, title=subject).first()
+  
+  if subjectFlag is None:
+    _subject = Subject(
+      user_id=user_id,
+      title=subject,
+      model=model,
+      range=_range,
+      system=_system,
+      resolution=512,
+      dalle_model='dall-e-3',
+      number_of_images=1,
+      quality_of_image='standard',
+      size_of_image='1024x1024',
+      style_of_image='vivid',
+    )
+    db.session.add(_subject)
+    db.session.flush()
+    mySubject = _subject
+  else:
+    mySubject = subjectFlag
+  
+  msgIds = []
+  for _content in contents:
+    try:
+      role = RoleEnum(_content['author'])
+    except ValueError:
+      raise ValueError(f"Invalid role: {_content['author']}")
+
+    _message = Message(
+      subject_id=mySubject.id,
+      role=role,
+      content=_content['desc'],
+      token_count=count_tokens(_content['desc']),
+    )
+    db.session.add(_message)
+    db.session.flush()
+    # print(f'Message ID: {_message.id}')
+    msgIds.append(_message.id)
+
+  for _image in _images:
+    parts = _image.split('/')
+    filename = parts[-1]
+    # print(f'filename: {filename}')
+    targetImage = MsgImage.query.filter_by(thumbnailPath=filename).first_or_404()
+    # print(f'targetImage: {targetImage}')
+    targetImage.message_id = int(msgIds[0])
+
+  for _file in _files:
+    targetFile = MsgFile.query.filter_by(id=_file["id"]).first_or_404()
+    targetFile.message_id = msgIds[-1]   # 항상 최신 메시지(assistant)에 연결
+    
+  db.session.commit()
+  conversation_cache.invalidate(mySubject.id)
+  return msgIds, mySubject.id
+
 
 @bp.route("/upload_generated_image/", methods=["POST"])
 @login_required
@@ -1123,6 +1326,7 @@ def upload_generated_image():
         subject_id=mySubject.id,
         role=role,
         content=_content['desc'],
+        token_count=count_tokens(_content['desc']),
       )
       db.session.add(_message)
       db.session.flush()
@@ -1147,6 +1351,7 @@ def upload_generated_image():
       targetImage.message_id = int(msgIds[1])
       
     db.session.commit()
+    conversation_cache.invalidate(mySubject.id)
     return jsonify({'message': 'created!', 'msgIds': msgIds, 'subjectId':mySubject.id }), 201
   except SQLAlchemyError as e:
     db.session.rollback()
@@ -1225,6 +1430,7 @@ def delete_messages():
       itemIds.append(second_id)
 
     # print(itemIds)
+    subjectIds = set()
     for itemId in itemIds:
       if itemId:  # itemId가 None이 아닌지 확인
         message_to_delete = Message.query.filter_by(id=int(itemId)).first()
@@ -1248,9 +1454,16 @@ def delete_messages():
             except OSError as e:
                 print(f"Error deleting file {thumbnail_path}: {e}")
         
+        subjectIds.add(message_to_delete.subject_id)
+        # 지운 메시지를 포함한 요약은 더 이상 쓰지 않음
+        ConversationSummary.query.filter(
+          ConversationSummary.subject_id == message_to_delete.subject_id,
+          ConversationSummary.upto_message_id >= message_to_delete.id,
+        ).delete()
         db.session.delete(message_to_delete)
     
     db.session.commit()
+    conversation_cache.invalidate(*subjectIds)
     return jsonify({'success': True, 'deleted_ids': itemIds}), 200
   
   except SQLAlchemyError as e:
@@ -1270,6 +1483,7 @@ def delete(itemId):
     delId = subject_to_delete.id
     db.session.delete(subject_to_delete)
     db.session.commit()  
+    conversation_cache.invalidate(delId)
     return jsonify({'message': 'deleted!', 'subject_id': delId}), 200
   except SQLAlchemyError as e:
     return jsonify({'error': 'Database error', 'message': str(e)}), 500